@@ -0,0 +1,613 @@
+#!/usr/bin/env python3
+"""
+Benchmark module, measures how routing, path generation and placement scale, and checks that optimized engines keep the reference placements
+
+Devices are randomly placed at the same density as the default 40 devices floor, so the floor grows with the number of devices.
+Routing tables hold one route per reachable device pair, memory grows as the square of the number of devices (10k devices need several GB).
+
+Usage:
+
+    python3 benchmark.py scaling --sizes 40 100 1000 10000 --wifi-ranges 6 9 --app-sizes 1 3 5
+    python3 benchmark.py differential --sizes 40 100 200 --apps 200
+    python3 benchmark.py memory --sizes 1000 10000 50000
+    python3 benchmark.py utilization --sizes 1000 2000 --apps-per-device 3
+    python3 benchmark.py bandwidth --sizes 100 200 --link-bandwidths 40 100
+
+"""
+import argparse
+import random
+import sys
+import time
+import tracemalloc
+
+import numpy as np
+
+from modules.Application import Application
+from modules.BandwidthRouting import BandwidthRouting
+from modules.CapacityIndex import CapacityIndex
+from modules.DeploymentMetrics import DeploymentMetrics
+from modules.Device import Device
+from modules.DeviceTable import DeviceTable
+from modules.PathCache import PathCache
+from modules.Path import Path
+from modules.PhysicalNetworkLink import PhysicalNetworkLink
+from modules.PhysicalNetworkLinkStore import PhysicalNetworkLinkStore
+from modules.ReservationLedger import ReservationLedger
+
+from deployment import application_deploy
+from deployment import undeploy
+from deployment import linkability
+
+import simulation
+
+# Devices per square meter of floor, same density as the 40 devices on the 40x40 m floor of generate_devices
+DEVICE_DENSITY = simulation.N_DEVICES / (40 * 40)
+
+
+def random_devices(n_devices, seed=0):
+    """
+    Creates devices at random positions, the floor grows with the number of devices to keep the same density (and number of neighbors per device)
+
+    Args:
+        n_devices : int, number of devices
+        seed : int, default to 0, random seed
+
+    Returns:
+        devices_list : list(Device), devices with random positions and resource limits, device IDs from 0 to n_devices-1
+    """
+    rng = random.Random(seed)
+    floor_size = (n_devices / DEVICE_DENSITY) ** 0.5
+
+    devices_list = list()
+    for device_id in range(n_devices):
+        device = Device()
+        device.setDeviceID(device_id)
+        device.setDevicePosition(round(rng.random() * floor_size, 2), round(rng.random() * floor_size, 2), 0)
+        device.setDeviceCPULimit(rng.choice([2, 4, 8]))
+        device.setDeviceGPULimit(rng.choice([4, 8, 12, 16]))
+        device.setDeviceMemLimit(rng.choice([4, 8, 16, 24, 32]) * 1024)
+        device.setDeviceDiskLimit(rng.choice([50, 100, 125, 250, 500]) * 1024)
+        devices_list.append(device)
+
+    return devices_list
+
+
+def random_applications(n_apps, app_size, devices_list, seed=0):
+    """
+    Creates random applications of a given size, each with a random source device
+
+    Args:
+        n_apps : int, number of applications
+        app_size : int, number of processus per application, None for random sizes from 1 to 3 as in simulate_deployments
+        devices_list : list(Device), devices the sources are taken from
+        seed : int, default to 0, random seed
+
+    Returns:
+        (apps, source_ids) : (list(Application), list(int))
+    """
+    random.seed(seed)
+    device_ids = [device.getDeviceID() for device in devices_list if device is not None]
+    apps = list()
+    source_ids = list()
+    for _ in range(n_apps):
+        app = Application()
+        if app_size is None:
+            app.randomAppInit()
+        else:
+            app.randomAppInit(num_procs=app_size, num_proc_random=False)
+        apps.append(app)
+        source_ids.append(random.choice(device_ids))
+    return apps, source_ids
+
+
+def routed_cluster(n_devices, seed=0, engine=simulation.ROUTING_ENGINE, links='store', table=True):
+    """
+    Creates random devices, their physical links and routing tables
+
+    Args:
+        n_devices : int, number of devices
+        seed : int, default to 0, random seed
+        engine : str, routing engine, see generate_routing_table
+        links : str, 'store' for a PhysicalNetworkLinkStore, 'list' for the dense list of PhysicalNetworkLink
+        table : Boolean, default to True to bind the devices to a DeviceTable
+
+    Returns:
+        (devices_list, physical_network_link_list, routing_engine, routing_time)
+            routing_engine : RoutingEngine, None for the legacy engine
+            routing_time : float, generate_routing_table duration, in seconds
+    """
+    devices_list = random_devices(n_devices, seed)
+    if table:
+        DeviceTable.from_devices(devices_list)
+    physical_network_link_list = PhysicalNetworkLinkStore(n_devices) if links == 'store' else [0]*n_devices*n_devices
+
+    start = time.perf_counter()
+    routing_engine = simulation.generate_routing_table(devices_list, physical_network_link_list, engine=engine)
+    routing_time = time.perf_counter() - start
+
+    return devices_list, physical_network_link_list, routing_engine, routing_time
+
+
+def scaling_report(sizes, wifi_ranges, app_sizes, n_apps=100, n_paths=200, engine=simulation.ROUTING_ENGINE, seed=0, memory=True):
+    """
+    Times routing, path generation, linkability and placement separately, for every number of devices, wifi range and application size
+    Each application size is deployed on the same, empty, cluster
+
+    Args:
+        sizes : list(int), numbers of devices
+        wifi_ranges : list(float), wireless ranges
+        app_sizes : list(int), numbers of processus per application
+        n_apps : int, default to 100, number of applications deployed per application size
+        n_paths : int, default to 200, number of paths generated
+        engine : str, routing engine, see generate_routing_table
+        seed : int, default to 0, random seed
+        memory : Boolean, default to True to measure the routing peak memory, routing is run a second time under tracemalloc
+
+    Returns:
+        report : list(dict), one row per (number of devices, wifi range, application size), times in milliseconds, memory in MB
+    """
+    default_wifi_range = simulation.wifi_range
+    report = list()
+
+    # First routing imports the routing backends, kept out of the measurements
+    routed_cluster(simulation.N_DEVICES, seed, engine)
+
+    try:
+        for wifi_range in wifi_ranges:
+            simulation.wifi_range = wifi_range
+            for n_devices in sizes:
+                devices_list, links, routing_engine, routing_time = routed_cluster(n_devices, seed, engine)
+                routing_peak = measure_memory(routed_cluster, n_devices, seed, engine)[2] if memory else np.nan
+
+                # Paths between random reachable device pairs
+                rng = random.Random(seed)
+                pairs = list()
+                for _ in range(n_paths):
+                    source = devices_list[rng.randrange(n_devices)]
+                    pairs.append((source.getDeviceID(), rng.choice(list(source.routing_table))))
+                start = time.perf_counter()
+                for source_id, destination_id in pairs:
+                    Path().path_generation(devices_list, source_id, destination_id)
+                path_time = (time.perf_counter() - start) / n_paths
+
+                device_table = devices_list[0].table
+                initial_usage = device_table.snapshot()
+                for app_size in app_sizes:
+                    apps, source_ids = random_applications(n_apps, app_size, devices_list, seed)
+
+                    # Linkability of each application on its source's closest devices, paths are built on each call
+                    start = time.perf_counter()
+                    for app, source_id in zip(apps, source_ids):
+                        candidates = sorted(devices_list[source_id].routing_table, key=lambda device_id: devices_list[source_id].routing_table[device_id][1])[:app.num_procs]
+                        for deployed in range(1, len(candidates) + 1):
+                            linkability(candidates[:deployed], app.proc_links, devices_list, links)
+                    linkability_time = (time.perf_counter() - start) / n_apps
+
+                    path_cache = PathCache()
+                    if routing_engine is not None:
+                        routing_engine.subscribe(path_cache.invalidate)
+                    accepted = 0
+                    start = time.perf_counter()
+                    for app, source_id in zip(apps, source_ids):
+                        accepted += application_deploy(app, devices_list[source_id], devices_list, links, path_cache, routing_engine, verbose=False)[0]
+                    deploy_time = (time.perf_counter() - start) / n_apps
+
+                    # Next application size starts from the empty cluster again
+                    device_table.restore(initial_usage)
+                    links.bandwidth_use[:] = 0
+
+                    report.append({'devices': n_devices,
+                                   'wifi_range': wifi_range,
+                                   'links': len(links),
+                                   'app_size': app_size,
+                                   'routing_ms': routing_time * 1000,
+                                   'routing_peak_mb': routing_peak / 2**20,
+                                   'path_ms': path_time * 1000,
+                                   'linkability_ms': linkability_time * 1000,
+                                   'deploy_ms': deploy_time * 1000,
+                                   'acceptance': accepted / n_apps})
+                    print_report(report[-1:], header=len(report) == 1)
+    finally:
+        simulation.wifi_range = default_wifi_range
+
+    return report
+
+
+def differential_report(sizes, n_apps=200, engine=simulation.ROUTING_ENGINE, seed=0):
+    """
+    Deploys the same applications with the reference implementation (legacy routing, dense link list, no device table, cache or engine)
+    and with the optimized one (routing engine, link store, device table, path cache, capacity index), and compares the results
+
+    Args:
+        sizes : list(int), numbers of devices
+        n_apps : int, default to 200, number of applications deployed
+        engine : str, optimized routing engine, see generate_routing_table
+        seed : int, default to 0, random seed
+
+    Returns:
+        report : list(dict), one row per number of devices, with the number of results that differ and the first differing application
+    """
+    report = list()
+    for n_devices in sizes:
+        reference_devices, reference_links, _, _ = routed_cluster(n_devices, seed, 'legacy', links='list', table=False)
+        devices_list, links, routing_engine, _ = routed_cluster(n_devices, seed, engine)
+        path_cache = PathCache()
+        if routing_engine is not None:
+            routing_engine.subscribe(path_cache.invalidate)
+        capacity_index = CapacityIndex(devices_list[0].table)
+
+        apps, source_ids = random_applications(n_apps, None, devices_list, seed)
+
+        accepted = 0
+        mismatches = 0
+        first_mismatch = None
+        for index, (app, source_id) in enumerate(zip(apps, source_ids)):
+            reference = application_deploy(app, reference_devices[source_id], reference_devices, reference_links, verbose=False)
+            result = application_deploy(app, devices_list[source_id], devices_list, links, path_cache, routing_engine, verbose=False, capacity_index=capacity_index)
+            accepted += reference[0]
+
+            # Latencies are sums of distances, only compared up to float rounding
+            if reference[0] != result[0] or list(reference[3]) != list(result[3]) or not np.allclose(reference[1:3], result[1:3]):
+                mismatches += 1
+                if first_mismatch is None:
+                    first_mismatch = index
+                    first_results = f"reference {reference}, {engine} {result}"
+
+        report.append({'devices': n_devices,
+                       'apps': n_apps,
+                       'accepted': accepted,
+                       'mismatches': mismatches,
+                       'first_mismatch': first_mismatch})
+        print_report(report[-1:], header=len(report) == 1)
+        if first_mismatch is not None:
+            print(f"First mismatch, application {first_mismatch} : {first_results}")
+
+    return report
+
+
+def utilization_report(sizes, apps_per_device=3, bands=5, engine=simulation.ROUTING_ENGINE, seed=0):
+    """
+    Fills a cluster with applications, without and with a CapacityIndex, and compares the deployment times as utilization grows
+    Utilization is the share of the most used resource over the whole cluster, measured before each deployment
+
+    Args:
+        sizes : list(int), numbers of devices
+        apps_per_device : int, default to 3, number of applications deployed per device
+        bands : int, default to 5, number of utilization bands deployments are grouped in
+        engine : str, routing engine, see generate_routing_table
+        seed : int, default to 0, random seed
+
+    Returns:
+        report : list(dict), one row per (number of devices, utilization band), mean times in milliseconds
+    """
+    report = list()
+    for n_devices in sizes:
+        n_apps = apps_per_device * n_devices
+        results = dict()
+        for indexed in [False, True]:
+            devices_list, links, routing_engine, _ = routed_cluster(n_devices, seed, engine)
+            device_table = devices_list[0].table
+            path_cache = PathCache()
+            routing_engine.subscribe(path_cache.invalidate)
+            capacity_index = CapacityIndex(device_table) if indexed else None
+            total = device_table.limits().sum(axis=0)
+
+            apps, source_ids = random_applications(n_apps, None, devices_list, seed)
+            random.seed(seed)
+            utilizations = list()
+            times = list()
+            placements = list()
+            for app, source_id in zip(apps, source_ids):
+                utilizations.append(float(np.max(device_table.usages().sum(axis=0) / total)))
+                start = time.perf_counter()
+                result = application_deploy(app, devices_list[source_id], devices_list, links, path_cache, routing_engine, verbose=False, capacity_index=capacity_index)
+                times.append(time.perf_counter() - start)
+                placements.append((result[0], list(result[3])))
+            results[indexed] = (np.array(utilizations), np.array(times), placements)
+
+        utilizations, scan_times, placements = results[False]
+        _, index_times, index_placements = results[True]
+        mismatches = sum(placement != index_placement for placement, index_placement in zip(placements, index_placements))
+        accepted = np.array([success for success, _ in placements])
+
+        band_ids = np.minimum((utilizations * bands).astype(int), bands - 1)
+        for band in range(bands):
+            in_band = band_ids == band
+            if not np.any(in_band):
+                continue
+            report.append({'devices': n_devices,
+                           'utilization': f"{band / bands:.2f}-{(band + 1) / bands:.2f}",
+                           'deployments': int(np.sum(in_band)),
+                           'acceptance': float(np.mean(accepted[in_band])),
+                           'scan_ms': float(np.mean(scan_times[in_band])) * 1000,
+                           'index_ms': float(np.mean(index_times[in_band])) * 1000,
+                           'mismatches': mismatches})
+            print_report(report[-1:], header=len(report) == 1)
+
+    return report
+
+
+def bandwidth_report(sizes, link_bandwidths, apps_per_device=3, app_size=3, lifetime=30, engine=simulation.ROUTING_ENGINE, seed=0):
+    """
+    Deploys the same applications with distance routes and with bandwidth weighted routes (BandwidthRouting), on links of reduced bandwidth
+    The oldest application is undeployed once lifetime applications are deployed, so that links stay loaded
+
+    Args:
+        sizes : list(int), numbers of devices
+        link_bandwidths : list(float), bandwidth of every physical link, in MBytes/s
+        apps_per_device : int, default to 3, number of applications deployed per device
+        app_size : int, default to 3, number of processus per application
+        lifetime : int, default to 30, number of applications deployed at the same time
+        engine : str, routing engine, see generate_routing_table
+        seed : int, default to 0, random seed
+
+    Returns:
+        report : list(dict), one row per (number of devices, link bandwidth), mean times in milliseconds
+    """
+    report = list()
+    for n_devices in sizes:
+        for link_bandwidth in link_bandwidths:
+            row = {'devices': n_devices, 'link_mb_s': link_bandwidth}
+            for routing in ['distance', 'bandwidth']:
+                devices_list, links, routing_engine, _ = routed_cluster(n_devices, seed, engine)
+                links.bandwidth[:] = link_bandwidth * 1024
+                path_cache = PathCache()
+                routing_engine.subscribe(path_cache.invalidate)
+                bandwidth_routing = None
+                if routing == 'bandwidth':
+                    bandwidth_routing = BandwidthRouting(devices_list, links, routing_engine, engine)
+                    bandwidth_routing.subscribe(path_cache.invalidate)
+
+                apps, source_ids = random_applications(apps_per_device * n_devices, app_size, devices_list, seed)
+                random.seed(seed)
+                ledger = ReservationLedger()
+                metrics = DeploymentMetrics()
+                deployed = list()
+                start = time.perf_counter()
+                for app, source_id in zip(apps, source_ids):
+                    if application_deploy(app, devices_list[source_id], devices_list, links, path_cache, routing_engine, verbose=False,
+                                          ledger=ledger, metrics=metrics, bandwidth_routing=bandwidth_routing)[0]:
+                        deployed.append(app.id)
+                    if len(deployed) > lifetime:
+                        undeploy(deployed.pop(0), devices_list, links, ledger)
+                deploy_time = (time.perf_counter() - start) / len(apps)
+
+                row[f'{routing}_accepted'] = metrics.successes
+                row[f'{routing}_link_fail'] = metrics.linkability_failures
+                row[f'{routing}_ms'] = deploy_time * 1000
+            row['routing_ms'] = metrics.seconds['routing'] / len(apps) * 1000
+            report.append(row)
+            print_report(report[-1:], header=len(report) == 1)
+
+    return report
+
+
+def measure_memory(function, *args):
+    """
+    Runs a function and measures the memory it allocated and kept
+
+    Args:
+        function : function, called with args
+        args : arguments
+
+    Returns:
+        (result, size, peak) : function result, memory still allocated (in bytes) and peak allocated memory (in bytes)
+    """
+    tracemalloc.start()
+    result = function(*args)
+    size, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return result, size, peak
+
+
+def memory_report(sizes, seed=0):
+    """
+    Measures the memory per device and per physical link for several numbers of devices
+    Routing tables only hold the route to the device itself, filled routing tables hold one entry per reachable device
+
+    Args:
+        sizes : list(int), numbers of devices
+        seed : int, default to 0, random seed
+
+    Returns:
+        report : list(dict), one row per number of devices, sizes in bytes
+    """
+    report = list()
+    for n_devices in sizes:
+        # Devices alone, then bound to a DeviceTable, their features are moved to the table
+        devices_list, device_size, _ = measure_memory(random_devices, n_devices, seed)
+        def bound_devices():
+            devices_list = random_devices(n_devices, seed)
+            return devices_list, DeviceTable.from_devices(devices_list)
+        _, bound_size, _ = measure_memory(bound_devices)
+
+        device_1_ids, device_2_ids, _ = simulation.wireless_neighbors(devices_list)
+        n_links = len(device_1_ids)
+
+        # One PhysicalNetworkLink object per link, the dense n*n list adds one pointer per device pair
+        def link_objects():
+            links = list()
+            for device_1_id, device_2_id in zip(device_1_ids.tolist(), device_2_ids.tolist()):
+                link = PhysicalNetworkLink(device_1_id, device_2_id)
+                link.setLinkID(device_1_id*n_devices + device_2_id)
+                links.append(link)
+            return links
+        _, link_size, _ = measure_memory(link_objects)
+
+        def link_store():
+            store = PhysicalNetworkLinkStore(n_devices)
+            store.build(n_devices, device_1_ids, device_2_ids)
+            return store
+        _, store_size, _ = measure_memory(link_store)
+
+        report.append({'devices': n_devices,
+                       'links': n_links,
+                       'device_object': device_size / n_devices,
+                       'device_bound': bound_size / n_devices,
+                       'link_object': link_size / n_links,
+                       'dense_list_per_link': 8 * n_devices * n_devices / n_links,
+                       'link_store': store_size / n_links})
+
+    return report
+
+
+def print_report(report, header=True):
+    """
+    Prints a report as a table, one line per row
+
+    Args:
+        report : list(dict), rows with the same keys
+        header : Boolean, default to True to print the column names first
+
+    Returns:
+        None
+    """
+    if not report:
+        return
+    if header:
+        print(' '.join(f"{column:>16}" for column in report[0]))
+    for row in report:
+        print(' '.join(f"{value:>16.3f}" if isinstance(value, float) else f"{str(value):>16}" for value in row.values()), flush=True)
+
+
+def parse_args():
+
+    parser = argparse.ArgumentParser(description='Benchmarks of the placement model')
+    subparsers = parser.add_subparsers(dest='benchmark', required=True)
+
+    scaling = subparsers.add_parser('scaling', help='Routing, path generation, linkability and placement times')
+    scaling.add_argument('--sizes',
+                         help='Numbers of devices',
+                         type=int,
+                         nargs='+',
+                         default=[40, 100, 1000])
+    scaling.add_argument('--wifi-ranges',
+                         help='Wireless ranges',
+                         type=float,
+                         nargs='+',
+                         default=[simulation.wifi_range])
+    scaling.add_argument('--app-sizes',
+                         help='Numbers of processus per application',
+                         type=int,
+                         nargs='+',
+                         default=[1, 3, 5])
+    scaling.add_argument('--apps',
+                         help='Number of applications deployed per application size',
+                         type=int,
+                         default=100)
+    scaling.add_argument('--routing',
+                         help='Routing engine',
+                         choices=['legacy', 'fast', 'floyd', 'dijkstra'],
+                         default=simulation.ROUTING_ENGINE)
+    scaling.add_argument('--no-memory',
+                         help='Skip the routing peak memory measurement',
+                         action='store_true')
+    scaling.add_argument('--seed',
+                         help='Random seed',
+                         type=int,
+                         default=0)
+
+    differential = subparsers.add_parser('differential', help='Compares placements with the reference implementation')
+    differential.add_argument('--sizes',
+                              help='Numbers of devices',
+                              type=int,
+                              nargs='+',
+                              default=[40, 100, 200])
+    differential.add_argument('--apps',
+                              help='Number of applications deployed',
+                              type=int,
+                              default=200)
+    differential.add_argument('--routing',
+                              help='Optimized routing engine',
+                              choices=['fast', 'floyd', 'dijkstra'],
+                              default=simulation.ROUTING_ENGINE)
+    differential.add_argument('--seed',
+                              help='Random seed',
+                              type=int,
+                              default=0)
+
+    memory = subparsers.add_parser('memory', help='Memory used per device and per physical link')
+    memory.add_argument('--sizes',
+                        help='Numbers of devices',
+                        type=int,
+                        nargs='+',
+                        default=[1000, 10000, 50000])
+    memory.add_argument('--seed',
+                        help='Random seed',
+                        type=int,
+                        default=0)
+
+    utilization = subparsers.add_parser('utilization', help='Deployment times as the cluster fills up, without and with a capacity index')
+    utilization.add_argument('--sizes',
+                             help='Numbers of devices',
+                             type=int,
+                             nargs='+',
+                             default=[1000, 2000])
+    utilization.add_argument('--apps-per-device',
+                             help='Number of applications deployed per device',
+                             type=int,
+                             default=3)
+    utilization.add_argument('--bands',
+                             help='Number of utilization bands',
+                             type=int,
+                             default=5)
+    utilization.add_argument('--routing',
+                             help='Routing engine',
+                             choices=['fast', 'floyd', 'dijkstra'],
+                             default=simulation.ROUTING_ENGINE)
+    utilization.add_argument('--seed',
+                             help='Random seed',
+                             type=int,
+                             default=0)
+
+    bandwidth = subparsers.add_parser('bandwidth', help='Acceptance with distance routes and with bandwidth weighted routes, on loaded links')
+    bandwidth.add_argument('--sizes',
+                           help='Numbers of devices',
+                           type=int,
+                           nargs='+',
+                           default=[100, 200])
+    bandwidth.add_argument('--link-bandwidths',
+                           help='Bandwidth of every physical link, in MBytes/s',
+                           type=float,
+                           nargs='+',
+                           default=[40, 100])
+    bandwidth.add_argument('--apps-per-device',
+                           help='Number of applications deployed per device',
+                           type=int,
+                           default=3)
+    bandwidth.add_argument('--routing',
+                           help='Routing engine',
+                           choices=['fast', 'floyd', 'dijkstra'],
+                           default=simulation.ROUTING_ENGINE)
+    bandwidth.add_argument('--seed',
+                           help='Random seed',
+                           type=int,
+                           default=0)
+
+    return parser.parse_args()
+
+
+def main():
+
+    options = parse_args()
+
+    if options.benchmark == 'scaling':
+        scaling_report(options.sizes, options.wifi_ranges, options.app_sizes, options.apps, engine=options.routing, seed=options.seed, memory=not options.no_memory)
+    elif options.benchmark == 'differential':
+        report = differential_report(options.sizes, options.apps, options.routing, options.seed)
+        # Non zero exit status when placements differ, for use in scripts
+        return 1 if any(row['mismatches'] for row in report) else 0
+    elif options.benchmark == 'memory':
+        print_report(memory_report(options.sizes, options.seed))
+    elif options.benchmark == 'utilization':
+        report = utilization_report(options.sizes, options.apps_per_device, options.bands, options.routing, options.seed)
+        # Non zero exit status when the index changes placements
+        return 1 if any(row['mismatches'] for row in report) else 0
+    elif options.benchmark == 'bandwidth':
+        bandwidth_report(options.sizes, options.link_bandwidths, options.apps_per_device, engine=options.routing, seed=options.seed)
+
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
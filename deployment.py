@@ -1,9 +1,31 @@
+from modules.DeploymentMetrics import METRICS_RESOURCES
+from modules.DeviceTable import LIMIT_COLUMNS, USAGE_COLUMNS
 from modules.Path import Path
+from modules.PathCache import PathCache
+from modules.PhysicalNetworkLink import PhysicalNetworkLink
+from modules.PhysicalNetworkLinkStore import PhysicalNetworkLinkStore
+from modules.ReservationLedger import ReservationLedger
 
 import logging
+import numpy as np
+import time
 
 MAX_TENTATIVES = 2000
 
+# The capacity index lists the devices able to host a processus when at most this fraction of the reachable devices may fit, the whole table is filtered otherwise
+CAPACITY_INDEX_FRACTION = 0.125
+
+# Placement search modes : retry from the closest devices up to MAX_TENTATIVES times, or depth first search with backtracking
+SEARCH_MODES = ['tentatives', 'backtracking']
+
+# Result record of a batch deployment, one per application
+DEPLOYMENT_RESULT_DTYPE = np.dtype([('app_id', np.int64),
+                                    ('source_id', np.int64),
+                                    ('success', bool),
+                                    ('latency', float),
+                                    ('operational_latency', float),
+                                    ('placement', object)])
+
 # Let's define how to deploy an application on the system.
 def deployable_proc(proc, device):
     """
@@ -24,6 +46,85 @@ def deployable_proc(proc, device):
     return False
 
 
+def missing_resource(proc, device):
+    """
+    Returns the first resource, in deployable_proc order, missing to deploy a process onto a device
+
+    Args:
+        proc : Processus
+        device : Device
+
+    Returns:
+        int, index in METRICS_RESOURCES, -1 if the process is deployable
+    """
+    requests = (proc.cpu_request, proc.gpu_request, proc.mem_request, proc.disk_request)
+    usages = (device.cpu_usage, device.gpu_usage, device.mem_usage, device.disk_usage)
+    limits = (device.cpu_limit, device.gpu_limit, device.mem_limit, device.disk_limit)
+    for resource, (request, usage, limit) in enumerate(zip(requests, usages, limits)):
+        if not request + usage < limit:
+            return resource
+    return -1
+
+
+def missing_resources(proc, device_table, device_ids):
+    """
+    Counts, for given devices, the first resource missing to deploy a process, for all devices at once
+
+    Args:
+        proc : Processus
+        device_table : DeviceTable, table the devices are bound to
+        device_ids : np.array, Device IDs of the devices
+
+    Returns:
+        np.array, number of devices missing each resource, in METRICS_RESOURCES order
+    """
+    data = device_table.data[device_ids]
+    request = np.array([proc.cpu_request, proc.gpu_request, proc.mem_request, proc.disk_request], dtype=float)
+    missing = ~(request + data[:, USAGE_COLUMNS] < data[:, LIMIT_COLUMNS])
+    rejected = missing.any(axis=1)
+    return np.bincount(missing[rejected].argmax(axis=1), minlength=len(METRICS_RESOURCES))
+
+
+def admission_check(app, device_table):
+    """
+    Checks, without looking at any device, that an application could fit in the cluster at all
+    Each processus must request less than the largest free capacity of a single device, and the whole application less than the total free capacity, for every resource
+    An application failing the check can not be deployed, passing it does not mean that it can be
+
+    Args:
+        app : Application
+        device_table : DeviceTable, table the devices are bound to, gives the free capacity aggregates
+
+    Returns:
+        Boolean, False if the application can not fit
+    """
+    free_total, free_max = device_table.capacity_aggregates()
+    app_request = np.zeros(len(METRICS_RESOURCES))
+    for proc in app.processus_list:
+        request = np.array([proc.cpu_request, proc.gpu_request, proc.mem_request, proc.disk_request], dtype=float)
+        if (request >= free_max).any():
+            return False
+        app_request += request
+    return bool((app_request < free_total).all())
+
+
+def feasibility_mask(proc, device_table):
+    """
+    Checks on which devices a given process can be deployed, for all devices at once.
+    Same rule as deployable_proc, for the four resources together.
+
+    Args:
+        proc : Processus
+        device_table : DeviceTable, table the devices are bound to
+
+    Returns:
+        np.array of Boolean, indexed by device ID, True if deployable
+    """
+    data = device_table.data[:device_table.n_devices]
+    request = np.array([proc.cpu_request, proc.gpu_request, proc.mem_request, proc.disk_request], dtype=float)
+    return np.all(request + data[:, USAGE_COLUMNS] < data[:, LIMIT_COLUMNS], axis=1) & device_table.active[:device_table.n_devices]
+
+
 def reservable_bandwidth(path, bandwidth_needed, physical_network_link_list):
     """
     Checks if a given bandwidth can be reserved along a given path.
@@ -31,7 +132,7 @@ def reservable_bandwidth(path, bandwidth_needed, physical_network_link_list):
     Args:
         path : Path
         bandwidth_needed : Bandwidth to allocate on the Path
-        physical_network_link_list : List(PhysicalNetworkLink), List of physical links to evaluate the minimal bandwidth available on the Path 
+        physical_network_link_list : List(PhysicalNetworkLink) or PhysicalNetworkLinkStore, physical links to evaluate the minimal bandwidth available on the Path 
 
     Returns:
         Boolean, True if bandwidth can be reserved, else False
@@ -39,7 +140,35 @@ def reservable_bandwidth(path, bandwidth_needed, physical_network_link_list):
     return bandwidth_needed <= path.minBandwidthAvailableonPath(physical_network_link_list)
 
 
-def linkability(deployed_app_list, proc_links, devices_list, physical_network_link_list):
+def get_path(devices_list, device_source_id, device_destination_id, path_cache=None, metrics=None):
+    """
+    Returns the path between two devices, from the path cache if one is given
+
+    Args:
+        devices_list : List of devices, used to get devices IDs and routing table, non modified
+        device_source_id : int, device source ID
+        device_destination_id : int, device destination ID
+        path_cache : PathCache, default to None to generate a new Path
+        metrics : DeploymentMetrics, default to None, counts the generated paths
+
+    Returns:
+        path : Path, shared and not to be modified if it comes from the cache
+    """
+    if path_cache is not None:
+        if metrics is None:
+            return path_cache.get(devices_list, device_source_id, device_destination_id)
+        misses = path_cache.misses
+        path = path_cache.get(devices_list, device_source_id, device_destination_id)
+        metrics.paths_built += path_cache.misses - misses
+        return path
+    new_path = Path()
+    new_path.path_generation(devices_list, device_source_id, device_destination_id)
+    if metrics is not None:
+        metrics.paths_built += 1
+    return new_path
+
+
+def linkability(deployed_app_list, proc_links, devices_list, physical_network_link_list, path_cache=None, metrics=None):
     """
     Checks if a newly deployed processus can be linked to already deployed processus in a given app by checking the link quality on all Paths between the newly deployed processus and already deployed ones.
 
@@ -47,21 +176,325 @@ def linkability(deployed_app_list, proc_links, devices_list, physical_network_li
         deployed_app_list : int, Device ID of the Device on which the last processus deployed
         proc_links : Application.proc_links, len(Application.num_procs)*len(Application.num_procs) matrix indicating necessary bandwidth on each virtual link between application processus members
         device_list : List of devices, used to get devices IDs and routing table, non modified (Global variable now, but globals are bad)
-        physical_network_link_list : List(PhysicalNetworkLink), List of physical links to evaluate the minimal bandwidth available on the Path 
+        physical_network_link_list : List(PhysicalNetworkLink) or PhysicalNetworkLinkStore, physical links to evaluate the minimal bandwidth available on the Path 
+        path_cache : PathCache, default to None, paths are reused from the cache if given
+        metrics : DeploymentMetrics, default to None, counts the generated paths
 
     Returns:
         Boolean, True if all the interconnexions are possible with given bandwidths, False if at least one is impossible.
     """
     new_device_id = deployed_app_list[-1]
     for i in range(len(deployed_app_list)):
-        new_path = Path()
-        new_path.path_generation(devices_list, new_device_id, deployed_app_list[i])
+        new_path = get_path(devices_list, new_device_id, deployed_app_list[i], path_cache, metrics)
         if not reservable_bandwidth(new_path, proc_links[i][len(deployed_app_list)-1], physical_network_link_list):
             return False
     return True
 
 
-def application_deploy(app, device, devices_list, physical_network_link_list):
+def ordered_devices(device, routing_engine=None):
+    """
+    Lists the devices reachable from a given device, from the closest to the farthest
+
+    Args:
+        device : Device, source device
+        routing_engine : RoutingEngine, default to None to sort the device's routing table, else the engine's precomputed order is used
+
+    Returns:
+        (device_ids, distances) : (np.array, np.array), device IDs and their distance from device
+    """
+    if routing_engine is not None:
+        return routing_engine.neighbor_order(device.getDeviceID())
+
+    sorted_distance_from_device = sorted(((i, device.routing_table[i][1]) for i in device.routing_table), key=lambda x: x[1])
+    device_ids = np.array([device_id for device_id, _ in sorted_distance_from_device], dtype=np.int64)
+    distances = np.array([distance for _, distance in sorted_distance_from_device], dtype=float)
+    return device_ids, distances
+
+
+def reserve_process(app, proc_index, deployed_onto_devices, devices_list, physical_network_link_list, path_cache, ledger, metrics=None):
+    """
+    Reserves the resources of a processus on its device, and the bandwidth of its links to the processus deployed before it
+
+    Args:
+        app : Application
+        proc_index : int, index of the processus, deployed_onto_devices[proc_index] is its device
+        deployed_onto_devices : list, Device IDs of the processus deployed so far, in processus order
+        devices_list : List of devices, indexed by device ID
+        physical_network_link_list : List(PhysicalNetworkLink) or PhysicalNetworkLinkStore, physical links between devices
+        path_cache : PathCache, paths are reused from the cache if given
+        ledger : ReservationLedger, records the reservations
+        metrics : DeploymentMetrics, default to None, counts the generated paths
+
+    Returns:
+        operational_latency : float, latency of the links between the processus and the ones deployed before it
+    """
+    operational_latency = 0
+    device_id = deployed_onto_devices[proc_index]
+
+    # deploy on device
+    ledger.reserve_device(app.id, proc_index, devices_list[device_id], app.processus_list[proc_index])
+
+    # deploy links
+    for i in range(proc_index+1):
+        new_path = get_path(devices_list, device_id, deployed_onto_devices[i], path_cache, metrics)
+        if isinstance(physical_network_link_list, PhysicalNetworkLinkStore):
+            # One vector operation for the whole path
+            if path_cache is not None:
+                path_ids = path_cache.get_links(devices_list, device_id, deployed_onto_devices[i])
+            else:
+                path_ids = np.array(new_path.physical_links_path, dtype=np.int64)
+            known_links = physical_network_link_list.contains(path_ids)
+            for path_id in path_ids[~known_links].tolist():
+                logging.error("Physical network link error, expexted PhysicalNetworkLink, got no link for ID %s", path_id)
+            path_ids = path_ids[known_links]
+            operational_latency += physical_network_link_list.link_latency(path_ids).sum()
+        else:
+            path_ids = list()
+            for path_id in new_path.physical_links_path:
+                if physical_network_link_list[path_id] is not None:
+                    path_ids.append(path_id)
+                    operational_latency += physical_network_link_list[path_id].getPhysicalNetworkLinkLatency()
+                else:
+                    logging.error("Physical network link error, expexted PhysicalNetworkLink, got %s", physical_network_link_list[path_id])
+        ledger.reserve_links(app.id, (proc_index, i), path_ids, app.proc_links[proc_index][i], physical_network_link_list)
+
+    return operational_latency
+
+
+def device_link_bandwidth(physical_network_link_list, n_devices):
+    """
+    Returns, for each device, the largest available bandwidth on a link leaving or reaching it
+    Any flow of a processus uses one of these links, its device's own loop link when both processus share the device, another link otherwise
+
+    Args:
+        physical_network_link_list : List(PhysicalNetworkLink) or PhysicalNetworkLinkStore, physical links between devices
+        n_devices : int, number of devices
+
+    Returns:
+        (any_bandwidth, remote_bandwidth) : (np.array, np.array), largest available bandwidth indexed by device ID, over all links and over links to other devices, 0 for devices without links
+    """
+    any_bandwidth = np.zeros(n_devices)
+    remote_bandwidth = np.zeros(n_devices)
+    if isinstance(physical_network_link_list, PhysicalNetworkLinkStore):
+        available = physical_network_link_list.bandwidth - physical_network_link_list.bandwidth_use
+        remote = physical_network_link_list.device_1_ids != physical_network_link_list.device_2_ids
+        for device_ids in (physical_network_link_list.device_1_ids, physical_network_link_list.device_2_ids):
+            np.maximum.at(any_bandwidth, device_ids, available)
+            np.maximum.at(remote_bandwidth, device_ids[remote], available[remote])
+    else:
+        for link in physical_network_link_list:
+            if isinstance(link, PhysicalNetworkLink):
+                available = link.availableBandwidth()
+                for device_id in (link.device_1_id, link.device_2_id):
+                    any_bandwidth[device_id] = max(any_bandwidth[device_id], available)
+                    if link.device_1_id != link.device_2_id:
+                        remote_bandwidth[device_id] = max(remote_bandwidth[device_id], available)
+    return any_bandwidth, remote_bandwidth
+
+
+def process_order(requests, capacity, bandwidths):
+    """
+    Orders the processus of an application for the backtracking search, most constrained first
+    The largest processus, relative to the largest free capacity, comes first (heaviest links on ties), then at each step the processus with the heaviest links to the already ordered ones (largest on ties)
+
+    Args:
+        requests : np.array, num_procs*4 resource requests, in METRICS_RESOURCES order
+        capacity : np.array, largest free capacity of a device for each resource
+        bandwidths : np.array, num_procs*num_procs symmetric bandwidth between processus
+
+    Returns:
+        order : list of int, processus indexes in search order
+    """
+    capacity = np.where(capacity > 0, capacity, np.inf)
+    size = (requests / capacity).max(axis=1)
+    weight = bandwidths.sum(axis=1)
+
+    order = [max(range(len(size)), key=lambda proc: (size[proc], weight[proc]))]
+    remaining = [proc for proc in range(len(size)) if proc != order[0]]
+    while remaining:
+        linked = bandwidths[np.ix_(remaining, order)].sum(axis=1)
+        next_index = max(range(len(remaining)), key=lambda i: (linked[i], size[remaining[i]]))
+        order.append(remaining.pop(next_index))
+    return order
+
+
+def backtracking_placement(app, device, devices_list, physical_network_link_list, path_cache=None, routing_engine=None, metrics=None):
+    """
+    Searches a placement for all the processus of an application, depth first with backtracking, without reserving anything
+    Processus are placed most constrained first, each on the closest devices to the processus it is most linked to.
+    The resources and bandwidth taken by the processus already placed are accounted for, so that the placement can be reserved as a whole.
+
+    Requests are rejected before searching when a processus fits on no device, alone or because of its largest flow, or when the application needs more than the total free capacity.
+    Flows between two processus which fit on no device together can not use a device's loop link, they are bounded by the links to other devices.
+    During the search, a placement is undone as soon as a processus left to place has no device it fits on (forward checking).
+
+    Args:
+        app : Application, application to place
+        device : Device, \"Deployment Request Receptor\" device, the first processus is searched from it
+        devices_list : List of devices, indexed by device ID
+        physical_network_link_list : List(PhysicalNetworkLink) or PhysicalNetworkLinkStore, physical links between devices
+        path_cache : PathCache, default to None, paths are reused from the cache if given
+        routing_engine : RoutingEngine, default to None, precomputed device distance orders
+        metrics : DeploymentMetrics, default to None, counters and timers are only updated when given
+
+    Returns:
+        (placement, latency, tentatives, exhausted)
+            placement : list, Device ID of each processus in processus order, None if no placement was found
+            latency : float, distance of the last placed processus' device from the device it was searched from
+            tentatives : int, placements tried, at most MAX_TENTATIVES
+            exhausted : Bool, True if the search was cut off after MAX_TENTATIVES without finding a placement
+    """
+    n_procs = app.num_procs
+    device_table = device.table
+
+    if metrics is not None:
+        start = time.perf_counter()
+
+    requests = np.array([[proc.cpu_request, proc.gpu_request, proc.mem_request, proc.disk_request] for proc in app.processus_list], dtype=float).reshape(n_procs, 4)
+    if device_table is not None:
+        free = device_table.free_capacity()
+    else:
+        free = np.array([[candidate.cpu_limit - candidate.cpu_usage, candidate.gpu_limit - candidate.gpu_usage,
+                          candidate.mem_limit - candidate.mem_usage, candidate.disk_limit - candidate.disk_usage]
+                         if candidate is not None else [-np.inf]*4 for candidate in devices_list], dtype=float).reshape(len(devices_list), 4)
+
+    # Bandwidth of the flow between processus i and j, as checked by linkability (proc_links[i][j] for i <= j)
+    bandwidths = np.triu(app.proc_links)
+    bandwidths = bandwidths + np.triu(bandwidths, 1).T
+
+    # Devices each processus fits on alone, same rule as deployable_proc, with links large enough for its largest flows
+    candidates = np.all(requests[:, None, :] < free[None, :, :], axis=2)
+    pair_requests = requests[:, None, :] + requests[None, :, :]
+    colocatable = np.array([[np.all(pair_requests[i, j] < free, axis=1).any() for j in range(n_procs)] for i in range(n_procs)], dtype=bool).reshape(n_procs, n_procs)
+    np.fill_diagonal(colocatable, True)
+    any_bandwidth, remote_bandwidth = device_link_bandwidth(physical_network_link_list, len(devices_list))
+    candidates &= np.where(colocatable, bandwidths, 0).max(axis=1)[:, None] <= any_bandwidth[None, :]
+    candidates &= np.where(colocatable, 0, bandwidths).max(axis=1)[:, None] <= remote_bandwidth[None, :]
+
+    if metrics is not None:
+        metrics.seconds['feasibility'] += time.perf_counter() - start
+
+    if not candidates.any(axis=1).all() or (requests.sum(axis=0) > np.maximum(free, 0).sum(axis=0)).any():
+        return None, 0, 0, False
+
+    if metrics is not None:
+        start = time.perf_counter()
+    order = process_order(requests, free.max(axis=0), bandwidths)
+    if metrics is not None:
+        metrics.seconds['sorting'] += time.perf_counter() - start
+
+    placement = [None]*n_procs
+    # Resources and bandwidth taken by the processus placed so far
+    pending_usage = dict()
+    pending_bandwidth = dict()
+    # Number of candidate devices each processus still fits on
+    remaining_candidates = candidates.sum(axis=1)
+    device_orders = dict()
+    search = {'tentatives': 0, 'latency': 0, 'exhausted': False}
+
+    def fits(proc, device_id, usage):
+        return usage is None or bool(np.all(requests[proc] + usage < free[device_id]))
+
+    def path_links(device_source_id, device_destination_id):
+        path = get_path(devices_list, device_source_id, device_destination_id, path_cache, metrics)
+        if path_cache is not None:
+            return path_cache.get_links(devices_list, device_source_id, device_destination_id)
+        return np.array(path.physical_links_path, dtype=np.int64)
+
+    def flows_of(proc, device_id):
+        # Flows to the processus already placed, and the processus itself, None if one of them can not be reserved
+        # Paths go from the device of the highest processus index, as reserve_process reserves them
+        flows = list()
+        for other in range(n_procs):
+            if (other == proc or placement[other] is not None) and bandwidths[proc][other] > 0:
+                other_device_id = device_id if other == proc else placement[other]
+                if other > proc:
+                    link_ids = path_links(other_device_id, device_id)
+                else:
+                    link_ids = path_links(device_id, other_device_id)
+                if isinstance(physical_network_link_list, PhysicalNetworkLinkStore):
+                    available = physical_network_link_list.available_bandwidth(link_ids)
+                else:
+                    available = np.array([physical_network_link_list[link_id].availableBandwidth() for link_id in link_ids.tolist()], dtype=float)
+                if pending_bandwidth:
+                    available = available - np.array([pending_bandwidth.get(link_id, 0) for link_id in link_ids.tolist()], dtype=float)
+                if not bandwidths[proc][other] <= available.min():
+                    return None
+                flows.append((link_ids, bandwidths[proc][other]))
+        return flows
+
+    def place(proc, device_id, flows, sign):
+        # Adds (sign 1) or removes (sign -1) a processus and its flows, returns False if a processus left to place fits nowhere
+        usage = pending_usage.get(device_id)
+        new_usage = (usage if usage is not None else 0) + sign*requests[proc]
+        consistent = True
+        for other in range(n_procs):
+            if placement[other] is None and other != proc and candidates[other][device_id]:
+                before = fits(other, device_id, usage)
+                after = fits(other, device_id, new_usage)
+                if before != after:
+                    remaining_candidates[other] += 1 if after else -1
+                consistent &= remaining_candidates[other] > 0
+        pending_usage[device_id] = new_usage
+        for link_ids, bandwidth in flows:
+            for link_id in link_ids.tolist():
+                pending_bandwidth[link_id] = pending_bandwidth.get(link_id, 0) + sign*bandwidth
+        placement[proc] = device_id if sign > 0 else None
+        return consistent
+
+    def anchor(depth):
+        # Closest devices are searched from the placed processus most linked to this one, else the last placed one
+        if depth == 0:
+            return device.getDeviceID()
+        proc = order[depth]
+        placed = order[:depth]
+        linked = bandwidths[proc][placed]
+        return placement[placed[int(np.argmax(linked))] if linked.max() > 0 else placed[-1]]
+
+    def place_from(depth):
+        if depth == n_procs:
+            return True
+        proc = order[depth]
+
+        anchor_id = anchor(depth)
+        if anchor_id not in device_orders:
+            device_orders[anchor_id] = ordered_devices(devices_list[anchor_id], routing_engine)
+        sorted_device_ids, sorted_distances = device_orders[anchor_id]
+        proc_candidates = candidates[proc][sorted_device_ids]
+
+        for device_id, distance in zip(sorted_device_ids[proc_candidates].tolist(), sorted_distances[proc_candidates].tolist()):
+            if search['tentatives'] >= MAX_TENTATIVES:
+                search['exhausted'] = True
+                return False
+            if metrics is not None:
+                metrics.devices_tested += 1
+            if not fits(proc, device_id, pending_usage.get(device_id)):
+                continue
+
+            search['tentatives'] += 1
+            if metrics is not None:
+                metrics.linkability_calls += 1
+                start = time.perf_counter()
+            flows = flows_of(proc, device_id)
+            if metrics is not None:
+                metrics.seconds['linking'] += time.perf_counter() - start
+                metrics.linkability_failures += flows is None
+            if flows is None:
+                continue
+
+            if place(proc, device_id, flows, 1):
+                search['latency'] = distance
+                if place_from(depth+1):
+                    return True
+            place(proc, device_id, flows, -1)
+        return False
+
+    if place_from(0):
+        return list(placement), search['latency'], search['tentatives'], False
+    return None, 0, search['tentatives'], search['exhausted']
+
+
+def application_deploy(app, device, devices_list, physical_network_link_list, path_cache=None, routing_engine=None, verbose=True, ledger=None, metrics=None, event_log=None, search='tentatives', capacity_index=None, bandwidth_routing=None):
     """
     Tries to deploy a multi-processus application from a given device
 
@@ -70,6 +503,17 @@ def application_deploy(app, device, devices_list, physical_network_link_list):
     Args:
         app : Application, application to deploy
         device : Device, first device to try deployment, \"Deployment Request Receptor\" device
+        devices_list : List of devices, indexed by device ID
+        physical_network_link_list : List(PhysicalNetworkLink) or PhysicalNetworkLinkStore, physical links between devices
+        path_cache : PathCache, default to None, shared paths for linkability and link reservation
+        routing_engine : RoutingEngine, default to None, source devices use the engine's distance order instead of sorting their routing table
+        verbose : Bool, default to True to print the deployment result
+        ledger : ReservationLedger, default to None, records the application's reservations so that it can be undeployed, a local ledger is used for rollback if None
+        metrics : DeploymentMetrics, default to None, counters and timers are only updated when given
+        event_log : DeploymentEventLog, default to None, records the deployment result
+        search : str, default to 'tentatives' to retry from the closest devices, 'backtracking' for a depth first search of the whole placement
+        capacity_index : CapacityIndex, default to None, lists the devices able to host a processus, used along with routing_engine
+        bandwidth_routing : BandwidthRouting, default to None, paths follow bandwidth weighted routes, refreshed before the deployment
 
     Returns:
         (deployment_success, latency, operational_latency, deployed_onto_devices)
@@ -86,73 +530,159 @@ def application_deploy(app, device, devices_list, physical_network_link_list):
     # Get ordered device distance
 
     deployed_onto_devices = list()
-    first_dev_exclusion_list = list()
+    # Devices excluded as first deployment device, as a mask over device IDs
+    first_dev_excluded = np.zeros(len(devices_list), dtype=bool)
+
+    # Per candidate debug messages are skipped altogether unless debug logging is enabled
+    debug = logging.getLogger().isEnabledFor(logging.DEBUG)
+    if debug:
+        logging.debug("Deployment procedure from %s", device.getDeviceID())
+
+    # Every reservation is recorded, so that a failed deployment releases exactly what it allocated
+    if ledger is None:
+        ledger = ReservationLedger()
+    elif app.id in ledger:
+        raise ValueError(f"Application {app.id} is already deployed")
 
-    logging.debug(f"Deployment procedure from {device.getDeviceID()}")
+    # Devices bound to a DeviceTable are filtered with one feasibility mask per processus
+    device_table = device.table
 
     deployment_success = True
 
+    if metrics is not None:
+        metrics.deployments += 1
+
+    if search not in SEARCH_MODES:
+        raise ValueError(f"Unknown search mode {search}, expected one of {SEARCH_MODES}")
+
+    if bandwidth_routing is not None:
+        # Routes are repaired for the reservations and releases since the last deployment, they do not change during this one
+        if metrics is not None:
+            start = time.perf_counter()
+        bandwidth_routing.refresh()
+        if metrics is not None:
+            metrics.seconds['routing'] += time.perf_counter() - start
+
     tentatives = 0
-    while len(deployed_onto_devices) < app.num_procs and tentatives < MAX_TENTATIVES:
+    # Set when the search gave up after MAX_TENTATIVES, not when it ran out of devices
+    exhausted = False
+    if device_table is not None and not admission_check(app, device_table):
+        # Requests which can not fit anywhere are rejected before any path work
+        if debug:
+            logging.debug("Application %s rejected by admission check", app.id)
+        deployment_success = False
+        if metrics is not None:
+            metrics.admission_rejections += 1
+    elif search == 'backtracking':
+        # The whole placement is searched first, then reserved processus by processus
+        placement, latency, tentatives, exhausted = backtracking_placement(app, device, devices_list, physical_network_link_list, path_cache, routing_engine, metrics)
+        if placement is None:
+            deployment_success = False
+        else:
+            if metrics is not None:
+                start = time.perf_counter()
+            for proc_index, device_id in enumerate(placement):
+                deployed_onto_devices.append(device_id)
+                operational_latency += reserve_process(app, proc_index, deployed_onto_devices, devices_list, physical_network_link_list, path_cache, ledger, metrics)
+            if metrics is not None:
+                metrics.seconds['reservation'] += time.perf_counter() - start
+
+    while deployment_success and len(deployed_onto_devices) < app.num_procs and tentatives < MAX_TENTATIVES:
 
         tentatives +=1
 
-        if len(deployed_onto_devices) == 0 and len(first_dev_exclusion_list)==0:
-            distance_from_device = {i: device.routing_table[i][1] for i in device.routing_table}
-            sorted_distance_from_device = sorted(distance_from_device.items(), key=lambda x: x[1])
-            logging.debug(f"Deployment source {sorted_distance_from_device[0][0]}")
+        if metrics is not None:
+            start = time.perf_counter()
+
+        if len(deployed_onto_devices) == 0 and not first_dev_excluded.any():
+            source_id = device.getDeviceID()
+            sorted_device_ids, sorted_distances = ordered_devices(device, routing_engine)
+            logging.debug("Deployment source %s", sorted_device_ids[0])
         else:
             if len(deployed_onto_devices)!= 0:
                 new_source_device = devices_list[deployed_onto_devices[-1]]
             else:
-                distance_from_device = {i: device.routing_table[i][1] for i in device.routing_table}
-                if len(first_dev_exclusion_list) == len(distance_from_device):
+                sorted_device_ids, _ = ordered_devices(device, routing_engine)
+                remaining_device_ids = sorted_device_ids[~first_dev_excluded[sorted_device_ids]]
+                if len(remaining_device_ids) == 0:
                     deployment_success = False
                     break
                 else:
-                    for j in first_dev_exclusion_list:
-                        if j in distance_from_device:
-                            del distance_from_device[j]
-                    sorted_distance_from_device = sorted(distance_from_device.items(), key=lambda x: x[1])
-                    new_source_device = sorted_distance_from_device[0][0]
+                    new_source_device = devices_list[remaining_device_ids[0]]
+
+            source_id = new_source_device.getDeviceID()
+            sorted_device_ids, sorted_distances = ordered_devices(new_source_device, routing_engine)
+
+            logging.debug("Switching deployment source to %s", sorted_device_ids[0])
+
+        if metrics is not None:
+            metrics.seconds['sorting'] += time.perf_counter() - start
+            start = time.perf_counter()
+
+        fitting_device_ids = None
+        if capacity_index is not None and routing_engine is not None:
+            fitting_device_ids = capacity_index.fitting_devices(app.processus_list[len(deployed_onto_devices)], int(len(sorted_device_ids) * CAPACITY_INDEX_FRACTION))
+
+        feasible = None
+        prefiltered = True
+        if fitting_device_ids is not None:
+            # Few devices can host the processus, they are ordered by distance (same order as the engine's) instead of filtering the whole order
+            fitting_distances = routing_engine.distance[source_id, fitting_device_ids]
+            order = np.argsort(fitting_distances, kind='stable')
+            order = order[np.isfinite(fitting_distances[order])]
+            candidates = zip(fitting_device_ids[order].tolist(), fitting_distances[order].tolist())
+        elif device_table is not None:
+            # Nearest feasible devices first, only those are tested for linkability
+            feasible = feasibility_mask(app.processus_list[len(deployed_onto_devices)], device_table)
+            feasible_devices = feasible[sorted_device_ids]
+            candidates = zip(sorted_device_ids[feasible_devices].tolist(), sorted_distances[feasible_devices].tolist())
+        else:
+            prefiltered = False
+            candidates = zip(sorted_device_ids.tolist(), sorted_distances.tolist())
 
-            distance_from_device = {i: new_source_device.routing_table[i][1] for i in new_source_device.routing_table}
-            sorted_distance_from_device = sorted(distance_from_device.items(), key=lambda x: x[1])
+        if metrics is not None:
+            metrics.seconds['feasibility'] += time.perf_counter() - start
+            tested_proc_index = len(deployed_onto_devices)
+            tested_proc = app.processus_list[tested_proc_index]
 
-            logging.debug(f"Switching deployment source to {sorted_distance_from_device[0][0]}")
+        for device_id, deployment_latency in candidates:
 
-        for device_id, deployment_latency in sorted_distance_from_device:
+            if debug:
+                logging.debug("Testing deployment on device %s", device_id)
 
-            logging.debug(f"Testing deployment on device {device_id}")
+            if metrics is not None:
+                metrics.devices_tested += 1
+                if not prefiltered:
+                    start = time.perf_counter()
+                    resource = missing_resource(tested_proc, devices_list[device_id])
+                    metrics.seconds['feasibility'] += time.perf_counter() - start
+                    if resource >= 0:
+                        metrics.rejections[METRICS_RESOURCES[resource]] += 1
 
-            if deployable_proc(app.processus_list[len(deployed_onto_devices)], devices_list[device_id]):
+            if prefiltered or deployable_proc(app.processus_list[len(deployed_onto_devices)], devices_list[device_id]):
 
-                logging.debug(f"Deployment possible on device {device_id}")
+                if debug:
+                    logging.debug("Deployment possible on device %s", device_id)
 
                 deployed_onto_devices.append(device_id)
 
-                if linkability(deployed_onto_devices, app.proc_links, devices_list, physical_network_link_list):
-
-                    # deploy on device
-                    device_deployed_onto = devices_list[device_id]
+                if metrics is not None:
+                    metrics.linkability_calls += 1
+                    start = time.perf_counter()
+                    linkable = linkability(deployed_onto_devices, app.proc_links, devices_list, physical_network_link_list, path_cache, metrics)
+                    metrics.seconds['linking'] += time.perf_counter() - start
+                    metrics.linkability_failures += not linkable
+                    start = time.perf_counter()
+                else:
+                    linkable = linkability(deployed_onto_devices, app.proc_links, devices_list, physical_network_link_list, path_cache)
 
-                    device_deployed_onto.setDeviceCPUUsage(device_deployed_onto.cpu_usage + app.processus_list[len(deployed_onto_devices)-1].cpu_request)
-                    device_deployed_onto.setDeviceGPUUsage(device_deployed_onto.gpu_usage + app.processus_list[len(deployed_onto_devices)-1].gpu_request)
-                    device_deployed_onto.setDeviceDiskUsage(device_deployed_onto.disk_usage + app.processus_list[len(deployed_onto_devices)-1].disk_request)
-                    device_deployed_onto.setDeviceMemUsage(device_deployed_onto.mem_usage + app.processus_list[len(deployed_onto_devices)-1].mem_request)
+                if linkable:
 
-                    devices_list[device_id] = device_deployed_onto
+                    # deploy on device and links
+                    operational_latency += reserve_process(app, len(deployed_onto_devices)-1, deployed_onto_devices, devices_list, physical_network_link_list, path_cache, ledger, metrics)
 
-                    # deploy links
-                    for i in range(len(deployed_onto_devices)):
-                        new_path = Path()
-                        new_path.path_generation(devices_list, device_id, deployed_onto_devices[i])
-                        for path_id in new_path.physical_links_path:
-                            if physical_network_link_list[path_id] is not None:
-                                physical_network_link_list[path_id].useBandwidth(app.proc_links[len(deployed_onto_devices)-1][i])
-                                operational_latency += physical_network_link_list[path_id].getPhysicalNetworkLinkLatency()
-                            else:
-                                logging.error(f"Physical network link error, expexted PhysicalNetworkLink, got {physical_network_link_list[path_id]}")
+                    if metrics is not None:
+                        metrics.seconds['reservation'] += time.perf_counter() - start
 
                     # get values
 
@@ -163,29 +693,143 @@ def application_deploy(app, device, devices_list, physical_network_link_list):
                 else:
                     deployed_onto_devices.pop()
             else:
-                logging.debug(f"Impossible to deploy on {device_id}, testing next closest device")
-
-    if (not deployment_success) or (tentatives == MAX_TENTATIVES):
-        for i in range(len(deployed_onto_devices)):
-            device_id = deployed_onto_devices[i]
-
-            device_deployed_onto = devices_list[device_id]
+                if debug:
+                    logging.debug("Impossible to deploy on %s, testing next closest device", device_id)
 
-            device_deployed_onto.setDeviceCPUUsage(device_deployed_onto.cpu_usage - app.processus_list[i].cpu_request)
-            device_deployed_onto.setDeviceGPUUsage(device_deployed_onto.gpu_usage - app.processus_list[i].gpu_request)
-            device_deployed_onto.setDeviceDiskUsage(device_deployed_onto.disk_usage - app.processus_list[i].disk_request)
-            device_deployed_onto.setDeviceMemUsage(device_deployed_onto.mem_usage - app.processus_list[i].mem_request)
-
-            devices_list[device_id] = device_deployed_onto
+        if metrics is not None and feasible is not None:
+            # Devices skipped by the feasibility mask, up to the device the process was deployed on
+            if len(deployed_onto_devices) > tested_proc_index:
+                scanned_device_ids = sorted_device_ids[:np.flatnonzero(sorted_device_ids == deployed_onto_devices[-1])[0]+1]
+            else:
+                scanned_device_ids = sorted_device_ids
+            rejected_device_ids = scanned_device_ids[~feasible[scanned_device_ids]]
+            metrics.devices_tested += len(rejected_device_ids)
+            for resource, count in zip(METRICS_RESOURCES, missing_resources(tested_proc, device_table, rejected_device_ids).tolist()):
+                metrics.rejections[resource] += count
+
+    # The tentatives loop only stops with processus left to place when it used all its tentatives
+    exhausted = exhausted or (deployment_success and len(deployed_onto_devices) < app.num_procs)
+
+    if metrics is not None:
+        metrics.tentatives += tentatives
+        metrics.tentatives_exhausted += exhausted
+
+    # A placement completed on the last tentative is kept
+    if (not deployment_success) or len(deployed_onto_devices) < app.num_procs:
+        # Rollback, device resources and link bandwidth
+        if metrics is not None:
+            start = time.perf_counter()
+        ledger.release(app.id, devices_list, physical_network_link_list)
+        if metrics is not None:
+            metrics.seconds['reservation'] += time.perf_counter() - start
 
         deployment_success = False
         latency = 0
         operational_latency = 0
         deployed_onto_devices = list()
 
-    if len(deployed_onto_devices) !=0:
-        print(f"application id : {app.id} , {app.num_procs} processus deployed on {deployed_onto_devices}")
-    else:
-        print(f"application id : {app.id} , {app.num_procs} processus not deployed")
+    if metrics is not None:
+        metrics.successes += deployment_success
+
+    if event_log is not None:
+        event_log.record(app.id, device.getDeviceID(), deployment_success, latency, operational_latency, deployed_onto_devices, tentatives)
+
+    if verbose:
+        if len(deployed_onto_devices) !=0:
+            print(f"application id : {app.id} , {app.num_procs} processus deployed on {deployed_onto_devices}")
+        else:
+            print(f"application id : {app.id} , {app.num_procs} processus not deployed")
 
     return deployment_success, latency, operational_latency, deployed_onto_devices
+
+
+def undeploy(app_id, devices_list, physical_network_link_list, ledger):
+    """
+    Tears down a deployed application, its device resources and link bandwidth are released
+
+    Args:
+        app_id : int, ID of the application to remove
+        devices_list : List of devices, indexed by device ID
+        physical_network_link_list : List(PhysicalNetworkLink) or PhysicalNetworkLinkStore, physical links between devices
+        ledger : ReservationLedger, ledger the application was deployed with
+
+    Returns:
+        Boolean, True if the application was deployed and is now removed, else False
+    """
+    if ledger.release(app_id, devices_list, physical_network_link_list):
+        logging.info(f"application {app_id} undeployed")
+        return True
+
+    logging.warning(f"Undeploy of application {app_id} requested, but it is not deployed")
+    return False
+
+
+def packing_order(apps, devices_list, packing='decreasing'):
+    """
+    Orders applications before a batch deployment, largest first so that small applications fill the remaining gaps
+    An application's size is its dominant share : the highest, over all resources, of its total request divided by the cluster's total capacity
+
+    Args:
+        apps : list of Application
+        devices_list : List of devices, used to get the cluster's total capacity
+        packing : str, 'decreasing' for largest dominant share first, 'none' to keep the given order
+
+    Returns:
+        order : list of int, indexes in apps in deployment order
+    """
+    if packing == 'none':
+        return list(range(len(apps)))
+    if packing != 'decreasing':
+        raise ValueError(f"Unknown packing heuristic {packing}, expected 'none' or 'decreasing'")
+
+    devices = [device for device in devices_list if device is not None]
+    capacity = np.array([[device.cpu_limit, device.gpu_limit, device.mem_limit, device.disk_limit] for device in devices], dtype=float).sum(axis=0)
+    capacity[capacity == 0] = np.inf
+
+    requests = np.array([np.sum([[proc.cpu_request, proc.gpu_request, proc.mem_request, proc.disk_request] for proc in app.processus_list], axis=0) for app in apps], dtype=float).reshape(len(apps), 4)
+    dominant_share = (requests / capacity).max(axis=1)
+
+    return np.argsort(-dominant_share, kind='stable').tolist()
+
+
+def application_deploy_batch(apps, sources, devices_list, physical_network_link_list, path_cache=None, routing_engine=None, packing='none', ledger=None, metrics=None, event_log=None, search='tentatives', capacity_index=None, bandwidth_routing=None):
+    """
+    Deploys a burst of applications, sharing paths and device orders across the whole batch
+
+    Args:
+        apps : list of Application, applications to deploy
+        sources : list of Device or int, first device to try deployment for each application (or its device ID)
+        devices_list : List of devices, indexed by device ID
+        physical_network_link_list : List(PhysicalNetworkLink) or PhysicalNetworkLinkStore, physical links between devices
+        path_cache : PathCache, default to None to use a cache for the batch only
+        routing_engine : RoutingEngine, default to None, precomputed device distance orders
+        packing : str, default to 'none' to deploy in the given order, 'decreasing' to deploy the largest applications first
+        ledger : ReservationLedger, default to None, records the deployed applications so that they can be undeployed
+        metrics : DeploymentMetrics, default to None, accumulates the metrics of all deployments
+        event_log : DeploymentEventLog, default to None, records each deployment result
+        search : str, default to 'tentatives', placement search mode of each deployment, one of SEARCH_MODES
+        capacity_index : CapacityIndex, default to None, lists the devices able to host a processus
+        bandwidth_routing : BandwidthRouting, default to None, paths follow bandwidth weighted routes, path_cache must then be subscribed to it
+
+    Returns:
+        results : np.array of DEPLOYMENT_RESULT_DTYPE, one record per application, in the same order as apps
+    """
+    if path_cache is None and bandwidth_routing is None:
+        # Routes do not change during the batch
+        path_cache = PathCache()
+
+    results = np.zeros(len(apps), dtype=DEPLOYMENT_RESULT_DTYPE)
+
+    for index in packing_order(apps, devices_list, packing):
+        app = apps[index]
+        source = sources[index]
+        if not hasattr(source, 'routing_table'):
+            source = devices_list[source]
+
+        success, latency, operational_latency, deployed_onto_devices = application_deploy(app, source, devices_list, physical_network_link_list, path_cache, routing_engine, verbose=False, ledger=ledger, metrics=metrics, event_log=event_log, search=search, capacity_index=capacity_index, bandwidth_routing=bandwidth_routing)
+
+        results[index] = (app.id, source.getDeviceID(), success, latency, operational_latency, deployed_onto_devices)
+
+    logging.info(f"Batch deployment, {results['success'].sum()} out of {len(apps)} applications deployed")
+
+    return results
@@ -0,0 +1,361 @@
+"""
+Event simulation module, discrete-event simulation of application arrivals and departures
+
+Applications arrive following an arrival process, are deployed from a random device, stay deployed for a random lifetime, then leave and release their resources.
+Events are kept in a heap, only the next arrival and the departures of deployed applications are pending at any time, and statistics are accumulated on the fly, so memory does not grow with the number of events.
+
+Usage:
+
+    python3 modelisation-2d.py --churn=10000 --arrival=poisson --arrival-rate=1 --lifetime=40
+
+"""
+import heapq
+import itertools
+import logging
+import random
+
+import numpy as np
+
+from modules.Application import Application
+from modules.PhysicalNetworkLink import PhysicalNetworkLink
+from modules.PhysicalNetworkLinkStore import PhysicalNetworkLinkStore
+from modules.ReservationLedger import ReservationLedger
+
+from deployment import application_deploy
+from deployment import undeploy
+
+# Event types, departures first when events happen at the same time, so that resources are released before new deployments
+DEPARTURE = 0
+ARRIVAL = 1
+
+# Utilization is tracked for device resources and link bandwidth, in this order
+UTILIZATION_RESOURCES = ['cpu', 'gpu', 'mem', 'disk', 'bandwidth']
+
+
+def poisson_arrivals(rate):
+    """
+    Poisson arrival process, inter-arrival times are exponentially distributed
+
+    Args:
+        rate : float, mean number of arrivals per time unit
+
+    Returns:
+        function() -> float, draws the time to the next arrival
+    """
+    return lambda: random.expovariate(rate)
+
+
+def constant_arrivals(rate):
+    """
+    Deterministic arrival process, applications arrive at regular intervals
+
+    Args:
+        rate : float, number of arrivals per time unit
+
+    Returns:
+        function() -> float, draws the time to the next arrival
+    """
+    return lambda: 1 / rate
+
+
+def uniform_arrivals(rate):
+    """
+    Arrival process with inter-arrival times uniformly distributed between 0 and twice the mean
+
+    Args:
+        rate : float, mean number of arrivals per time unit
+
+    Returns:
+        function() -> float, draws the time to the next arrival
+    """
+    return lambda: random.uniform(0, 2 / rate)
+
+
+ARRIVAL_PROCESSES = {'poisson': poisson_arrivals,
+                     'constant': constant_arrivals,
+                     'uniform': uniform_arrivals}
+
+
+def exponential_lifetimes(mean):
+    """
+    Exponentially distributed application lifetimes
+
+    Args:
+        mean : float, mean lifetime
+
+    Returns:
+        function(Application) -> float, draws the lifetime of a deployed application
+    """
+    return lambda application: random.expovariate(1 / mean)
+
+
+def random_application():
+    """
+    Default application generator, same random applications as simulate_deployments
+
+    Args:
+        None
+
+    Returns:
+        application : Application
+    """
+    application = Application()
+    application.randomAppInit()
+    return application
+
+
+class EventSimulator:
+    # An EventSimulator runs applications arrivals and departures over an already routed cluster
+    # The heap holds (time, event type, sequence number, application ID) tuples, the sequence number keeps the order of simultaneous events stable
+    # Reservations are recorded in a ReservationLedger, a departure undeploys the application
+    # Utilization is integrated over time : the integral of used/total capacity, divided by the measured duration, gives the time-weighted utilization
+
+    def __init__(self, devices_list, physical_network_link_list, path_cache=None, routing_engine=None,
+                 arrivals=None, lifetimes=None, application_generator=random_application, warmup=0, metrics=None, event_log=None, search='tentatives', capacity_index=None, bandwidth_routing=None) -> None:
+        """
+        Initializes the simulator, the first arrival is scheduled at time 0
+
+        Args:
+            devices_list : List of devices, indexed by device ID
+            physical_network_link_list : List(PhysicalNetworkLink) or PhysicalNetworkLinkStore, physical links between devices
+            path_cache : PathCache, default to None, paths shared between deployments
+            routing_engine : RoutingEngine, default to None, precomputed device distance orders
+            arrivals : function() -> float, time to the next arrival, default to a Poisson process of rate 1
+            lifetimes : function(Application) -> float, lifetime of a deployed application, default to exponential lifetimes of mean 10
+            application_generator : function() -> Application, generates arriving applications
+            warmup : float, default to 0, statistics are only measured after this time
+            metrics : DeploymentMetrics, default to None, hot-path metrics of all deployments, warmup included
+            event_log : DeploymentEventLog, default to None, records each deployment result, warmup included
+            search : str, default to 'tentatives', placement search mode, one of deployment.SEARCH_MODES
+            capacity_index : CapacityIndex, default to None, lists the devices able to host a processus
+            bandwidth_routing : BandwidthRouting, default to None, paths follow bandwidth weighted routes
+
+        Returns:
+            None
+        """
+        self.devices_list = devices_list
+        self.physical_network_link_list = physical_network_link_list
+        self.path_cache = path_cache
+        self.routing_engine = routing_engine
+
+        self.arrivals = arrivals if arrivals is not None else poisson_arrivals(1)
+        self.lifetimes = lifetimes if lifetimes is not None else exponential_lifetimes(10)
+        self.application_generator = application_generator
+        self.warmup = warmup
+        self.metrics = metrics
+        self.event_log = event_log
+        self.search = search
+        self.capacity_index = capacity_index
+        self.bandwidth_routing = bandwidth_routing
+
+        self.ledger = ReservationLedger()
+        self.queue = list()
+        self.sequence = itertools.count()
+        self.now = 0
+
+        self.source_ids = [device.getDeviceID() for device in devices_list if device is not None]
+
+        # Total capacity and current usage, in UTILIZATION_RESOURCES order
+        devices = [device for device in devices_list if device is not None]
+        self.capacity = np.array([sum(device.cpu_limit for device in devices),
+                                  sum(device.gpu_limit for device in devices),
+                                  sum(device.mem_limit for device in devices),
+                                  sum(device.disk_limit for device in devices),
+                                  self._link_bandwidth().sum()], dtype=float)
+        self.usage = np.array([sum(device.cpu_usage for device in devices),
+                               sum(device.gpu_usage for device in devices),
+                               sum(device.mem_usage for device in devices),
+                               sum(device.disk_usage for device in devices),
+                               self._link_bandwidth(used=True).sum()], dtype=float)
+        # Usage of each deployed application, removed on departure
+        self.footprints = dict()
+
+        # Statistics, measured after warmup
+        self.usage_integral = np.zeros(len(UTILIZATION_RESOURCES))
+        self.deployed_integral = 0
+        self.measured_time = 0
+        self.events = 0
+        self.arrived = 0
+        self.accepted = 0
+        self.departed = 0
+        self.latency = 0
+        self.operational_latency = 0
+
+        self.schedule(0, ARRIVAL)
+
+    def _link_bandwidth(self, used=False):
+        """
+        Returns the bandwidth of all physical links
+
+        Args:
+            used : Boolean, default to False for the total bandwidth, True for the reserved bandwidth
+
+        Returns:
+            np.array, bandwidth of each link (in kBytes/s)
+        """
+        if isinstance(self.physical_network_link_list, PhysicalNetworkLinkStore):
+            return self.physical_network_link_list.bandwidth_use if used else self.physical_network_link_list.bandwidth
+        return np.array([link.bandwidth_use if used else link.bandwidth for link in self.physical_network_link_list if isinstance(link, PhysicalNetworkLink)], dtype=float)
+
+    def schedule(self, time, event, app_id=-1):
+        """
+        Adds an event to the queue
+
+        Args:
+            time : float, event time
+            event : int, ARRIVAL or DEPARTURE
+            app_id : int, Application ID of a departure
+
+        Returns:
+            None
+        """
+        heapq.heappush(self.queue, (time, event, next(self.sequence), app_id))
+
+    def _advance(self, time):
+        """
+        Moves the clock forward, integrating the current utilization over the elapsed measured time
+
+        Args:
+            time : float, new time
+
+        Returns:
+            None
+        """
+        elapsed = time - max(self.now, self.warmup)
+        if elapsed > 0:
+            self.usage_integral += self.usage * elapsed
+            self.deployed_integral += len(self.footprints) * elapsed
+            self.measured_time += elapsed
+        self.now = time
+
+    def _footprint(self, app_id):
+        """
+        Computes the resources and bandwidth reserved by a deployed application from its ledger record
+
+        Args:
+            app_id : int, Application ID
+
+        Returns:
+            np.array, reserved resources in UTILIZATION_RESOURCES order
+        """
+        record = self.ledger.reservations[app_id]
+        footprint = np.zeros(len(UTILIZATION_RESOURCES))
+        for _, _, request in record['devices']:
+            footprint[:4] += request
+        for _, links, bandwidth in record['flows']:
+            footprint[4] += bandwidth * len(links)
+        return footprint
+
+    def _arrival(self):
+        """
+        Deploys an arriving application and schedules its departure and the next arrival
+
+        Args:
+            None
+
+        Returns:
+            None
+        """
+        application = self.application_generator()
+        source = self.devices_list[random.choice(self.source_ids)]
+
+        success, latency, operational_latency, deployed_onto_devices = application_deploy(application, source, self.devices_list, self.physical_network_link_list,
+                                                                                           self.path_cache, self.routing_engine, verbose=False, ledger=self.ledger, metrics=self.metrics,
+                                                                                           event_log=self.event_log, search=self.search, capacity_index=self.capacity_index,
+                                                                                           bandwidth_routing=self.bandwidth_routing)
+
+        measured = self.now >= self.warmup
+        self.arrived += measured
+        if success:
+            footprint = self._footprint(application.id)
+            self.footprints[application.id] = footprint
+            self.usage += footprint
+            self.schedule(self.now + self.lifetimes(application), DEPARTURE, application.id)
+            if measured:
+                self.accepted += 1
+                self.latency += latency
+                self.operational_latency += operational_latency
+
+        self.schedule(self.now + self.arrivals(), ARRIVAL)
+
+    def _departure(self, app_id):
+        """
+        Undeploys a leaving application
+
+        Args:
+            app_id : int, Application ID
+
+        Returns:
+            None
+        """
+        undeploy(app_id, self.devices_list, self.physical_network_link_list, self.ledger)
+        self.usage -= self.footprints.pop(app_id)
+        self.departed += self.now >= self.warmup
+
+    def run(self, horizon=None, max_events=None):
+        """
+        Processes events until the horizon or the maximum number of events is reached, can be called again to continue
+
+        Args:
+            horizon : float, default to None, simulation end time
+            max_events : int, default to None, maximum number of events to process
+
+        Returns:
+            summary : dict, see summary
+        """
+        if horizon is None and max_events is None:
+            raise ValueError("Either horizon or max_events must be set")
+
+        processed = 0
+        while self.queue and (max_events is None or processed < max_events):
+            if horizon is not None and self.queue[0][0] > horizon:
+                break
+            time, event, _, app_id = heapq.heappop(self.queue)
+            self._advance(time)
+            if event == ARRIVAL:
+                self._arrival()
+            else:
+                self._departure(app_id)
+            processed += 1
+
+        self.events += processed
+        if horizon is not None and (max_events is None or processed < max_events):
+            self._advance(max(horizon, self.now))
+
+        logging.info(f"Event simulation at time {self.now}, {self.events} events, {self.accepted} out of {self.arrived} applications accepted")
+
+        return self.summary()
+
+    def summary(self):
+        """
+        Returns the statistics measured after warmup
+
+        Args:
+            None
+
+        Returns:
+            summary : dict
+                time : float, current simulation time
+                events : int, number of processed events
+                arrived, accepted, departed : int, number of applications
+                acceptance : float, ratio of accepted applications
+                latency, operational_latency : float, mean latencies of accepted applications
+                deployed : float, time-weighted mean number of deployed applications
+                utilization : dict {resource: float}, time-weighted ratio of used capacity, for each of UTILIZATION_RESOURCES
+                pending_events : int, size of the event queue
+        """
+        measured_time = self.measured_time if self.measured_time > 0 else np.inf
+        capacity = np.where(self.capacity > 0, self.capacity, np.inf)
+        utilization = self.usage_integral / measured_time / capacity
+
+        return {'time': self.now,
+                'events': self.events,
+                'arrived': self.arrived,
+                'accepted': self.accepted,
+                'departed': self.departed,
+                'acceptance': self.accepted / self.arrived if self.arrived else 0,
+                'latency': self.latency / self.accepted if self.accepted else 0,
+                'operational_latency': self.operational_latency / self.accepted if self.accepted else 0,
+                'deployed': self.deployed_integral / measured_time,
+                'utilization': dict(zip(UTILIZATION_RESOURCES, utilization.tolist())),
+                'pending_events': len(self.queue)}
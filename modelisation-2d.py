@@ -10,19 +10,46 @@ Usage:
 
 from modules.Application import Application
 from modules.Device import Device
+from modules.DeviceTable import DeviceTable
 from modules.PhysicalNetworkLink import PhysicalNetworkLink
+from modules.PhysicalNetworkLinkStore import PhysicalNetworkLinkStore
 from modules.Processus import Processus
 from modules.Path import Path
+from modules.PathCache import PathCache
+from modules.CapacityIndex import CapacityIndex
+from modules.BandwidthRouting import BandwidthRouting
+from modules.ReservationLedger import ReservationLedger
 
 from modules.db.interact_db import create_db
 from modules.db.interact_db import populate_db
-from modules.db.interact_db import dump_from_db
-
-from simulation import generate_and_plot_devices
+from modules.db.interact_db import load_devices
+from modules.db.interact_db import topology_fingerprint
+from modules.db.interact_db import store_topology
+from modules.db.interact_db import load_topology
+from modules.db.interact_db import DeviceUsageWriter
+from modules.db.interact_db import load_reservations
+
+from simulation import generate_devices
+from simulation import plot_devices
 from simulation import generate_routing_table
+from simulation import fill_physical_links
+from simulation import wifi_range
 from simulation import simulate_deployments
+from simulation import simulate_replications
+from simulation import plot_replications
+from simulation import ROUTING_ENGINE
 
 from deployment import application_deploy
+from deployment import SEARCH_MODES
+
+from modules.DeploymentMetrics import DeploymentMetrics
+from modules.DeploymentEventLog import DeploymentEventLog
+
+from service import run_service
+
+from event_simulation import EventSimulator
+from event_simulation import ARRIVAL_PROCESSES
+from event_simulation import exponential_lifetimes
 
 import argparse
 import yaml
@@ -47,9 +74,71 @@ def parse_args():
     parser.add_argument('--simulate',
                         help='Boolean, default to False, run simulator if true',
                         default=False)
+    parser.add_argument('--plot',
+                        help='Plot the device graph under fig/graph.png, always done when simulating',
+                        action='store_true')
+    parser.add_argument('--replications',
+                        help='Number of independent seeded simulation replications, run in parallel when --simulate is set, default to 1',
+                        type=int,
+                        default=1)
+    parser.add_argument('--workers',
+                        help='Number of worker processes for replications, default to one per core',
+                        type=int,
+                        default=None)
+    parser.add_argument('--seed',
+                        help='Random seed of the first replication',
+                        type=int,
+                        default=0)
     parser.add_argument('--application',
                         help='yaml application descriptor',
                         default='app.yaml')
+    parser.add_argument('--routing',
+                        help='Routing engine, legacy fixpoint loop or vectorized all-pairs shortest path (fast, floyd, dijkstra)',
+                        choices=['legacy', 'fast', 'floyd', 'dijkstra'],
+                        default=ROUTING_ENGINE)
+    parser.add_argument('--links',
+                        help='Physical link storage, dense list of PhysicalNetworkLink or sparse array-backed store',
+                        choices=['list', 'store'],
+                        default='store')
+    parser.add_argument('--churn',
+                        help='Run the event-driven simulation of application arrivals and departures up to the given time',
+                        type=float,
+                        default=None)
+    parser.add_argument('--arrival',
+                        help='Arrival process of the event-driven simulation',
+                        choices=list(ARRIVAL_PROCESSES),
+                        default='poisson')
+    parser.add_argument('--arrival-rate',
+                        help='Mean number of application arrivals per time unit',
+                        type=float,
+                        default=1)
+    parser.add_argument('--lifetime',
+                        help='Mean application lifetime, lifetimes are exponentially distributed',
+                        type=float,
+                        default=40)
+    parser.add_argument('--warmup',
+                        help='Time before statistics are measured in the event-driven simulation',
+                        type=float,
+                        default=0)
+    parser.add_argument('--serve',
+                        help='Run the placement service instead of a single deployment, listening on unix:PATH (Unix socket) or HOST:PORT (HTTP)',
+                        default=None)
+    parser.add_argument('--metrics',
+                        help='Print the deployment counters and timers as JSON, for a single deployment or the event-driven simulation',
+                        action='store_true')
+    parser.add_argument('--search',
+                        help='Placement search, retry from the closest devices up to a number of tentatives, or depth first search with backtracking (not for parallel replications)',
+                        choices=SEARCH_MODES,
+                        default='tentatives')
+    parser.add_argument('--bandwidth-routing',
+                        help='Route paths around loaded links, on distances weighted by free bandwidth (not with the legacy routing, nor for parallel replications)',
+                        action='store_true')
+    parser.add_argument('--quiet',
+                        help='Do not print each deployment result',
+                        action='store_true')
+    parser.add_argument('--event-log',
+                        help='JSON lines file, one record is appended per deployment (not for parallel replications)',
+                        default=None)
 
     options = parser.parse_args()
 
@@ -93,39 +182,128 @@ def main():
     logging.basicConfig(filename=logfilename, encoding='utf-8', level=loglevel)
     devices = list()
 
-    devices_list = []
-
-    generate_and_plot_devices(devices)
-
+    # Random device positions are only needed to create the database
     if not os.path.isfile(parsed_yaml['database_url']['device']):
+        generate_devices(devices)
         create_db(parsed_yaml['database_url']['device'])
         populate_db(devices, parsed_yaml['database_url']['device'])
 
-    dump_from_db(devices_list, parsed_yaml['database_url']['device'])
+    # Devices are views over a single table of resource columns
+    devices_list, device_table = load_devices(parsed_yaml['database_url']['device'])
 
-    physical_network_link_list = [0]*len(devices_list)*len(devices_list)
-    generate_routing_table(devices_list, physical_network_link_list)
+    # Rendering is separated from topology generation, headless deployments skip it
+    if options.simulate or options.plot:
+        plot_devices([[device.x, device.y, device.z] for device in devices_list])
+
+    if options.links == 'store':
+        physical_network_link_list = PhysicalNetworkLinkStore(len(devices_list))
+    else:
+        physical_network_link_list = [0]*len(devices_list)*len(devices_list)
+    # Routes and links are reloaded from the database when the device set is unchanged
+    routing_engine = None
+    if options.routing != 'legacy':
+        fingerprint = topology_fingerprint(devices_list, wifi_range)
+        stored_topology = load_topology(parsed_yaml['database_url']['device'], fingerprint)
+        if stored_topology is not None:
+            routing_engine, links = stored_topology
+            routing_engine.apply(devices_list)
+            fill_physical_links(physical_network_link_list, len(devices_list), *links)
+            logging.info("Routing and links loaded from database")
+
+    if routing_engine is None:
+        routing_engine = generate_routing_table(devices_list, physical_network_link_list, engine=options.routing)
+        if routing_engine is not None:
+            store_topology(parsed_yaml['database_url']['device'], fingerprint, routing_engine, physical_network_link_list)
+
+    # Paths are shared between deployments, and dropped when the routing engine updates routes
+    path_cache = PathCache()
+    if routing_engine is not None:
+        routing_engine.subscribe(path_cache.invalidate)
+
+    # Devices able to host a processus are looked up by free capacity, the index follows the table usages
+    capacity_index = CapacityIndex(device_table)
+
+    # Paths follow bandwidth weighted routes, repaired before each deployment
+    bandwidth_routing = None
+    if options.bandwidth_routing:
+        if routing_engine is None:
+            logging.warning("Bandwidth routing needs a routing engine, ignored with the legacy routing")
+        else:
+            bandwidth_routing = BandwidthRouting(devices_list, physical_network_link_list, routing_engine, options.routing)
+            bandwidth_routing.subscribe(path_cache.invalidate)
+
+    # Deployment results are written in the background, off the decision path
+    event_log = None
+    if options.event_log is not None:
+        event_log = DeploymentEventLog(options.event_log)
+        event_log.start()
 
     if options.simulate:
-        simulate_deployments(devices_list, physical_network_link_list)
+        if options.replications > 1:
+            summary = simulate_replications(devices_list, physical_network_link_list, options.replications, options.workers, options.seed, routing_engine=routing_engine)
+            for name in ['acceptance', 'latency', 'operational_latency', 'trivial']:
+                mean, low, high = summary[name]
+                print(f"{name} : {mean:.3f} [{low:.3f}, {high:.3f}]")
+            plot_replications(summary)
+        else:
+            simulate_deployments(devices_list, physical_network_link_list, path_cache, routing_engine, not options.quiet, event_log, options.search, capacity_index, bandwidth_routing)
+        if event_log is not None:
+            event_log.close()
+        return 0,1
+    elif options.churn is not None:
+        random.seed(options.seed)
+        metrics = DeploymentMetrics() if options.metrics else None
+        simulator = EventSimulator(devices_list, physical_network_link_list, path_cache, routing_engine,
+                                   arrivals=ARRIVAL_PROCESSES[options.arrival](options.arrival_rate),
+                                   lifetimes=exponential_lifetimes(options.lifetime),
+                                   warmup=options.warmup, metrics=metrics, event_log=event_log,
+                                   search=options.search, capacity_index=capacity_index, bandwidth_routing=bandwidth_routing)
+        summary = simulator.run(horizon=options.churn)
+        for name, value in summary.items():
+            print(f"{name} : {value}")
+        if metrics is not None:
+            print(metrics.to_json())
+        if event_log is not None:
+            event_log.close()
+        return 0,1
+    elif options.serve:
+        # Devices, routes and links stay in memory between requests, usages and reservations are written back to the database in the background
+        # Applications deployed by a previous run keep their reservations and can be undeployed, their link usages are allocated again
+        ledger = ReservationLedger()
+        ledger.restore(load_reservations(parsed_yaml['database_url']['device']), devices_list, physical_network_link_list)
+        if bandwidth_routing is not None:
+            bandwidth_routing.refresh()
+        usage_writer = DeviceUsageWriter(parsed_yaml['database_url']['device'], device_table, ledger=ledger)
+        usage_writer.start()
+        stats = run_service(options.serve, devices_list, physical_network_link_list, path_cache, routing_engine, event_log, options.search, capacity_index, bandwidth_routing, ledger, usage_writer)
+        usage_writer.close()
+        if event_log is not None:
+            event_log.close()
+        print(f"{stats['requests']} requests, {stats['successes']} deployed, decision latency p50 {stats['p50_ms']} ms, p99 {stats['p99_ms']} ms")
         return 0,1
     else:
         current_device_id = random.randint(0, len(devices_list)-1)
         my_application = Application()
+        metrics = DeploymentMetrics() if options.metrics else None
         with open(options.application, 'r') as app_config:
             app_yaml = yaml.safe_load(app_config)
             my_application.app_yaml_parser(app_yaml)
-            values = application_deploy(my_application, devices_list[current_device_id], devices_list, physical_network_link_list)
-            print("Need to implement listener")
+            values = application_deploy(my_application, devices_list[current_device_id], devices_list, physical_network_link_list, path_cache, routing_engine,
+                                        verbose=not options.quiet, metrics=metrics, event_log=event_log, search=options.search, capacity_index=capacity_index, bandwidth_routing=bandwidth_routing)
 
             if values[0]:
                 logging.info(f"Deployment success")
                 logging.info(f"application {my_application.id} successfully deployed")
                 for i in range(len(my_application.processus_list)):
-                    logging.info(f"Deploying processus {my_application.processus_list[i].id} on device {values[3][i]}")
+                    logging.info(f"Deploying processus {my_application.processus_list[i].getProcessusID()} on device {values[3][i]}")
             else:
                 logging.error(f"\nDeployment failure for application {my_application.id}")
 
+        if metrics is not None:
+            print(metrics.to_json())
+        if event_log is not None:
+            event_log.close()
+
         return values[0],values[3]
 
 if __name__ == '__main__':
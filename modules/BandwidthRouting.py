@@ -0,0 +1,182 @@
+"""
+Bandwidth Routing module, defines the BandwidthRouting Class
+Routes between devices are computed on distances weighted by the free bandwidth of each physical link, and repaired as reservations change
+
+Usage:
+
+"""
+import numpy as np
+
+from modules.PhysicalNetworkLinkStore import PhysicalNetworkLinkStore
+from modules.RoutingEngine import RoutingEngine
+
+# Free bandwidth levels, an edge weight only changes when the free bandwidth of its link crosses a level
+BANDWIDTH_LEVELS = 8
+
+
+class BandwidthRouting:
+    # A BandwidthRouting keeps its own RoutingEngine over the neighbor graph of a distance RoutingEngine
+    # Each edge is weighted by its distance and the free bandwidth of its physical link :
+    #     level = ceil(BANDWIDTH_LEVELS * available / bandwidth), weight = distance * BANDWIDTH_LEVELS / level
+    #     an unloaded link keeps its distance, a link without free bandwidth is not routed through
+    # Devices routing tables follow this engine, so that Path (and linkability) go around loaded links
+    # The distance engine is unchanged, it still orders candidate devices and gives deployment latencies
+    # refresh compares the links levels with the ones the routes were computed with, only the edges which changed level are updated
+    # Topology changes of the distance engine rebuild all the routes
+
+    def __init__(self, devices_list, physical_network_link_list, routing_engine, method='fast') -> None:
+        """
+        Computes the bandwidth weighted routes and fills the devices routing tables with them
+
+        Args:
+            devices_list : list of devices, indexed by device ID, routing tables are modified
+            physical_network_link_list : List(PhysicalNetworkLink) or PhysicalNetworkLinkStore, physical links between devices
+            routing_engine : RoutingEngine, distance engine, gives the neighbor graph
+            method : str, default to 'fast', routing method of full computations, one of ROUTING_METHODS
+
+        Returns:
+            None
+        """
+        self.devices_list = devices_list
+        self.physical_network_link_list = physical_network_link_list
+        self.routing_engine = routing_engine
+        self.method = method
+
+        self.engine = RoutingEngine(0)
+        # Edges of the neighbor graph, and the bandwidth level of each edge the routes were computed with
+        self.sources = np.empty(0, dtype=np.int64)
+        self.destinations = np.empty(0, dtype=np.int64)
+        self.distances = np.empty(0, dtype=float)
+        self.levels = np.empty(0, dtype=np.int64)
+
+        self.rebuild()
+        routing_engine.subscribe(self.topology_changed)
+
+    def subscribe(self, callback):
+        """
+        Registers a callback called whenever the devices routing tables are updated, same as RoutingEngine.subscribe
+
+        Args:
+            callback : function(changed_pairs), changed_pairs is a k*2 array of (source, destination) device IDs, None if all routes may have changed
+
+        Returns:
+            None
+        """
+        self.engine.subscribe(callback)
+
+    def _bandwidth_levels(self):
+        """
+        Returns the free bandwidth level of the physical link of each edge, edges without a link are considered unloaded
+
+        Args:
+            None
+
+        Returns:
+            levels : np.array of int, from 0 (no free bandwidth) to BANDWIDTH_LEVELS (unloaded), one level per edge
+        """
+        links = self.physical_network_link_list
+        if isinstance(links, PhysicalNetworkLinkStore):
+            rows = links.rows(self.sources * links.n_devices + self.destinations)
+            known = rows >= 0
+            bandwidth = np.where(known, links.bandwidth[rows], 1)
+            available = np.where(known, links.bandwidth[rows] - links.bandwidth_use[rows], 1)
+        else:
+            n_devices = len(self.devices_list)
+            bandwidth = np.ones(len(self.sources))
+            available = np.ones(len(self.sources))
+            for index, link_id in enumerate((self.sources * n_devices + self.destinations).tolist()):
+                link = links[link_id] if link_id < len(links) else None
+                if link is not None:
+                    bandwidth[index] = link.bandwidth
+                    available[index] = link.availableBandwidth()
+
+        free = np.divide(available, bandwidth, out=np.zeros(len(bandwidth)), where=bandwidth > 0)
+        return np.clip(np.ceil(free * BANDWIDTH_LEVELS), 0, BANDWIDTH_LEVELS).astype(np.int64)
+
+    def _weight(self, index, level):
+        """
+        Returns the weight of an edge for a given bandwidth level
+
+        Args:
+            index : int, edge index
+            level : int, free bandwidth level of the edge's link
+
+        Returns:
+            float, weighted distance, None if the edge must not be routed through
+        """
+        distance = self.distances[index]
+        if self.sources[index] == self.destinations[index]:
+            # A device always reaches itself
+            return distance
+        if level == 0:
+            return None
+        return distance * BANDWIDTH_LEVELS / level
+
+    def rebuild(self):
+        """
+        Recomputes all the routes from the neighbor graph of the distance engine and the current link loads, then fills the devices routing tables
+
+        Args:
+            None
+
+        Returns:
+            None
+        """
+        sources = list()
+        destinations = list()
+        distances = list()
+        for device_id, device_neighbors in enumerate(self.routing_engine.neighbors):
+            sources.extend([device_id] * len(device_neighbors))
+            destinations.extend(device_neighbors.keys())
+            distances.extend(device_neighbors.values())
+        self.sources = np.array(sources, dtype=np.int64)
+        self.destinations = np.array(destinations, dtype=np.int64)
+        self.distances = np.array(distances, dtype=float)
+        self.levels = self._bandwidth_levels()
+
+        # Listeners are kept by the new engine
+        engine = RoutingEngine(self.routing_engine.n_devices)
+        engine.listeners = self.engine.listeners
+        self.engine = engine
+
+        for index, level in enumerate(self.levels.tolist()):
+            weight = self._weight(index, level)
+            if weight is not None:
+                engine.add_edge(int(self.sources[index]), int(self.destinations[index]), weight)
+        engine.compute(self.method)
+        engine.apply(self.devices_list)
+
+    def refresh(self):
+        """
+        Updates the routes after bandwidth reservations or releases, only the edges whose link changed level are updated in the engine
+        Devices routing tables are updated for the changed routes only
+
+        Args:
+            None
+
+        Returns:
+            changed_pairs : np.array, k*2 array of (source, destination) device IDs whose route changed
+        """
+        levels = self._bandwidth_levels()
+        changed_edges = np.flatnonzero(levels != self.levels)
+        if len(changed_edges) == 0:
+            return np.empty((0, 2), dtype=np.int64)
+
+        changed_pairs = self.engine.update_edges(self.sources[changed_edges].tolist(), self.destinations[changed_edges].tolist(),
+                                                 [self._weight(index, levels[index]) for index in changed_edges.tolist()])
+        self.levels = levels
+
+        self.engine.apply_changes(self.devices_list, changed_pairs)
+        return changed_pairs
+
+    def topology_changed(self, changed_pairs):
+        """
+        Called by the distance engine when its routes change, the devices routing tables it just filled are replaced again
+
+        Args:
+            changed_pairs : np.array, changed (source, destination) pairs of the distance engine, None if all routes may have changed
+
+        Returns:
+            None
+        """
+        self.rebuild()
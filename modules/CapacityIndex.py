@@ -0,0 +1,162 @@
+"""
+Capacity Index module, defines the CapacityIndex Class
+Devices are bucketed by free capacity, so that the devices able to host a processus are found without comparing every device
+
+Usage:
+
+"""
+import math
+
+import numpy as np
+
+from modules.DeviceTable import LIMIT_COLUMNS, USAGE_COLUMNS
+
+
+class CapacityIndex:
+    # A CapacityIndex groups the active devices of a DeviceTable into cells, one cell per (cpu, gpu, mem, disk) tuple of free capacity buckets
+    # The bucket of a free capacity f is floor(log2(f + 1)), -1 when nothing is free, so that for a request r :
+    #     bucket(f) > bucket(r) implies f > r, the whole cell fits
+    #     bucket(f) < bucket(r) implies f < r, the whole cell is skipped
+    #     bucket(f) == bucket(r), the devices of the cell are compared one by one
+    # The index subscribes to its table, a device changes cell whenever its free capacity changes bucket
+    # Query results are kept until the next capacity change, retries of the same processus do not query the cells again
+
+    def __init__(self, device_table) -> None:
+        """
+        Builds the index over a table and subscribes to its changes
+
+        Args:
+            device_table : DeviceTable, table the devices are bound to
+
+        Returns:
+            None
+        """
+        self.device_table = device_table
+        # {cell: set of device IDs}, cell is a tuple of 4 buckets
+        self.cells = dict()
+        # {device_id: cell}
+        self.device_cells = dict()
+        # Cells as a n_cells*4 array, rebuilt on query after cells were added or removed
+        self.cell_list = list()
+        self.cell_keys = np.empty((0, 4), dtype=np.int64)
+        self.cells_changed = True
+        # {(request, max_count): result}, valid until any capacity changes
+        self.results = dict()
+
+        self.rebuild()
+        device_table.subscribe(self.update)
+
+    @staticmethod
+    def bucket(value):
+        """
+        Returns the bucket of a free capacity or of a request
+
+        Args:
+            value : float
+
+        Returns:
+            int, floor(log2(value + 1)), -1 if value <= 0
+        """
+        return int(math.log2(value + 1)) if value > 0 else -1
+
+    def rebuild(self):
+        """
+        Recomputes the cells of all devices from the table
+
+        Args:
+            None
+
+        Returns:
+            None
+        """
+        table = self.device_table
+        free = table.free_capacity()
+        buckets = np.where(free > 0, np.floor(np.log2(np.maximum(free, 0) + 1)), -1).astype(np.int64)
+
+        self.cells = dict()
+        self.device_cells = dict()
+        for device_id in np.flatnonzero(table.active[:table.n_devices]).tolist():
+            cell = tuple(buckets[device_id].tolist())
+            self.cells.setdefault(cell, set()).add(device_id)
+            self.device_cells[device_id] = cell
+        self.cells_changed = True
+        self.results.clear()
+
+    def update(self, device_id):
+        """
+        Moves a device to the cell of its current free capacity, called by the table
+
+        Args:
+            device_id : int, Device ID of the modified device, None if any device may have changed
+
+        Returns:
+            None
+        """
+        if device_id is None:
+            self.rebuild()
+            return
+
+        self.results.clear()
+        table = self.device_table
+        old_cell = self.device_cells.get(device_id)
+        if table.active[device_id]:
+            row = table.data[device_id]
+            cell = tuple(self.bucket(limit - usage) for limit, usage in zip(row[LIMIT_COLUMNS].tolist(), row[USAGE_COLUMNS].tolist()))
+        else:
+            cell = None
+        if cell == old_cell:
+            return
+
+        if old_cell is not None:
+            devices = self.cells[old_cell]
+            devices.discard(device_id)
+            if not devices:
+                del self.cells[old_cell]
+                self.cells_changed = True
+            del self.device_cells[device_id]
+        if cell is not None:
+            if cell not in self.cells:
+                self.cells[cell] = set()
+                self.cells_changed = True
+            self.cells[cell].add(device_id)
+            self.device_cells[device_id] = cell
+
+    def fitting_devices(self, proc, max_count=None):
+        """
+        Returns the devices a processus can be deployed onto, same rule as deployable_proc
+
+        Args:
+            proc : Processus
+            max_count : int, default to None, None is returned instead if more devices than this may fit
+
+        Returns:
+            np.array, sorted Device IDs of the devices able to host the processus, or None, shared and not to be modified
+        """
+        request = (proc.cpu_request, proc.gpu_request, proc.mem_request, proc.disk_request)
+        key = (request, max_count)
+        if key in self.results:
+            return self.results[key]
+
+        if self.cells_changed:
+            self.cell_list = list(self.cells)
+            self.cell_keys = np.array(self.cell_list, dtype=np.int64).reshape(len(self.cell_list), 4)
+            self.cells_changed = False
+
+        request_cell = np.array([self.bucket(value) for value in request], dtype=np.int64)
+        dominating = np.all(self.cell_keys >= request_cell, axis=1)
+        fitting = [self.cells[self.cell_list[i]] for i in np.flatnonzero(dominating & np.all(self.cell_keys > request_cell, axis=1)).tolist()]
+        boundary = [self.cells[self.cell_list[i]] for i in np.flatnonzero(dominating & np.any(self.cell_keys == request_cell, axis=1)).tolist()]
+
+        if max_count is not None and sum(len(devices) for devices in fitting) + sum(len(devices) for devices in boundary) > max_count:
+            self.results[key] = None
+            return None
+
+        device_ids = np.fromiter((device_id for devices in fitting for device_id in devices), dtype=np.int64)
+        if boundary:
+            boundary_ids = np.fromiter((device_id for devices in boundary for device_id in devices), dtype=np.int64)
+            data = self.device_table.data[boundary_ids]
+            fits = np.all(np.array(request, dtype=float) + data[:, USAGE_COLUMNS] < data[:, LIMIT_COLUMNS], axis=1)
+            device_ids = np.concatenate([device_ids, boundary_ids[fits]])
+        device_ids.sort()
+        self.results[key] = device_ids
+        return device_ids
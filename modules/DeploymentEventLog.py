@@ -0,0 +1,141 @@
+"""
+Deployment Event Log module, defines the DeploymentEventLog Class
+One compact JSON line per application_deploy call, written in batches by a background thread
+
+Usage:
+
+"""
+import json
+import threading
+import time
+
+
+class DeploymentEventLog:
+    # A DeploymentEventLog buffers one record per deployment, recording only appends a tuple to the buffer
+    # Formatting and writing are done by a background thread, every interval seconds or as soon as batch_size records are waiting
+    # Each line is a JSON object : {"time", "app_id", "source_id", "success", "latency", "operational_latency", "placement", "tentatives"}
+
+    def __init__(self, path, interval=1.0, batch_size=4096) -> None:
+        """
+        Opens the log file in append mode, call start to write in the background
+
+        Args:
+            path : str, JSON lines file location
+            interval : float, default to 1, seconds between two writes
+            batch_size : int, default to 4096, number of buffered records which triggers a write
+
+        Returns:
+            None
+        """
+        self.path = path
+        self.interval = interval
+        self.batch_size = batch_size
+        self.file = open(path, 'a', encoding='utf-8')
+
+        self.buffer = list()
+        # Protects the buffer swap, and the file
+        self.buffer_lock = threading.Lock()
+        self.file_lock = threading.Lock()
+        self.wake_event = threading.Event()
+        self.stop_event = threading.Event()
+        self.thread = None
+        self.records = 0
+
+    def record(self, app_id, source_id, success, latency, operational_latency, placement, tentatives):
+        """
+        Buffers the result of a deployment, nothing is formatted nor written here
+
+        Args:
+            app_id : int, Application ID
+            source_id : int, Device ID of the deployment source
+            success : Boolean, deployment status
+            latency : float, deployment latency
+            operational_latency : float, operational latency
+            placement : list, Device IDs the processus are deployed onto, empty on failure
+            tentatives : int, tentatives used
+
+        Returns:
+            None
+        """
+        with self.buffer_lock:
+            self.buffer.append((time.time(), app_id, source_id, success, latency, operational_latency, placement, tentatives))
+            full = len(self.buffer) >= self.batch_size
+        if full:
+            self.wake_event.set()
+
+    def flush(self):
+        """
+        Writes the buffered records
+
+        Args:
+            None
+
+        Returns:
+            int, number of written records
+        """
+        with self.buffer_lock:
+            records, self.buffer = self.buffer, list()
+        if len(records) == 0:
+            return 0
+
+        lines = [json.dumps({'time': timestamp,
+                             'app_id': int(app_id),
+                             'source_id': int(source_id),
+                             'success': bool(success),
+                             'latency': float(latency),
+                             'operational_latency': float(operational_latency),
+                             'placement': [int(device_id) for device_id in placement],
+                             'tentatives': int(tentatives)}, separators=(',', ':'))
+                 for timestamp, app_id, source_id, success, latency, operational_latency, placement, tentatives in records]
+        with self.file_lock:
+            self.file.write('\n'.join(lines) + '\n')
+            self.file.flush()
+            self.records += len(records)
+        return len(records)
+
+    def _run(self):
+        """
+        Background thread loop, flushes every interval or when a batch is full, until stopped
+
+        Args:
+            None
+
+        Returns:
+            None
+        """
+        while not self.stop_event.is_set():
+            self.wake_event.wait(self.interval)
+            self.wake_event.clear()
+            self.flush()
+
+    def start(self):
+        """
+        Starts the background writes
+
+        Args:
+            None
+
+        Returns:
+            None
+        """
+        self.stop_event.clear()
+        self.thread = threading.Thread(target=self._run, name='deployment-event-log', daemon=True)
+        self.thread.start()
+
+    def close(self):
+        """
+        Stops the background writes, writes the remaining records and closes the file
+
+        Args:
+            None
+
+        Returns:
+            None
+        """
+        self.stop_event.set()
+        self.wake_event.set()
+        if self.thread is not None:
+            self.thread.join()
+            self.thread = None
+        self.flush()
+        self.file.close()
@@ -0,0 +1,126 @@
+"""
+Deployment Metrics module, defines the DeploymentMetrics Class
+Counters and timers filled by application_deploy when given a metrics object, deployments without one are not instrumented
+
+Usage:
+
+"""
+import json
+
+# Resources, in the order deployable_proc checks them
+METRICS_RESOURCES = ['cpu', 'gpu', 'mem', 'disk']
+
+# Deployment phases timed by application_deploy
+METRICS_PHASES = ['routing', 'sorting', 'feasibility', 'linking', 'reservation']
+
+
+class DeploymentMetrics:
+    # A DeploymentMetrics accumulates, over all the deployments it is given to :
+    #     deployments, successes : number of deployments and of successful ones
+    #     admission_rejections : deployments rejected by the admission check, before any search
+    #     tentatives : tentatives used, tentatives_exhausted : deployments which gave up after MAX_TENTATIVES
+    #     devices_tested : devices examined as candidates (devices a CapacityIndex already excluded are not), rejections : {resource: devices rejected for lack of this resource (first missing one)}
+    #     linkability_calls, linkability_failures : linkability checks, paths_built : paths generated (path cache misses included)
+    #     seconds : {phase: time spent in the phase}
+
+    def __init__(self) -> None:
+        """
+        Initializes all counters and timers to zero
+
+        Args:
+            None
+
+        Returns:
+            None
+        """
+        self.reset()
+
+    def reset(self):
+        """
+        Sets all counters and timers back to zero
+
+        Args:
+            None
+
+        Returns:
+            None
+        """
+        self.deployments = 0
+        self.successes = 0
+        self.admission_rejections = 0
+        self.tentatives = 0
+        self.tentatives_exhausted = 0
+        self.devices_tested = 0
+        self.rejections = dict.fromkeys(METRICS_RESOURCES, 0)
+        self.linkability_calls = 0
+        self.linkability_failures = 0
+        self.paths_built = 0
+        self.seconds = dict.fromkeys(METRICS_PHASES, 0.0)
+
+    def to_dict(self):
+        """
+        Returns the metrics as a JSON serializable dictionary
+
+        Args:
+            None
+
+        Returns:
+            dict
+        """
+        return {'deployments': self.deployments,
+                'successes': self.successes,
+                'admission_rejections': self.admission_rejections,
+                'tentatives': self.tentatives,
+                'tentatives_exhausted': self.tentatives_exhausted,
+                'devices_tested': self.devices_tested,
+                'rejections': dict(self.rejections),
+                'linkability_calls': self.linkability_calls,
+                'linkability_failures': self.linkability_failures,
+                'paths_built': self.paths_built,
+                'seconds': dict(self.seconds)}
+
+    def to_json(self):
+        """
+        Returns the metrics as a JSON document
+
+        Args:
+            None
+
+        Returns:
+            str
+        """
+        return json.dumps(self.to_dict())
+
+    def to_prometheus(self, prefix='placement'):
+        """
+        Returns the metrics in the Prometheus text exposition format, all metrics are counters
+
+        Args:
+            prefix : str, default to 'placement', metric names prefix
+
+        Returns:
+            str
+        """
+        lines = list()
+
+        def counter(name, help_text, values):
+            lines.append(f"# HELP {prefix}_{name} {help_text}")
+            lines.append(f"# TYPE {prefix}_{name} counter")
+            for labels, value in values:
+                lines.append(f"{prefix}_{name}{labels} {value}")
+
+        counter('deployments_total', 'Application deployments', [('', self.deployments)])
+        counter('successes_total', 'Successful application deployments', [('', self.successes)])
+        counter('admission_rejections_total', 'Deployments rejected by the admission check', [('', self.admission_rejections)])
+        counter('tentatives_total', 'Deployment tentatives used', [('', self.tentatives)])
+        counter('tentatives_exhausted_total', 'Deployments which gave up after using all tentatives', [('', self.tentatives_exhausted)])
+        counter('devices_tested_total', 'Devices examined as placement candidates', [('', self.devices_tested)])
+        counter('rejections_total', 'Devices rejected for lack of a resource',
+                [(f'{{resource="{resource}"}}', value) for resource, value in self.rejections.items()])
+        counter('linkability_calls_total', 'Linkability checks', [('', self.linkability_calls)])
+        counter('linkability_failures_total', 'Failed linkability checks', [('', self.linkability_failures)])
+        counter('paths_built_total', 'Paths generated from routing tables', [('', self.paths_built)])
+        counter('phase_seconds_total', 'Time spent in each deployment phase',
+                [(f'{{phase="{phase}"}}', value) for phase, value in self.seconds.items()])
+
+        return '\n'.join(lines) + '\n'
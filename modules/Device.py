@@ -4,15 +4,63 @@ Device module, defines the Device Class
 Usage:
 
 """
+from modules.DeviceTable import DEVICE_TABLE_COLUMNS
+
+
+def _device_feature(name):
+    """
+    Builds the property for a device feature (position, resource limit or usage)
+    Values are stored on the device itself, or in the row of the DeviceTable the device is bound to
+
+    Args:
+        name : str, feature name, one of DEVICE_TABLE_COLUMNS
+
+    Returns:
+        property
+    """
+    column = DEVICE_TABLE_COLUMNS.index(name)
+
+    def getter(self):
+        if self.table is None:
+            return self.features[column]
+        return self.table.get(self._id, column)
+
+    def setter(self, value):
+        if self.table is None:
+            self.features[column] = value
+        else:
+            self.table.set(self._id, column, value)
+
+    return property(getter, setter)
+
+
 class Device:
     # An Device is defined as a group of values : CPU, GPU, Memory, Disk space
     # Each value is set twice, the maximal value as #_limit and current_use as #_usage
     # Additionally, each device has a form of routing table, the routing table stores the next_hop value and distance from the device to each other device in the network
 
-    # Devices have a given id
+    # Position and resource values are stored in features, or in a DeviceTable once the device is bound to one
+
+    # Devices have a given id, the class id is the ID given to the next created device
+
+    # Attributes are slots, a device has no per-instance __dict__
+    # The instance ID is stored in the _id slot, a slot named id would clash with the class id counter
+    __slots__ = ('_id', 'table', 'features', 'routing_table')
 
     id = 0
 
+    x = _device_feature('x')
+    y = _device_feature('y')
+    z = _device_feature('z')
+    cpu_limit = _device_feature('cpu_limit')
+    gpu_limit = _device_feature('gpu_limit')
+    mem_limit = _device_feature('mem_limit')
+    disk_limit = _device_feature('disk_limit')
+    cpu_usage = _device_feature('cpu_usage')
+    gpu_usage = _device_feature('gpu_usage')
+    mem_usage = _device_feature('mem_usage')
+    disk_usage = _device_feature('disk_usage')
+
 
     @classmethod
     def _generate_id(cls):
@@ -43,7 +91,11 @@ class Device:
             None
         """
         # ID setting
-        self.id = Device._generate_id()
+        self._id = Device._generate_id()
+
+        # Feature storage, unbound from any DeviceTable
+        self.table = None
+        self.features = [0] * len(DEVICE_TABLE_COLUMNS)
 
         # Device Position in the area considered
         self.x = 0
@@ -72,12 +124,33 @@ class Device:
 
         # Routing table, dict {destination:(next_hop, distance)}
         ## Initialized to {self.id:(self.id,0)} as route to self is considered as distance 0
-        self.routing_table = {self.id:(self.id,0)}
+        self.routing_table = {self._id:(self._id,0)}
+
+    @classmethod
+    def from_table(cls, table, device_id):
+        """
+        Creates a device bound to an already filled DeviceTable row, for bulk loading
+        The ID counter is not used and no default value is written to the table
+
+        Args:
+            table : DeviceTable, table holding the device features
+            device_id : int, device ID, row of the table
+
+        Returns:
+            device : Device
+        """
+        device = cls.__new__(cls)
+        device._id = device_id
+        device.table = table
+        device.features = None
+        device.routing_table = {device_id:(device_id,0)}
+        return device
 
     def setDeviceID(self, id):
         """
         Used to set a device's ID by hand if necessary
         This will reinitialize the device's routing table to {self.id:(self.id,0)}
+        A device bound to a DeviceTable moves to the row of its new ID
 
         Args:
             id : int, new device ID
@@ -85,8 +158,13 @@ class Device:
         Returns:
             None
         """
-        self.id = id
-        self.routing_table = {self.id:(self.id,0)}
+        table = self.table
+        if table is not None:
+            table.detach(self)
+        self._id = id
+        if table is not None:
+            table.attach(self)
+        self.routing_table = {self._id:(self._id,0)}
 
     def getDeviceID(self):
         """
@@ -98,7 +176,7 @@ class Device:
         Returns:
             id : int, device ID
         """
-        return self.id
+        return self._id
 
     def setDevicePosition(self, x, y, z):
         """
@@ -240,6 +318,33 @@ class Device:
             # Add the new value if no previous value
             self.routing_table[destination_id] = (next_hop_id,distance_destination)
 
+    def replaceInRoutingTable(self, destination_id, next_hop_id, distance_destination):
+        """
+        Sets the route to a destination, even if the new distance is higher than the existing one
+        Used when routes are repaired after a topology change
+
+        Args:
+            destination_id : int, Device ID of the destination point
+            next_hop_id : int, Device ID of the next hop in the path to destination
+            distance_destination : float, distance from device (self) to destination (destination_id)
+
+        Returns:
+            None
+        """
+        self.routing_table[destination_id] = (next_hop_id, distance_destination)
+
+    def removeFromRoutingTable(self, destination_id):
+        """
+        Removes a destination from the routing table, the destination is then considered unreachable
+
+        Args:
+            destination_id : int, Device ID of the destination point
+
+        Returns:
+            None
+        """
+        self.routing_table.pop(destination_id, None)
+
     # Returns the values associated to the route from the device to the destination
     def getRouteInfo(self, destination_id):
         """
@@ -0,0 +1,368 @@
+"""
+Device Table module, defines the DeviceTable Class
+The device table stores positions, resource limits and resource usages of all devices as contiguous numpy columns indexed by device ID
+Device objects bound to a table become thin views over their row
+
+Usage:
+
+"""
+import numpy as np
+
+# Columns of the device table, in the same order as the device database table (id excluded)
+DEVICE_TABLE_COLUMNS = ['x', 'y', 'z',
+                        'cpu_limit', 'gpu_limit', 'mem_limit', 'disk_limit',
+                        'cpu_usage', 'gpu_usage', 'mem_usage', 'disk_usage']
+
+# Resources, in the same order in the limit and usage column blocks
+RESOURCES = ['cpu', 'gpu', 'mem', 'disk']
+LIMIT_COLUMNS = slice(3, 7)
+USAGE_COLUMNS = slice(7, 11)
+
+
+class DeviceTable:
+    # A DeviceTable is a n_devices*len(DEVICE_TABLE_COLUMNS) float array, row i holds the features of device i
+    # Rows without device (unused IDs) are marked inactive and are all zeros
+    # Rows modified through set are marked dirty, until written back to the database
+    # Free capacity aggregates are kept up to date by set, attach and detach, for constant time admission checks :
+    #     free_total : sum over devices of the free capacity of each resource
+    #     free_max : largest free capacity of each resource on a single device, an upper bound recomputed when read after the largest one decreased
+    # Subscribed callbacks are called with the device ID whenever a device's free capacity changes (None if all devices may have changed)
+
+    def __init__(self, n_devices=0) -> None:
+        """
+        Initializes an empty table
+
+        Args:
+            n_devices : int, number of device IDs (rows) to allocate
+
+        Returns:
+            None
+        """
+        self.n_devices = n_devices
+        self.data = np.zeros((n_devices, len(DEVICE_TABLE_COLUMNS)), dtype=float)
+        self.active = np.zeros(n_devices, dtype=bool)
+        self.dirty = np.zeros(n_devices, dtype=bool)
+
+        # Plain lists, one value per resource, cheaper than numpy arrays for single value updates
+        self.free_total = [0.0] * len(RESOURCES)
+        self.free_max = [0.0] * len(RESOURCES)
+        self.free_max_rows = [-1] * len(RESOURCES)
+        self.free_max_stale = [False] * len(RESOURCES)
+
+        # Callbacks notified of free capacity changes
+        self.listeners = list()
+
+    @classmethod
+    def from_devices(cls, devices_list):
+        """
+        Creates a table from a list of devices and binds each device to it
+
+        Args:
+            devices_list : list of devices, None for unused device IDs
+
+        Returns:
+            table : DeviceTable
+        """
+        table = cls(len(devices_list))
+        for device in devices_list:
+            if device is not None:
+                table.attach(device)
+        return table
+
+    def _grow(self, n_devices):
+        """
+        Extends the table to at least n_devices rows, capacity is doubled to amortize growth
+
+        Args:
+            n_devices : int, minimal number of device IDs
+
+        Returns:
+            None
+        """
+        capacity = max(n_devices, 2 * len(self.data))
+        data = np.zeros((capacity, len(DEVICE_TABLE_COLUMNS)), dtype=float)
+        active = np.zeros(capacity, dtype=bool)
+        dirty = np.zeros(capacity, dtype=bool)
+        data[:len(self.data)] = self.data
+        active[:len(self.active)] = self.active
+        dirty[:len(self.dirty)] = self.dirty
+        self.data = data
+        self.active = active
+        self.dirty = dirty
+        self.n_devices = max(self.n_devices, n_devices)
+
+    def attach(self, device):
+        """
+        Binds a device to the table, the device's current values are moved to its row
+
+        Args:
+            device : Device, device to bind, its ID gives its row
+
+        Returns:
+            None
+        """
+        values = [getattr(device, column) for column in DEVICE_TABLE_COLUMNS]
+        row = device.getDeviceID()
+        if row >= len(self.data):
+            self._grow(row + 1)
+        self.n_devices = max(self.n_devices, row + 1)
+
+        if self.active[row]:
+            self._remove_capacity(row)
+        self.data[row] = values
+        self.active[row] = True
+        self._add_capacity(row)
+        device.table = self
+        device.features = None
+        self._notify(row)
+
+    def detach(self, device):
+        """
+        Unbinds a device from the table, the device keeps a copy of its values
+
+        Args:
+            device : Device, device to unbind
+
+        Returns:
+            None
+        """
+        row = device.getDeviceID()
+        values = self.data[row].tolist()
+        device.table = None
+        device.features = values
+
+        self._remove_capacity(row)
+        self.data[row] = 0
+        self.active[row] = False
+        self._notify(row)
+
+    def get(self, row, column):
+        """
+        Returns a device feature
+
+        Args:
+            row : int, device ID
+            column : int, index in DEVICE_TABLE_COLUMNS
+
+        Returns:
+            float, feature value
+        """
+        return self.data[row, column].item()
+
+    def set(self, row, column, value):
+        """
+        Sets a device feature, the row is marked dirty
+
+        Args:
+            row : int, device ID
+            column : int, index in DEVICE_TABLE_COLUMNS
+            value : float, new feature value
+
+        Returns:
+            None
+        """
+        data = self.data
+        if LIMIT_COLUMNS.start <= column < USAGE_COLUMNS.stop and self.active[row]:
+            resource = (column - LIMIT_COLUMNS.start) % len(RESOURCES)
+            limit_column = LIMIT_COLUMNS.start + resource
+            usage_column = USAGE_COLUMNS.start + resource
+            old_free = data.item(row, limit_column) - data.item(row, usage_column)
+            data[row, column] = value
+            self._update_capacity(row, resource, old_free, data.item(row, limit_column) - data.item(row, usage_column))
+            if self.listeners:
+                self._notify(row)
+        else:
+            data[row, column] = value
+        self.dirty[row] = True
+
+    def subscribe(self, callback):
+        """
+        Registers a callback called whenever a device's free capacity changes
+
+        Args:
+            callback : function(device_id), device_id is None if all devices may have changed
+
+        Returns:
+            None
+        """
+        self.listeners.append(callback)
+
+    def _notify(self, row):
+        """
+        Calls the subscribed callbacks
+
+        Args:
+            row : int, device ID, None if all devices may have changed
+
+        Returns:
+            None
+        """
+        for callback in self.listeners:
+            callback(row)
+
+    def _update_capacity(self, row, resource, old_free, new_free):
+        """
+        Updates the free capacity aggregates of a resource after a device's free capacity changed
+
+        Args:
+            row : int, device ID
+            resource : int, index in RESOURCES
+            old_free : float, previous free capacity of the device
+            new_free : float, new free capacity of the device
+
+        Returns:
+            None
+        """
+        self.free_total[resource] += (new_free if new_free > 0 else 0) - (old_free if old_free > 0 else 0)
+        if new_free > self.free_max[resource]:
+            self.free_max[resource] = new_free
+            self.free_max_rows[resource] = row
+            self.free_max_stale[resource] = False
+        elif row == self.free_max_rows[resource] and new_free < old_free:
+            self.free_max_stale[resource] = True
+
+    def _add_capacity(self, row):
+        """
+        Adds the free capacity of a newly active row to the aggregates
+
+        Args:
+            row : int, device ID
+
+        Returns:
+            None
+        """
+        free = self.data[row, LIMIT_COLUMNS] - self.data[row, USAGE_COLUMNS]
+        for resource, new_free in enumerate(free.tolist()):
+            self._update_capacity(row, resource, 0, new_free)
+
+    def _remove_capacity(self, row):
+        """
+        Removes the free capacity of a row about to become inactive from the aggregates
+
+        Args:
+            row : int, device ID
+
+        Returns:
+            None
+        """
+        free = self.data[row, LIMIT_COLUMNS] - self.data[row, USAGE_COLUMNS]
+        for resource, old_free in enumerate(free.tolist()):
+            self.free_total[resource] -= old_free if old_free > 0 else 0
+            if row == self.free_max_rows[resource]:
+                self.free_max_stale[resource] = True
+
+    def refresh_capacity(self):
+        """
+        Recomputes the free capacity aggregates from the whole table, needed after rows are written directly
+
+        Args:
+            None
+
+        Returns:
+            None
+        """
+        free = self.free_capacity()
+        self.free_total = np.maximum(free, 0).sum(axis=0).tolist()
+        if self.active[:self.n_devices].any():
+            rows = free.argmax(axis=0)
+            self.free_max = free[rows, np.arange(len(RESOURCES))].tolist()
+            self.free_max_rows = rows.tolist()
+        else:
+            self.free_max = [0.0] * len(RESOURCES)
+            self.free_max_rows = [-1] * len(RESOURCES)
+        self.free_max_stale = [False] * len(RESOURCES)
+
+    def capacity_aggregates(self):
+        """
+        Returns the total free capacity and the largest free capacity on a single device, for each resource
+        The largest free capacities are recomputed (one pass over the table) only if one of them decreased since the last call
+
+        Args:
+            None
+
+        Returns:
+            (free_total, free_max) : (np.array, np.array), in RESOURCES order
+        """
+        if any(self.free_max_stale):
+            self.refresh_capacity()
+        return np.array(self.free_total), np.array(self.free_max)
+
+    def take_dirty(self):
+        """
+        Returns the rows modified since the last call and clears their dirty mark
+        Values must be read after this call, so that a concurrent modification is either returned now or marked dirty again
+
+        Args:
+            None
+
+        Returns:
+            np.array, device IDs of the modified rows
+        """
+        rows = np.flatnonzero(self.dirty[:self.n_devices])
+        self.dirty[rows] = False
+        return rows
+
+    def limits(self):
+        """
+        Returns the resource limits of all devices, one column per resource in RESOURCES order
+
+        Args:
+            None
+
+        Returns:
+            np.array, n_devices*4 view of the table
+        """
+        return self.data[:self.n_devices, LIMIT_COLUMNS]
+
+    def usages(self):
+        """
+        Returns the resource usages of all devices, one column per resource in RESOURCES order
+
+        Args:
+            None
+
+        Returns:
+            np.array, n_devices*4 view of the table
+        """
+        return self.data[:self.n_devices, USAGE_COLUMNS]
+
+    def free_capacity(self):
+        """
+        Returns the free capacity (limit - usage) of all devices in one operation
+        Inactive rows have no capacity at all
+
+        Args:
+            None
+
+        Returns:
+            np.array, n_devices*4 array, one column per resource in RESOURCES order
+        """
+        free = self.limits() - self.usages()
+        return np.where(self.active[:self.n_devices, None], free, -np.inf)
+
+    def snapshot(self):
+        """
+        Copies the whole table, to save or persist the cluster state
+
+        Args:
+            None
+
+        Returns:
+            np.array, n_devices*len(DEVICE_TABLE_COLUMNS) copy of the table
+        """
+        return self.data[:self.n_devices].copy()
+
+    def restore(self, snapshot):
+        """
+        Restores a table state previously returned by snapshot
+
+        Args:
+            snapshot : np.array, n_devices*len(DEVICE_TABLE_COLUMNS) array
+
+        Returns:
+            None
+        """
+        self.data[:len(snapshot)] = snapshot
+        self.dirty[:len(snapshot)] = True
+        self.refresh_capacity()
+        self._notify(None)
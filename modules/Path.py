@@ -8,9 +8,13 @@ Usage:
 
 from modules.Device import Device
 from modules.PhysicalNetworkLink import PhysicalNetworkLink
+from modules.PhysicalNetworkLinkStore import PhysicalNetworkLinkStore
 
 class Path:
 
+    # Attributes are slots, a path has no per-instance __dict__
+    __slots__ = ('source_id', 'destination_id', 'devices_path', 'physical_links_path')
+
     def __init__(self) -> None:
         """
         Initializes the Path with default values.
@@ -96,10 +100,13 @@ class Path:
         Sets the ID associated with the destination device
 
         Args:
-            path_list : list of PhysicalNetworkLinks corresponding the the IDs stored in the physical_links_path member of the instance
+            path_list : list of PhysicalNetworkLinks corresponding the the IDs stored in the physical_links_path member of the instance, or PhysicalNetworkLinkStore
 
         Returns:
             min_bandwidth_available : float, minimum value for all the available network resources (bandwidth) on the path. Used to determine maximal allocation value.
         """
+        if isinstance(path_list, PhysicalNetworkLinkStore):
+            return path_list.available_bandwidth(self.physical_links_path).min()
+
         min_bandwidth_available = min(path_list[path_id].availableBandwidth() for path_id in self.physical_links_path)
         return min_bandwidth_available
@@ -0,0 +1,140 @@
+"""
+Path Cache module, defines the PathCache Class
+Paths between devices are generated once from the routing tables and reused until the routing tables change
+
+Usage:
+
+"""
+import numpy as np
+
+from modules.Path import Path
+
+
+class PathCache:
+    # A PathCache stores Path objects keyed by (source, destination), along with the path's physical link IDs as a numpy array
+    # A path from s to d follows the next hop towards d of every device on the way
+    # The cache keeps, for each (device, destination), the cached paths going through device, so that a route change on (device, destination) only drops these paths
+
+    def __init__(self) -> None:
+        """
+        Initializes an empty cache
+
+        Args:
+            None
+
+        Returns:
+            None
+        """
+        self.paths = dict()
+        self.links = dict()
+        # Reverse index {(device_id, destination_id): set of cached (source_id, destination_id)}
+        self.through = dict()
+        # Number of devices the cached link IDs were computed with
+        self.n_devices = None
+
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, devices_list, device_source_id, device_destination_id):
+        """
+        Returns the path from source to destination, generated on first request
+        The returned Path is shared, it must not be modified
+
+        Args:
+            devices_list : List of devices, used to get devices IDs and routing table, non modified
+            device_source_id : int, device source ID
+            device_destination_id : int, device destination ID
+
+        Returns:
+            path : Path
+        """
+        # Link IDs depend on the number of devices
+        if self.n_devices != len(devices_list):
+            self.clear()
+            self.n_devices = len(devices_list)
+
+        key = (device_source_id, device_destination_id)
+        path = self.paths.get(key)
+        if path is not None:
+            self.hits += 1
+            return path
+
+        self.misses += 1
+        path = Path()
+        path.path_generation(devices_list, device_source_id, device_destination_id)
+
+        self.paths[key] = path
+        self.links[key] = np.array(path.physical_links_path, dtype=np.int64)
+        for device_id in path.devices_path:
+            self.through.setdefault((device_id, device_destination_id), set()).add(key)
+
+        return path
+
+    def get_links(self, devices_list, device_source_id, device_destination_id):
+        """
+        Returns the physical link IDs of the path from source to destination, as a numpy array
+
+        Args:
+            devices_list : List of devices, used to get devices IDs and routing table, non modified
+            device_source_id : int, device source ID
+            device_destination_id : int, device destination ID
+
+        Returns:
+            np.array, physical link IDs along the path
+        """
+        self.get(devices_list, device_source_id, device_destination_id)
+        return self.links[(device_source_id, device_destination_id)]
+
+    def _drop(self, key):
+        """
+        Removes a cached path and its reverse index entries
+
+        Args:
+            key : (int, int), (source, destination) device IDs
+
+        Returns:
+            None
+        """
+        path = self.paths.pop(key, None)
+        if path is None:
+            return
+        del self.links[key]
+        for device_id in path.devices_path:
+            keys = self.through.get((device_id, key[1]))
+            if keys is not None:
+                keys.discard(key)
+                if not keys:
+                    del self.through[(device_id, key[1])]
+
+    def invalidate(self, changed_pairs=None):
+        """
+        Drops the cached paths affected by route changes
+        Can be subscribed to a RoutingEngine to be called whenever routing tables change
+
+        Args:
+            changed_pairs : np.array, k*2 array of (device, destination) device IDs whose route changed, None to drop everything
+
+        Returns:
+            None
+        """
+        if changed_pairs is None:
+            self.clear()
+            return
+
+        for device_id, destination_id in np.asarray(changed_pairs).reshape(-1, 2).tolist():
+            for key in list(self.through.get((device_id, destination_id), ())):
+                self._drop(key)
+
+    def clear(self):
+        """
+        Drops all the cached paths
+
+        Args:
+            None
+
+        Returns:
+            None
+        """
+        self.paths.clear()
+        self.links.clear()
+        self.through.clear()
@@ -11,6 +11,12 @@ class PhysicalNetworkLink:
     # A Physical Network Link is plugged on two network interfaces (Will need to modify device description)
 
     # For now, the Physical Link is plugged between two devices in a directional way, device IDs are not swappable
+
+    # Attributes are slots, a link has no per-instance __dict__
+    # The instance ID is stored in the _id slot, a slot named id would clash with the class id counter
+    __slots__ = ('_id', 'device_1_id', 'device_2_id', 'bandwidth', 'latency', 'bandwidth_use')
+
+    # ID given to the next created link
     id = 0
 
 
@@ -43,7 +49,7 @@ class PhysicalNetworkLink:
             None
         """
         # ID setting
-        self.id = PhysicalNetworkLink._generate_id()
+        self._id = PhysicalNetworkLink._generate_id()
         self.device_1_id = device_1_id
         self.device_2_id = device_2_id
 
@@ -62,7 +68,20 @@ class PhysicalNetworkLink:
         Returns:
             None
         """
-        self.id = id
+        self._id = id
+
+
+    def getLinkID(self):
+        """
+        Returns a Physical Link's ID
+
+        Args:
+            None
+
+        Returns:
+            id : int, link ID
+        """
+        return self._id
 
 
     def setPhysicalNetworkLinkBandwidth(self, bandwidth):
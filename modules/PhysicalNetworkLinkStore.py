@@ -0,0 +1,280 @@
+"""
+Physical Network Link Store module, defines a sparse, array-backed storage for physical links
+Links are stored in CSR order (sorted by source device, then destination device) with one numpy column per link feature
+Link IDs follow the same convention as the physical link list : device_1_id * n_devices + device_2_id
+
+Usage:
+
+"""
+import numpy as np
+
+from modules.PhysicalNetworkLink import PhysicalNetworkLink
+
+# Default link values, same as PhysicalNetworkLink
+DEFAULT_BANDWIDTH = 1000 * 1024 # Bandwidth in KB/s
+DEFAULT_LATENCY = 10
+
+
+class PhysicalNetworkLinkStore:
+    # A PhysicalNetworkLinkStore replaces the dense n*n list of PhysicalNetworkLink (or None) by arrays holding existing links only
+    # row_ptr[i]:row_ptr[i+1] is the range of rows for links leaving device i
+    # link_ids is sorted, it serves as the link ID -> row index
+
+    def __init__(self, n_devices=0) -> None:
+        """
+        Initializes an empty link store
+
+        Args:
+            n_devices : int, number of devices, used to compute link IDs
+
+        Returns:
+            None
+        """
+        self.n_devices = n_devices
+        self.row_ptr = np.zeros(n_devices + 1, dtype=np.int64)
+
+        self.link_ids = np.empty(0, dtype=np.int64)
+        self.device_1_ids = np.empty(0, dtype=np.int64)
+        self.device_2_ids = np.empty(0, dtype=np.int64)
+
+        # Link features, one value per row
+        self.bandwidth = np.empty(0, dtype=float)
+        self.bandwidth_use = np.empty(0, dtype=float)
+        self.latency = np.empty(0, dtype=float)
+
+    def build(self, n_devices, device_1_ids, device_2_ids, latencies=None, bandwidths=None):
+        """
+        (Re)builds the store from arrays of links, existing links are dropped
+
+        Args:
+            n_devices : int, number of devices, used to compute link IDs
+            device_1_ids : np.array, Device ID of each link source
+            device_2_ids : np.array, Device ID of each link destination
+            latencies : np.array, latency of each link, defaults to DEFAULT_LATENCY, 0 for links from a device to itself
+            bandwidths : np.array, bandwidth of each link (in kBytes/s), defaults to DEFAULT_BANDWIDTH
+
+        Returns:
+            None
+        """
+        device_1_ids = np.asarray(device_1_ids, dtype=np.int64)
+        device_2_ids = np.asarray(device_2_ids, dtype=np.int64)
+        if latencies is None:
+            latencies = np.where(device_1_ids == device_2_ids, 0, DEFAULT_LATENCY)
+        if bandwidths is None:
+            bandwidths = np.full(len(device_1_ids), DEFAULT_BANDWIDTH)
+
+        link_ids = device_1_ids * n_devices + device_2_ids
+        order = np.argsort(link_ids, kind='stable')
+
+        self.n_devices = n_devices
+        self.link_ids = link_ids[order]
+        self.device_1_ids = device_1_ids[order]
+        self.device_2_ids = device_2_ids[order]
+        self.bandwidth = np.asarray(bandwidths, dtype=float)[order]
+        self.bandwidth_use = np.zeros(len(order), dtype=float)
+        self.latency = np.asarray(latencies, dtype=float)[order]
+        self._update_row_ptr()
+
+    @classmethod
+    def from_link_list(cls, physical_network_link_list, n_devices):
+        """
+        Creates a store from a dense physical link list, usage and latency values are kept
+
+        Args:
+            physical_network_link_list : list, dense n_devices*n_devices list of PhysicalNetworkLink or None
+            n_devices : int, number of devices
+
+        Returns:
+            store : PhysicalNetworkLinkStore
+        """
+        links = [link for link in physical_network_link_list if isinstance(link, PhysicalNetworkLink)]
+        store = cls(n_devices)
+        store.build(n_devices,
+                    [link.device_1_id for link in links],
+                    [link.device_2_id for link in links],
+                    [link.latency for link in links],
+                    [link.bandwidth for link in links])
+        store.bandwidth_use[store.rows([link.device_1_id*n_devices + link.device_2_id for link in links])] = [link.bandwidth_use for link in links]
+        return store
+
+    def _update_row_ptr(self):
+        """
+        Recomputes the CSR row pointers from the (sorted) source device IDs
+
+        Args:
+            None
+
+        Returns:
+            None
+        """
+        self.row_ptr = np.searchsorted(self.device_1_ids, np.arange(self.n_devices + 1)).astype(np.int64)
+
+    def __len__(self):
+        """
+        Returns the number of links in the store
+
+        Args:
+            None
+
+        Returns:
+            int, number of links
+        """
+        return len(self.link_ids)
+
+    def rows(self, ids):
+        """
+        Returns the row index of each link ID, -1 for unknown links
+
+        Args:
+            ids : array-like of int, link IDs
+
+        Returns:
+            rows : np.array, row index of each link
+        """
+        ids = np.asarray(ids, dtype=np.int64)
+        if len(self.link_ids) == 0:
+            return np.full(ids.shape, -1, dtype=np.int64)
+        rows = np.minimum(np.searchsorted(self.link_ids, ids), len(self.link_ids) - 1)
+        return np.where(self.link_ids[rows] == ids, rows, -1)
+
+    def contains(self, ids):
+        """
+        Checks which link IDs are in the store
+
+        Args:
+            ids : array-like of int, link IDs
+
+        Returns:
+            np.array of Boolean, True if the link exists
+        """
+        return self.rows(ids) >= 0
+
+    def neighbors(self, device_id):
+        """
+        Returns the devices linked from a given device
+
+        Args:
+            device_id : int, Device ID of the link source
+
+        Returns:
+            np.array, Device IDs of the link destinations
+        """
+        return self.device_2_ids[self.row_ptr[device_id]:self.row_ptr[device_id+1]]
+
+    def available_bandwidth(self, ids):
+        """
+        Returns the available (unused) bandwidth (in kBytes/s) of the given links
+
+        Args:
+            ids : array-like of int, link IDs, unknown links have no available bandwidth
+
+        Returns:
+            np.array, available bandwidth of each link, 0 for unknown links
+        """
+        rows = self.rows(ids)
+        known = rows >= 0
+        available = np.zeros(rows.shape)
+        available[known] = self.bandwidth[rows[known]] - self.bandwidth_use[rows[known]]
+        return available
+
+    def link_latency(self, ids):
+        """
+        Returns the latency of the given links
+
+        Args:
+            ids : array-like of int, link IDs, all must exist
+
+        Returns:
+            np.array, latency of each link
+
+        Raises:
+            KeyError : if a link ID is not in the store
+        """
+        rows = self.rows(ids)
+        if np.any(rows < 0):
+            raise KeyError(f"Unknown physical links {np.asarray(ids)[rows < 0].tolist()}")
+        return self.latency[rows]
+
+    def use_bandwidth(self, ids, bandwidth_request):
+        """
+        Allocates bandwidth on the given links, same rule as PhysicalNetworkLink.useBandwidth, applied link by link
+
+        Args:
+            ids : array-like of int, link IDs, nothing is allocated on unknown links
+            bandwidth_request : float or np.array, necessary bandwidth to allocate on each link (in kBytes/s)
+
+        Returns:
+            np.array of Boolean, True for each link where allocation was possible and successfull, False for unknown links
+        """
+        rows = self.rows(ids)
+        bandwidth_request = np.broadcast_to(np.asarray(bandwidth_request, dtype=float), rows.shape)
+        known = rows >= 0
+        allocated = np.zeros(rows.shape, dtype=bool)
+        allocated[known] = bandwidth_request[known] < self.bandwidth[rows[known]] - self.bandwidth_use[rows[known]]
+        np.add.at(self.bandwidth_use, rows[allocated], bandwidth_request[allocated])
+        return allocated
+
+    def free_bandwidth(self, ids, free_bandwidth_request):
+        """
+        Frees bandwidth on the given links, same rule as PhysicalNetworkLink.freeBandwidth, usage never goes below 0
+
+        Args:
+            ids : array-like of int, link IDs, unknown links (removed since the allocation) are skipped
+            free_bandwidth_request : float or np.array, bandwidth to free on each link (in kBytes/s)
+
+        Returns:
+            None
+        """
+        rows = self.rows(ids)
+        free_bandwidth_request = np.broadcast_to(np.asarray(free_bandwidth_request, dtype=float), rows.shape)
+        known = rows >= 0
+        np.subtract.at(self.bandwidth_use, rows[known], free_bandwidth_request[known])
+        np.maximum(self.bandwidth_use, 0, out=self.bandwidth_use)
+
+    def set_link(self, device_1_id, device_2_id, connected):
+        """
+        Creates (if needed) or removes the link between two devices
+        Existing links are kept as is to preserve their bandwidth reservations
+
+        Args:
+            device_1_id : int, Device ID of the link source
+            device_2_id : int, Device ID of the link destination
+            connected : Bool, True if the link must exist, False to remove it
+
+        Returns:
+            None
+        """
+        link_id = device_1_id*self.n_devices + device_2_id
+        row = np.searchsorted(self.link_ids, link_id)
+        exists = row < len(self.link_ids) and self.link_ids[row] == link_id
+
+        if connected and not exists:
+            self.link_ids = np.insert(self.link_ids, row, link_id)
+            self.device_1_ids = np.insert(self.device_1_ids, row, device_1_id)
+            self.device_2_ids = np.insert(self.device_2_ids, row, device_2_id)
+            self.bandwidth = np.insert(self.bandwidth, row, DEFAULT_BANDWIDTH)
+            self.bandwidth_use = np.insert(self.bandwidth_use, row, 0)
+            self.latency = np.insert(self.latency, row, 0 if device_1_id == device_2_id else DEFAULT_LATENCY)
+            self.row_ptr[device_1_id+1:] += 1
+        elif exists and not connected:
+            self.link_ids = np.delete(self.link_ids, row)
+            self.device_1_ids = np.delete(self.device_1_ids, row)
+            self.device_2_ids = np.delete(self.device_2_ids, row)
+            self.bandwidth = np.delete(self.bandwidth, row)
+            self.bandwidth_use = np.delete(self.bandwidth_use, row)
+            self.latency = np.delete(self.latency, row)
+            self.row_ptr[device_1_id+1:] -= 1
+
+    def renumber(self, n_devices):
+        """
+        Changes the number of devices, link IDs are recomputed, rows keep the same order
+
+        Args:
+            n_devices : int, new number of devices
+
+        Returns:
+            None
+        """
+        self.n_devices = n_devices
+        self.link_ids = self.device_1_ids * n_devices + self.device_2_ids
+        self._update_row_ptr()
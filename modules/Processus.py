@@ -2,6 +2,11 @@ import random
 
 class Processus:
 
+    # Attributes are slots, a processus has no per-instance __dict__
+    # The instance ID is stored in the _id slot, a slot named id would clash with the class id counter
+    __slots__ = ('_id', 'cpu_request', 'gpu_request', 'mem_request', 'disk_request')
+
+    # ID given to the next created processus
     id = 0
 
 
@@ -35,7 +40,7 @@ class Processus:
             None
         """
 
-        self.id = Processus._generate_id()
+        self._id = Processus._generate_id()
 
         # A process requests ressources among the 4 resources defined : CPU, GPU, Memory and Disk
         self.cpu_request = 0
@@ -54,7 +59,7 @@ class Processus:
         Returns:
             None
         """
-        self.id = id
+        self._id = id
 
 
     def getProcessusID(self):
@@ -67,7 +72,7 @@ class Processus:
         Returns:
             id : int, processus ID
         """
-        return self.id
+        return self._id
 
 
     def setProcessusCPURequest(self, cpu):
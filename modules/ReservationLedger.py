@@ -0,0 +1,292 @@
+"""
+Reservation Ledger module, defines the ReservationLedger Class
+The ledger records, for each application, the device resources and link bandwidth allocated to it, so that they can be released without scanning the cluster
+
+Usage:
+
+"""
+import math
+
+import numpy as np
+
+from modules.PhysicalNetworkLinkStore import PhysicalNetworkLinkStore
+
+
+def link_devices(link_ids, physical_network_link_list):
+    """
+    Returns the (device_1_id, device_2_id) pair of each link ID
+
+    Args:
+        link_ids : np.array, physical link IDs
+        physical_network_link_list : List(PhysicalNetworkLink) or PhysicalNetworkLinkStore, gives the number of devices link IDs depend on
+
+    Returns:
+        np.array, len(link_ids)*2 array of Device IDs
+    """
+    n_devices = physical_network_link_list.n_devices if isinstance(physical_network_link_list, PhysicalNetworkLinkStore) else math.isqrt(len(physical_network_link_list))
+    return np.column_stack(np.divmod(np.asarray(link_ids, dtype=np.int64), n_devices))
+
+
+def device_link_ids(links, physical_network_link_list):
+    """
+    Returns the current link ID of each (device_1_id, device_2_id) pair, link IDs change when links are renumbered
+
+    Args:
+        links : np.array, k*2 array of Device IDs
+        physical_network_link_list : List(PhysicalNetworkLink) or PhysicalNetworkLinkStore, gives the number of devices link IDs depend on
+
+    Returns:
+        np.array, physical link IDs
+    """
+    n_devices = physical_network_link_list.n_devices if isinstance(physical_network_link_list, PhysicalNetworkLinkStore) else math.isqrt(len(physical_network_link_list))
+    return links[:, 0] * n_devices + links[:, 1]
+
+
+class ReservationLedger:
+    # A ReservationLedger maps each application ID to its reservations :
+    #     'devices' : list of (processus index, device ID, (cpu, gpu, mem, disk) request)
+    #     'flows' : list of (flow, links, bandwidth), flow being the (processus index, processus index) pair the bandwidth is reserved for, links a k*2 array of (device_1_id, device_2_id)
+    # Links are recorded by device IDs, not link IDs, as link IDs change when devices are added beyond the number of devices
+    # Reverse indexes give the processus deployed on a device and the flows going through a link
+    # Applications whose reservations changed are marked dirty, until saved to the database with the device usages
+    # Releasing an application only touches its own reservations, cost is proportional to the application's footprint
+
+    def __init__(self) -> None:
+        """
+        Initializes an empty ledger
+
+        Args:
+            None
+
+        Returns:
+            None
+        """
+        self.reservations = dict()
+        # Reverse indexes {device_id: set of (app_id, processus index)}, {(device_1_id, device_2_id): {(app_id, flow): bandwidth}}
+        self.device_processes = dict()
+        self.link_flows = dict()
+        # Application IDs whose reservations changed since the last take_dirty
+        self.dirty = set()
+
+    def __contains__(self, app_id):
+        """
+        Checks if an application holds reservations
+
+        Args:
+            app_id : int, Application ID
+
+        Returns:
+            Boolean, True if the application is in the ledger
+        """
+        return app_id in self.reservations
+
+    def __len__(self):
+        """
+        Returns the number of applications in the ledger
+
+        Args:
+            None
+
+        Returns:
+            int, number of applications
+        """
+        return len(self.reservations)
+
+    def _record(self, app_id):
+        """
+        Returns the reservations of an application, created empty if needed
+
+        Args:
+            app_id : int, Application ID
+
+        Returns:
+            record : dict, application reservations
+        """
+        record = self.reservations.get(app_id)
+        if record is None:
+            record = {'devices': list(), 'flows': list()}
+            self.reservations[app_id] = record
+        return record
+
+    def reserve_device(self, app_id, proc_index, device, proc):
+        """
+        Allocates a processus' requested resources on a device and records it
+
+        Args:
+            app_id : int, Application ID
+            proc_index : int, index of the processus in the application
+            device : Device, device the processus is deployed onto
+            proc : Processus, deployed processus
+
+        Returns:
+            None
+        """
+        request = (proc.cpu_request, proc.gpu_request, proc.mem_request, proc.disk_request)
+
+        device.setDeviceCPUUsage(device.cpu_usage + request[0])
+        device.setDeviceGPUUsage(device.gpu_usage + request[1])
+        device.setDeviceMemUsage(device.mem_usage + request[2])
+        device.setDeviceDiskUsage(device.disk_usage + request[3])
+
+        device_id = device.getDeviceID()
+        self._record(app_id)['devices'].append((proc_index, device_id, request))
+        self.device_processes.setdefault(device_id, set()).add((app_id, proc_index))
+        self.dirty.add(app_id)
+
+    def reserve_links(self, app_id, flow, link_ids, bandwidth, physical_network_link_list):
+        """
+        Allocates bandwidth for a flow on the given links and records the links where allocation succeeded
+
+        Args:
+            app_id : int, Application ID
+            flow : (int, int), indexes of the two linked processus
+            link_ids : np.array, physical link IDs along the flow's path, all must exist
+            bandwidth : float, bandwidth to allocate on each link (in kBytes/s)
+            physical_network_link_list : List(PhysicalNetworkLink) or PhysicalNetworkLinkStore, physical links between devices
+
+        Returns:
+            allocated : np.array of Boolean, True for each link where allocation was successfull
+        """
+        link_ids = np.asarray(link_ids, dtype=np.int64)
+        if isinstance(physical_network_link_list, PhysicalNetworkLinkStore):
+            allocated = physical_network_link_list.use_bandwidth(link_ids, bandwidth)
+        else:
+            allocated = np.array([physical_network_link_list[link_id].useBandwidth(bandwidth) for link_id in link_ids.tolist()], dtype=bool)
+
+        reserved_ids = link_ids[allocated]
+        if len(reserved_ids) and bandwidth:
+            links = link_devices(reserved_ids, physical_network_link_list)
+            self._record(app_id)['flows'].append((flow, links, bandwidth))
+            for link in map(tuple, links.tolist()):
+                flows = self.link_flows.setdefault(link, dict())
+                flows[(app_id, flow)] = flows.get((app_id, flow), 0) + bandwidth
+            self.dirty.add(app_id)
+
+        return allocated
+
+    def release(self, app_id, devices_list, physical_network_link_list):
+        """
+        Frees all the resources and bandwidth reserved by an application and removes it from the ledger
+        Used both to roll back a failed deployment and to tear down a deployed application
+
+        Args:
+            app_id : int, Application ID
+            devices_list : List of devices, indexed by device ID
+            physical_network_link_list : List(PhysicalNetworkLink) or PhysicalNetworkLinkStore, physical links between devices
+
+        Returns:
+            Boolean, True if the application held reservations
+        """
+        record = self.reservations.pop(app_id, None)
+        if record is None:
+            return False
+        self.dirty.add(app_id)
+
+        for proc_index, device_id, request in record['devices']:
+            device = devices_list[device_id]
+            device.setDeviceCPUUsage(device.cpu_usage - request[0])
+            device.setDeviceGPUUsage(device.gpu_usage - request[1])
+            device.setDeviceMemUsage(device.mem_usage - request[2])
+            device.setDeviceDiskUsage(device.disk_usage - request[3])
+
+            processes = self.device_processes[device_id]
+            processes.discard((app_id, proc_index))
+            if not processes:
+                del self.device_processes[device_id]
+
+        for flow, links, bandwidth in record['flows']:
+            link_ids = device_link_ids(links, physical_network_link_list)
+            if isinstance(physical_network_link_list, PhysicalNetworkLinkStore):
+                physical_network_link_list.free_bandwidth(link_ids, bandwidth)
+            else:
+                for link_id in link_ids.tolist():
+                    # Links removed since the reservation are skipped
+                    if physical_network_link_list[link_id] is not None:
+                        physical_network_link_list[link_id].freeBandwidth(bandwidth)
+
+            for link in map(tuple, links.tolist()):
+                flows = self.link_flows[link]
+                flows.pop((app_id, flow), None)
+                if not flows:
+                    del self.link_flows[link]
+
+        return True
+
+    def take_dirty(self):
+        """
+        Returns the reservations of the applications modified since the last call and clears their dirty mark
+        Reservations are copied after the mark is cleared, so that a concurrent modification is either returned now or marked dirty again
+
+        Args:
+            None
+
+        Returns:
+            dict {app_id: reservations}, reservations being None for released applications
+        """
+        app_ids = self.dirty
+        self.dirty = set()
+        reservations = dict()
+        for app_id in list(app_ids):
+            record = self.reservations.get(app_id)
+            reservations[app_id] = None if record is None else {'devices': list(record['devices']), 'flows': list(record['flows'])}
+        return reservations
+
+    def restore(self, reservations, devices_list, physical_network_link_list):
+        """
+        Rebuilds the ledger from the reservations saved by a previous run, see interact_db.load_reservations
+        Device usages are saved with the devices and are not allocated again, link usages are not saved and are allocated again
+        Reservations on devices or links which no longer exist are dropped, the applications they belong to are marked dirty
+
+        Args:
+            reservations : dict {app_id: reservations}, in the ledger's format
+            devices_list : List of devices, indexed by device ID
+            physical_network_link_list : List(PhysicalNetworkLink) or PhysicalNetworkLinkStore, physical links between devices, without usage
+
+        Returns:
+            None
+        """
+        n_devices = len(devices_list)
+        for app_id, saved in reservations.items():
+            record = self._record(app_id)
+            for proc_index, device_id, request in saved['devices']:
+                if device_id < n_devices and devices_list[device_id] is not None:
+                    record['devices'].append((proc_index, device_id, tuple(request)))
+                    self.device_processes.setdefault(device_id, set()).add((app_id, proc_index))
+
+            n_links = 0
+            for flow, links, bandwidth in saved['flows']:
+                n_links += len(links)
+                link_ids = device_link_ids(links[(links < n_devices).all(axis=1)], physical_network_link_list)
+                if not isinstance(physical_network_link_list, PhysicalNetworkLinkStore):
+                    link_ids = link_ids[[bool(physical_network_link_list[link_id]) for link_id in link_ids.tolist()]]
+                self.reserve_links(app_id, tuple(flow), link_ids, bandwidth, physical_network_link_list)
+
+            # Saved reservations only need to be written again if some were dropped
+            self.dirty.discard(app_id)
+            if len(record['devices']) < len(saved['devices']) or sum(len(links) for _, links, _ in record['flows']) < n_links:
+                self.dirty.add(app_id)
+
+    def processes_on(self, device_id):
+        """
+        Lists the processus deployed on a device
+
+        Args:
+            device_id : int, Device ID
+
+        Returns:
+            set of (app_id, processus index)
+        """
+        return self.device_processes.get(device_id, set())
+
+    def flows_through(self, device_1_id, device_2_id):
+        """
+        Lists the flows with bandwidth reserved on a link
+
+        Args:
+            device_1_id : int, Device ID of the link source
+            device_2_id : int, Device ID of the link destination
+
+        Returns:
+            dict {(app_id, (processus index, processus index)): reserved bandwidth}
+        """
+        return self.link_flows.get((device_1_id, device_2_id), dict())
@@ -0,0 +1,656 @@
+"""
+Routing Engine module, defines the RoutingEngine Class
+The routing engine computes all the routes between devices in a single pass, as a distance matrix and a next hop matrix, then fills each device's routing table from these matrices
+
+Usage:
+
+"""
+import heapq
+import numpy as np
+
+# Engines available for routing computation
+## floyd is a vectorized Floyd-Warshall, O(n^3) but done as n numpy operations on n*n matrices
+## dijkstra runs a batched Dijkstra over the sparse neighbor graph, requires scipy
+## fast selects dijkstra when scipy is available, floyd otherwise
+ROUTING_METHODS = ['fast', 'floyd', 'dijkstra']
+
+
+class RoutingEngine:
+    # A RoutingEngine stores the neighbor graph between devices (weighted by distance)
+    # From this graph, it computes the distance matrix and the next hop matrix for all (source, destination) pairs
+    # distance[i][j] is the distance from device i to device j, inf if unreachable
+    # next_hop[i][j] is the next device on the route from device i to device j, -1 if unreachable
+
+    def __init__(self, n_devices=0) -> None:
+        """
+        Initializes the routing engine with an empty neighbor graph
+
+        Args:
+            n_devices : int, number of devices, devices are indexed by their device ID
+
+        Returns:
+            None
+        """
+        self.n_devices = n_devices
+
+        # Neighbor graph, list of dict {neighbor_id: distance}, one dict per device
+        self.neighbors = [dict() for _ in range(n_devices)]
+
+        # Routing matrices, None until computed
+        self.distance = None
+        self.next_hop = None
+
+        # Callbacks notified with the changed (source, destination) pairs when routing tables are updated
+        self.listeners = list()
+
+        # Distance ordered reachable devices, {device_id: (device_ids, distances)}, computed on demand
+        self.orders = dict()
+
+    def subscribe(self, callback):
+        """
+        Registers a callback called whenever the devices routing tables are updated by the engine
+
+        Args:
+            callback : function(changed_pairs), changed_pairs is a k*2 array of (source, destination) device IDs, None if all routes may have changed
+
+        Returns:
+            None
+        """
+        self.listeners.append(callback)
+
+    def _notify(self, changed_pairs):
+        """
+        Calls the subscribed callbacks
+
+        Args:
+            changed_pairs : np.array, k*2 array of (source, destination) device IDs, None if all routes may have changed
+
+        Returns:
+            None
+        """
+        # Neighbor orders of sources with a changed route are dropped
+        if changed_pairs is None:
+            self.orders.clear()
+        else:
+            for device_id in np.unique(np.asarray(changed_pairs).reshape(-1, 2)[:, 0]).tolist():
+                self.orders.pop(device_id, None)
+
+        for callback in self.listeners:
+            callback(changed_pairs)
+
+    def neighbor_order(self, device_id):
+        """
+        Returns the devices reachable from a given device, sorted by distance (argsort of the distance matrix row)
+        The order is computed once per device and kept until the device's routes change
+
+        Args:
+            device_id : int, Device ID of the source
+
+        Returns:
+            (device_ids, distances) : (np.array, np.array), reachable device IDs from the closest, and their distance
+        """
+        order = self.orders.get(device_id)
+        if order is None:
+            distances = self.distance[device_id]
+            device_ids = np.argsort(distances, kind='stable')
+            device_ids = device_ids[np.isfinite(distances[device_ids])]
+            order = (device_ids, distances[device_ids])
+            self.orders[device_id] = order
+        return order
+
+    def add_edge(self, device_1_id, device_2_id, distance):
+        """
+        Adds a directed edge between two devices in the neighbor graph
+        If the edge already exists, the lowest distance is kept
+
+        Args:
+            device_1_id : int, Device ID of the edge source
+            device_2_id : int, Device ID of the edge destination
+            distance : float, distance between both devices
+
+        Returns:
+            None
+        """
+        current_distance = self.neighbors[device_1_id].get(device_2_id)
+        if current_distance is None or distance < current_distance:
+            self.neighbors[device_1_id][device_2_id] = distance
+
+    def _edge_arrays(self):
+        """
+        Flattens the neighbor graph into three arrays (sources, destinations, distances)
+
+        Args:
+            None
+
+        Returns:
+            (sources, destinations, distances) : (np.array, np.array, np.array), one element per edge
+        """
+        sources = list()
+        destinations = list()
+        distances = list()
+        for device_id, device_neighbors in enumerate(self.neighbors):
+            sources.extend([device_id] * len(device_neighbors))
+            destinations.extend(device_neighbors.keys())
+            distances.extend(device_neighbors.values())
+
+        return np.array(sources, dtype=np.int64), np.array(destinations, dtype=np.int64), np.array(distances, dtype=float)
+
+    def compute(self, method='fast'):
+        """
+        Computes the distance and next hop matrices from the neighbor graph
+
+        Args:
+            method : str, one of ROUTING_METHODS
+
+        Returns:
+            None
+        """
+        if method == 'fast':
+            try:
+                import scipy.sparse.csgraph
+                method = 'dijkstra'
+            except ImportError:
+                method = 'floyd'
+
+        match method:
+            case 'floyd':
+                self._floyd_warshall()
+            case 'dijkstra':
+                self._dijkstra()
+            case _:
+                raise ValueError(f"Unknown routing method {method}, expected one of {ROUTING_METHODS}")
+
+    def _floyd_warshall(self):
+        """
+        Vectorized Floyd-Warshall, each intermediate device k is tested for all (i, j) pairs at once
+
+        Args:
+            None
+
+        Returns:
+            None
+        """
+        n = self.n_devices
+        sources, destinations, distances = self._edge_arrays()
+
+        distance = np.full((n, n), np.inf)
+        next_hop = np.full((n, n), -1, dtype=np.int64)
+
+        distance[sources, destinations] = distances
+        next_hop[sources, destinations] = destinations
+
+        # Route to self is considered as distance 0
+        np.fill_diagonal(distance, 0)
+        np.fill_diagonal(next_hop, np.arange(n))
+
+        for k in range(n):
+            distance_through_k = distance[:, k, None] + distance[None, k, :]
+            shorter = distance_through_k < distance
+            if shorter.any():
+                distance = np.where(shorter, distance_through_k, distance)
+                # Going through k means going first to the next hop towards k
+                next_hop = np.where(shorter, next_hop[:, k, None], next_hop)
+
+        self.distance = distance
+        self.next_hop = next_hop
+
+    def _csr_graph(self):
+        """
+        Builds the scipy sparse matrix of the neighbor graph
+        Sparse matrices drop explicit zeros, self edges are implicit and co-located devices get a negligible distance
+
+        Args:
+            None
+
+        Returns:
+            graph : scipy.sparse.csr_matrix, n_devices*n_devices matrix of distances between neighbors
+        """
+        from scipy.sparse import csr_matrix
+
+        sources, destinations, distances = self._edge_arrays()
+
+        not_self = sources != destinations
+        sources = sources[not_self]
+        destinations = destinations[not_self]
+        distances = np.maximum(distances[not_self], np.finfo(float).tiny)
+
+        return csr_matrix((distances, (sources, destinations)), shape=(self.n_devices, self.n_devices))
+
+    @staticmethod
+    def _first_hops(predecessors, sources):
+        """
+        Extracts the next hop matrix from a predecessor matrix by pointer jumping
+
+        Args:
+            predecessors : np.array, len(sources)*n_devices predecessor matrix, negative values for unreachable devices
+            sources : np.array, source device ID of each predecessor row
+
+        Returns:
+            first_hop : np.array, len(sources)*n_devices next hop matrix, unreachable devices still have to be masked
+        """
+        # first_hop[i][j] starts as the predecessor of j on the route from sources[i]
+        # If the predecessor of j is the source itself (or j is the source), j is the next hop
+        # Unreachable devices point to themselves
+        device_ids = np.broadcast_to(np.arange(predecessors.shape[1]), predecessors.shape)
+        source_ids = np.asarray(sources)[:, None]
+        is_first_hop = (predecessors == source_ids) | (device_ids == source_ids) | (predecessors < 0)
+        first_hop = np.where(is_first_hop, device_ids, predecessors)
+
+        # Pointer jumping, each pass doubles the number of hops walked back towards the source
+        while True:
+            jumped = np.take_along_axis(first_hop, first_hop, axis=1)
+            if np.array_equal(jumped, first_hop):
+                return first_hop
+            first_hop = jumped
+
+    def _dijkstra(self):
+        """
+        Batched Dijkstra from every device over the sparse neighbor graph, using scipy
+        Next hops are extracted from the predecessor matrix
+
+        Args:
+            None
+
+        Returns:
+            None
+        """
+        from scipy.sparse.csgraph import dijkstra
+
+        distance, predecessors = dijkstra(self._csr_graph(), directed=True, return_predecessors=True)
+
+        next_hop = self._first_hops(predecessors, np.arange(self.n_devices))
+        next_hop[np.isinf(distance)] = -1
+
+        self.distance = distance
+        self.next_hop = next_hop
+
+    def _single_source(self, source_id):
+        """
+        Pure python Dijkstra from a single device, tracking the first hop of each route
+        Used to repair routes when scipy is not available
+
+        Args:
+            source_id : int, Device ID of the source
+
+        Returns:
+            (distance, next_hop) : (np.array, np.array), distance and next hop from source to every device
+        """
+        distance = np.full(self.n_devices, np.inf)
+        next_hop = np.full(self.n_devices, -1, dtype=np.int64)
+
+        best = {source_id: 0}
+        heap = [(0, source_id, source_id)]
+        while heap:
+            current_distance, device_id, first_hop = heapq.heappop(heap)
+            if np.isfinite(distance[device_id]):
+                continue
+            distance[device_id] = current_distance
+            next_hop[device_id] = first_hop
+            for neighbor_id, neighbor_distance in self.neighbors[device_id].items():
+                new_distance = current_distance + neighbor_distance
+                if new_distance < best.get(neighbor_id, np.inf):
+                    best[neighbor_id] = new_distance
+                    heapq.heappush(heap, (new_distance, neighbor_id, neighbor_id if device_id == source_id else first_hop))
+
+        return distance, next_hop
+
+    def _recompute_rows(self, rows):
+        """
+        Recomputes the routes from a subset of source devices, other rows are left untouched
+        Removed devices (no neighbor at all) are unreachable
+
+        Args:
+            rows : np.array, Device IDs of the sources to recompute
+
+        Returns:
+            None
+        """
+        if len(rows) == 0:
+            return
+        try:
+            from scipy.sparse.csgraph import dijkstra
+        except ImportError:
+            for row in rows:
+                self.distance[row], self.next_hop[row] = self._single_source(row)
+        else:
+            distance, predecessors = dijkstra(self._csr_graph(), directed=True, indices=rows, return_predecessors=True)
+            next_hop = self._first_hops(predecessors, rows)
+            next_hop[np.isinf(distance)] = -1
+            self.distance[rows] = distance
+            self.next_hop[rows] = next_hop
+
+        # A device without any neighbor, not even itself, has been removed
+        for row in rows:
+            if not self.neighbors[row]:
+                self.distance[row] = np.inf
+                self.next_hop[row] = -1
+
+    def _grow(self, n_devices):
+        """
+        Extends the routing matrices and neighbor graph to n_devices, new devices are unreachable
+
+        Args:
+            n_devices : int, new number of devices
+
+        Returns:
+            None
+        """
+        n_old = self.n_devices
+        distance = np.full((n_devices, n_devices), np.inf)
+        next_hop = np.full((n_devices, n_devices), -1, dtype=np.int64)
+        distance[:n_old, :n_old] = self.distance
+        next_hop[:n_old, :n_old] = self.next_hop
+
+        self.distance = distance
+        self.next_hop = next_hop
+        self.neighbors.extend(dict() for _ in range(n_devices - n_old))
+        self.n_devices = n_devices
+
+    def _changed_pairs(self, rows, old_distance, old_next_hop):
+        """
+        Lists the (source, destination) pairs whose route changed on the given rows
+
+        Args:
+            rows : np.array, Device IDs of the sources that may have changed
+            old_distance : np.array, len(rows)*n_devices distances before the update
+            old_next_hop : np.array, len(rows)*n_devices next hops before the update
+
+        Returns:
+            changed_pairs : np.array, k*2 array of (source, destination) device IDs
+        """
+        changed = (self.distance[rows] != old_distance) | (self.next_hop[rows] != old_next_hop)
+        row_index, destinations = np.nonzero(changed)
+        return np.column_stack((np.asarray(rows)[row_index], destinations))
+
+    def _insert_edge(self, device_1_id, device_2_id, distance):
+        """
+        Inserts or shortens a directed edge, then relaxes all (i, j) pairs through it in one vectorized step
+
+        Args:
+            device_1_id : int, Device ID of the edge source
+            device_2_id : int, Device ID of the edge destination
+            distance : float, new distance of the edge
+
+        Returns:
+            changed_pairs : np.array, k*2 array of (source, destination) device IDs
+        """
+        self.neighbors[device_1_id][device_2_id] = distance
+        if device_1_id == device_2_id:
+            return np.empty((0, 2), dtype=np.int64)
+
+        distance_through_edge = self.distance[:, device_1_id, None] + distance + self.distance[None, device_2_id, :]
+        shorter = distance_through_edge < self.distance
+
+        # From device_1 the next hop is device_2, others first go towards device_1
+        hop = self.next_hop[:, device_1_id].copy()
+        hop[device_1_id] = device_2_id
+
+        self.distance = np.where(shorter, distance_through_edge, self.distance)
+        self.next_hop = np.where(shorter, hop[:, None], self.next_hop)
+
+        return np.argwhere(shorter)
+
+    def _rows_using_edge(self, device_1_id, device_2_id, distance):
+        """
+        Lists the sources with at least one route going through a directed edge
+
+        Args:
+            device_1_id : int, Device ID of the edge source
+            device_2_id : int, Device ID of the edge destination
+            distance : float, distance of the edge the routes were computed with
+
+        Returns:
+            rows : np.array, Device IDs of the sources using the edge
+        """
+        # A route i -> j uses the edge if it goes through device_1, then directly to device_2, with a matching length
+        distance_through_edge = self.distance[:, device_1_id, None] + distance + self.distance[None, device_2_id, :]
+        using_edge = np.isclose(distance_through_edge, self.distance) & (self.next_hop[device_1_id] == device_2_id)[None, :]
+        return np.flatnonzero(using_edge.any(axis=1))
+
+    def _remove_edge(self, device_1_id, device_2_id, distance=None):
+        """
+        Removes or lengthens a directed edge, then recomputes the routes of the sources which were using it
+
+        Args:
+            device_1_id : int, Device ID of the edge source
+            device_2_id : int, Device ID of the edge destination
+            distance : float, new distance of the edge, None to remove it
+
+        Returns:
+            changed_pairs : np.array, k*2 array of (source, destination) device IDs
+        """
+        old_distance = self.neighbors[device_1_id].get(device_2_id)
+        if distance is None:
+            self.neighbors[device_1_id].pop(device_2_id, None)
+        else:
+            self.neighbors[device_1_id][device_2_id] = distance
+        if old_distance is None or device_1_id == device_2_id:
+            return np.empty((0, 2), dtype=np.int64)
+
+        rows = self._rows_using_edge(device_1_id, device_2_id, old_distance)
+
+        old_rows_distance = self.distance[rows].copy()
+        old_rows_next_hop = self.next_hop[rows].copy()
+        self._recompute_rows(rows)
+
+        return self._changed_pairs(rows, old_rows_distance, old_rows_next_hop)
+
+    def add_device(self, device_id, neighbors):
+        """
+        Adds a device to the routing, with symmetric edges towards its neighbors
+        The new device's routes are derived from its neighbors' routes, then every pair is relaxed through the new device
+
+        Args:
+            device_id : int, Device ID of the new device, matrices are extended if needed
+            neighbors : dict {neighbor_id: distance}, devices in range of the new device
+
+        Returns:
+            changed_pairs : np.array, k*2 array of (source, destination) device IDs whose route changed
+        """
+        changed_pairs = [np.empty((0, 2), dtype=np.int64)]
+        if device_id >= self.n_devices:
+            self._grow(device_id + 1)
+        if self.neighbors[device_id]:
+            changed_pairs.append(self.remove_device(device_id))
+
+        old_column_distance = self.distance[:, device_id].copy()
+        old_column_next_hop = self.next_hop[:, device_id].copy()
+
+        self.neighbors[device_id][device_id] = 0
+        for neighbor_id, distance in neighbors.items():
+            if neighbor_id != device_id:
+                self.neighbors[device_id][neighbor_id] = distance
+                self.neighbors[neighbor_id][device_id] = distance
+
+        neighbor_ids = np.array([neighbor_id for neighbor_id in neighbors if neighbor_id != device_id], dtype=np.int64)
+        neighbor_distances = np.array([neighbors[neighbor_id] for neighbor_id in neighbor_ids.tolist()], dtype=float)
+
+        if len(neighbor_ids):
+            # Routes from the new device, first hop is the best neighbor for each destination
+            distance_from = neighbor_distances[:, None] + self.distance[neighbor_ids, :]
+            best = np.argmin(distance_from, axis=0)
+            self.distance[device_id] = distance_from[best, np.arange(self.n_devices)]
+            self.next_hop[device_id] = np.where(np.isfinite(self.distance[device_id]), neighbor_ids[best], -1)
+
+            # Routes towards the new device, through the best neighbor for each source
+            distance_to = self.distance[:, neighbor_ids] + neighbor_distances[None, :]
+            best = np.argmin(distance_to, axis=1)
+            best_neighbor_ids = neighbor_ids[best]
+            self.distance[:, device_id] = distance_to[np.arange(self.n_devices), best]
+            hop = self.next_hop[np.arange(self.n_devices), best_neighbor_ids]
+            hop = np.where(np.arange(self.n_devices) == best_neighbor_ids, device_id, hop)
+            self.next_hop[:, device_id] = np.where(np.isfinite(self.distance[:, device_id]), hop, -1)
+
+        self.distance[device_id, device_id] = 0
+        self.next_hop[device_id, device_id] = device_id
+
+        changed_pairs.append(np.column_stack((np.full(self.n_devices, device_id), np.arange(self.n_devices)))[np.isfinite(self.distance[device_id])])
+        column_changed = (self.distance[:, device_id] != old_column_distance) | (self.next_hop[:, device_id] != old_column_next_hop)
+        changed_pairs.append(np.column_stack((np.flatnonzero(column_changed), np.full(column_changed.sum(), device_id))))
+
+        # Other pairs may now be shorter through the new device
+        distance_through_device = self.distance[:, device_id, None] + self.distance[None, device_id, :]
+        shorter = distance_through_device < self.distance
+        self.distance = np.where(shorter, distance_through_device, self.distance)
+        self.next_hop = np.where(shorter, self.next_hop[:, device_id, None], self.next_hop)
+        changed_pairs.append(np.argwhere(shorter))
+
+        return np.unique(np.concatenate(changed_pairs), axis=0)
+
+    def remove_device(self, device_id):
+        """
+        Removes a device from the routing, all its edges are dropped
+        Only the sources with a route going through the device are recomputed
+
+        Args:
+            device_id : int, Device ID of the removed device
+
+        Returns:
+            changed_pairs : np.array, k*2 array of (source, destination) device IDs whose route changed
+        """
+        for neighbor_id in list(self.neighbors[device_id]):
+            self.neighbors[neighbor_id].pop(device_id, None)
+        self.neighbors[device_id] = dict()
+
+        # Sources relaying through the device towards any other destination
+        others = np.arange(self.n_devices) != device_id
+        distance_through_device = self.distance[:, device_id, None] + self.distance[None, device_id, others]
+        through_device = np.isclose(distance_through_device, self.distance[:, others]) & np.isfinite(self.distance[:, others])
+        rows = np.flatnonzero(through_device.any(axis=1) & others)
+
+        # Routes from and towards the removed device disappear
+        changed_pairs = [np.column_stack((np.full(self.n_devices, device_id), np.arange(self.n_devices)))[np.isfinite(self.distance[device_id])],
+                         np.column_stack((np.arange(self.n_devices), np.full(self.n_devices, device_id)))[np.isfinite(self.distance[:, device_id])]]
+        self.distance[device_id] = np.inf
+        self.distance[:, device_id] = np.inf
+        self.next_hop[device_id] = -1
+        self.next_hop[:, device_id] = -1
+
+        old_rows_distance = self.distance[rows].copy()
+        old_rows_next_hop = self.next_hop[rows].copy()
+        self._recompute_rows(rows)
+        changed_pairs.append(self._changed_pairs(rows, old_rows_distance, old_rows_next_hop))
+
+        return np.unique(np.concatenate(changed_pairs), axis=0)
+
+    def update_link(self, device_1_id, device_2_id, distance, symmetric=True):
+        """
+        Adds, changes or removes the link between two devices
+        Shorter or new links are relaxed in one vectorized step, longer or removed links recompute the sources which were using them
+
+        Args:
+            device_1_id : int, Device ID of the first device
+            device_2_id : int, Device ID of the second device
+            distance : float, new distance of the link, None to remove the link
+            symmetric : Bool, default to True to update both directions of the link
+
+        Returns:
+            changed_pairs : np.array, k*2 array of (source, destination) device IDs whose route changed
+        """
+        directions = [(device_1_id, device_2_id)]
+        if symmetric and device_1_id != device_2_id:
+            directions.append((device_2_id, device_1_id))
+
+        changed_pairs = [np.empty((0, 2), dtype=np.int64)]
+        for source_id, destination_id in directions:
+            old_distance = self.neighbors[source_id].get(destination_id)
+            if distance is not None and (old_distance is None or distance <= old_distance):
+                changed_pairs.append(self._insert_edge(source_id, destination_id, distance))
+            else:
+                changed_pairs.append(self._remove_edge(source_id, destination_id, distance))
+
+        return np.unique(np.concatenate(changed_pairs), axis=0)
+
+    def update_edges(self, sources, destinations, distances):
+        """
+        Adds, changes or removes several directed edges at once
+        The sources using any longer or removed edge are recomputed together, then shorter or new edges are relaxed one by one
+
+        Args:
+            sources : list of int, Device ID of each edge source
+            destinations : list of int, Device ID of each edge destination
+            distances : list of float, new distance of each edge, None to remove it
+
+        Returns:
+            changed_pairs : np.array, k*2 array of (source, destination) device IDs whose route changed
+        """
+        shorter_edges = list()
+        rows = [np.empty(0, dtype=np.int64)]
+        for device_1_id, device_2_id, distance in zip(sources, destinations, distances):
+            old_distance = self.neighbors[device_1_id].get(device_2_id)
+            if distance is not None and (old_distance is None or distance <= old_distance):
+                shorter_edges.append((device_1_id, device_2_id, distance))
+                continue
+            # Routes are still the ones computed with the old distances, so that each edge's sources are found
+            if old_distance is not None and device_1_id != device_2_id:
+                rows.append(self._rows_using_edge(device_1_id, device_2_id, old_distance))
+
+        # Longer edges first, shorter edges are still at their old distance while their sources are recomputed
+        for device_1_id, device_2_id, distance in zip(sources, destinations, distances):
+            old_distance = self.neighbors[device_1_id].get(device_2_id)
+            if distance is None:
+                self.neighbors[device_1_id].pop(device_2_id, None)
+            elif old_distance is not None and distance > old_distance:
+                self.neighbors[device_1_id][device_2_id] = distance
+
+        changed_pairs = [np.empty((0, 2), dtype=np.int64)]
+        rows = np.unique(np.concatenate(rows))
+        if len(rows):
+            old_rows_distance = self.distance[rows].copy()
+            old_rows_next_hop = self.next_hop[rows].copy()
+            self._recompute_rows(rows)
+            changed_pairs.append(self._changed_pairs(rows, old_rows_distance, old_rows_next_hop))
+
+        for device_1_id, device_2_id, distance in shorter_edges:
+            changed_pairs.append(self._insert_edge(device_1_id, device_2_id, distance))
+
+        return np.unique(np.concatenate(changed_pairs), axis=0)
+
+    def apply(self, devices_list):
+        """
+        Fills the routing table of each device from the computed matrices
+        Reminder - routing table element are : {destination:(next_hop, distance)}, unreachable destinations are not listed
+
+        Args:
+            devices_list : list of devices, indexed by device ID, modified
+
+        Returns:
+            None
+        """
+        for device in devices_list:
+            if device is None:
+                continue
+            device_id = device.getDeviceID()
+            reachable = np.flatnonzero(np.isfinite(self.distance[device_id]))
+            routes = zip(self.next_hop[device_id, reachable].tolist(), self.distance[device_id, reachable].tolist())
+            device.routing_table = dict(zip(reachable.tolist(), routes))
+
+        self._notify(None)
+
+    def apply_changes(self, devices_list, changed_pairs):
+        """
+        Updates the routing tables of the devices for the given (source, destination) pairs only
+
+        Args:
+            devices_list : list of devices, indexed by device ID, modified
+            changed_pairs : np.array, k*2 array of (source, destination) device IDs, as returned by the update methods
+
+        Returns:
+            None
+        """
+        changed_pairs = np.asarray(changed_pairs).reshape(-1, 2)
+        # Routes are read in one indexing operation, not pair by pair
+        distances = self.distance[changed_pairs[:, 0], changed_pairs[:, 1]]
+        next_hops = self.next_hop[changed_pairs[:, 0], changed_pairs[:, 1]]
+        reachable = np.isfinite(distances)
+        for source_id, destination_id, next_hop, distance, is_reachable in zip(changed_pairs[:, 0].tolist(), changed_pairs[:, 1].tolist(),
+                                                                               next_hops.tolist(), distances.tolist(), reachable.tolist()):
+            device = devices_list[source_id] if source_id < len(devices_list) else None
+            if device is None:
+                continue
+            if is_reachable:
+                device.replaceInRoutingTable(destination_id, next_hop, distance)
+            else:
+                device.removeFromRoutingTable(destination_id)
+
+        self._notify(changed_pairs)
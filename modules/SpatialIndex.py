@@ -0,0 +1,142 @@
+"""
+Spatial Index module, defines a grid-bucket index over device coordinates
+Devices are sorted by grid cell, cells are as large as the search radius, so that neighbors are always in the same or an adjacent cell
+
+Usage:
+
+"""
+import itertools
+import numpy as np
+
+
+class SpatialIndex:
+    # A SpatialIndex buckets points (x, y, z) in a regular grid of cell_size cells
+    # Points are sorted by cell key, each cell is a contiguous range of the sorted points
+    # Searching the 27 cells around a point gives all points within cell_size, only the z layers holding points are searched (9 cells when all points share the same z layer)
+
+    def __init__(self, coords, cell_size) -> None:
+        """
+        Builds the index from point coordinates
+
+        Args:
+            coords : array-like, n*3 coordinates (x, y, z) of the points
+            cell_size : float, size of the grid cells, must be at least the search radius
+
+        Returns:
+            None
+        """
+        self.coords = np.asarray(coords, dtype=float).reshape(-1, 3)
+        self.cell_size = cell_size
+
+        cells = np.floor(self.coords / cell_size).astype(np.int64)
+        # Cells are shifted by one so that neighboring cells are never negative, and the grid is padded by one cell on each side
+        self.min_cell = cells.min(axis=0) - 1 if len(cells) else np.zeros(3, dtype=np.int64)
+        self.cells = cells - self.min_cell
+        self.grid_shape = self.cells.max(axis=0) + 2 if len(cells) else np.ones(3, dtype=np.int64)
+
+        keys = self._keys(self.cells)
+        self.order = np.argsort(keys, kind='stable')
+        self.sorted_keys = keys[self.order]
+
+        # z layers holding points, cells of other layers are empty and never searched
+        self.z_range = (int(self.cells[:, 2].min()), int(self.cells[:, 2].max())) if len(cells) else (0, -1)
+        # Indexed points only search along z if they are not all on the same layer
+        z_offsets = [-1, 0, 1] if self.z_range[1] > self.z_range[0] else [0]
+        self.offsets = [np.array(offset) for offset in itertools.product([-1, 0, 1], [-1, 0, 1], z_offsets)]
+
+    def _keys(self, cells):
+        """
+        Linearizes cell coordinates into a single integer key
+
+        Args:
+            cells : np.array, n*3 shifted cell coordinates
+
+        Returns:
+            keys : np.array, n cell keys
+        """
+        return (cells[:, 0] * self.grid_shape[1] + cells[:, 1]) * self.grid_shape[2] + cells[:, 2]
+
+    def _candidates(self, cells, offset):
+        """
+        For each given cell, lists the indexed points in the cell shifted by offset
+
+        Args:
+            cells : np.array, k*3 shifted cell coordinates
+            offset : np.array, cell shift along (x, y, z)
+
+        Returns:
+            (query_index, point_index) : (np.array, np.array), pairs of query row and indexed point
+        """
+        shifted = cells + offset
+        inside = np.all((shifted >= 0) & (shifted < self.grid_shape), axis=1)
+        keys = np.where(inside, self._keys(shifted), -1)
+
+        starts = np.searchsorted(self.sorted_keys, keys, side='left')
+        counts = np.where(inside, np.searchsorted(self.sorted_keys, keys, side='right') - starts, 0)
+
+        query_index = np.repeat(np.arange(len(cells)), counts)
+        # Position of each candidate inside its cell range
+        range_position = np.arange(counts.sum()) - np.repeat(np.cumsum(counts) - counts, counts)
+        point_index = self.order[np.repeat(starts, counts) + range_position]
+
+        return query_index, point_index
+
+    def pairs_within(self, radius, distance_function):
+        """
+        Lists all ordered pairs of indexed points (including each point with itself) closer than radius
+        Only points in adjacent cells are compared, distance_function must never be lower than the euclidean distance
+
+        Args:
+            radius : float, maximal distance (excluded), must not exceed cell_size
+            distance_function : function(x1, y1, z1, x2, y2, z2), vectorized distance between points
+
+        Returns:
+            (index_1, index_2, distances) : (np.array, np.array, np.array), one element per pair in range
+        """
+        index_1 = list()
+        index_2 = list()
+        distances = list()
+
+        for offset in self.offsets:
+            query_index, point_index = self._candidates(self.cells, offset)
+            point_1 = self.coords[query_index]
+            point_2 = self.coords[point_index]
+            distance = distance_function(point_1[:, 0], point_1[:, 1], point_1[:, 2], point_2[:, 0], point_2[:, 1], point_2[:, 2])
+            in_range = distance < radius
+            index_1.append(query_index[in_range])
+            index_2.append(point_index[in_range])
+            distances.append(distance[in_range])
+
+        index_1 = np.concatenate(index_1)
+        index_2 = np.concatenate(index_2)
+        distances = np.concatenate(distances)
+
+        # Sort pairs as a full scan would list them
+        order = np.lexsort((index_2, index_1))
+        return index_1[order], index_2[order], distances[order]
+
+    def query(self, point, radius, distance_function):
+        """
+        Lists the indexed points closer than radius to a given point
+
+        Args:
+            point : array-like, (x, y, z) coordinates
+            radius : float, maximal distance (excluded), must not exceed cell_size
+            distance_function : function(x1, y1, z1, x2, y2, z2), vectorized distance between points
+
+        Returns:
+            (indexes, distances) : (np.array, np.array), indexed points in range and their distance
+        """
+        point = np.asarray(point, dtype=float).reshape(1, 3)
+        cell = np.floor(point / self.cell_size).astype(np.int64) - self.min_cell
+
+        # The point may lie on another layer than the indexed points, only the adjacent layers holding points are searched
+        z_offsets = [z_offset for z_offset in [-1, 0, 1] if self.z_range[0] <= cell[0, 2] + z_offset <= self.z_range[1]]
+        offsets = [np.array(offset) for offset in itertools.product([-1, 0, 1], [-1, 0, 1], z_offsets)]
+        indexes = np.concatenate([self._candidates(cell, offset)[1] for offset in offsets] + [np.empty(0, dtype=np.int64)])
+        candidates = self.coords[indexes]
+        distance = distance_function(point[0, 0], point[0, 1], point[0, 2], candidates[:, 0], candidates[:, 1], candidates[:, 2])
+        in_range = distance < radius
+
+        order = np.argsort(indexes[in_range])
+        return indexes[in_range][order], distance[in_range][order]
@@ -1,6 +1,16 @@
+import hashlib
+import io
+import numpy as np
 import sqlite3
 import random
+import threading
+from modules.Application import Application
 from modules.Device import Device
+from modules.DeviceTable import DeviceTable
+from modules.DeviceTable import DEVICE_TABLE_COLUMNS
+from modules.DeviceTable import USAGE_COLUMNS
+from modules.PhysicalNetworkLinkStore import PhysicalNetworkLinkStore
+from modules.RoutingEngine import RoutingEngine
 
 
 def create_db(device_db):
@@ -18,7 +28,8 @@ def create_db(device_db):
     con = sqlite3.connect(device_db)
     cur = con.cursor()
     cur.execute("CREATE TABLE device(id, x, y, z, cpu_limit, gpu_limit, mem_limit, disk_limit, cpu_usage, gpu_usage, mem_usage, disk_usage)")
-    # Need to find a way to store the routing table
+    cur.execute("CREATE UNIQUE INDEX device_id ON device(id)")
+    # Routing table and links are stored by store_topology, along with the topology fingerprint
 
 def populate_db(devices, device_db):
     """
@@ -48,39 +59,391 @@ def populate_db(devices, device_db):
     con.commit()
     con.close()
 
-def dump_from_db(devices_list, device_db):
+def load_devices(device_db, chunk_size=10000):
     """
-    Dumps the database's content in the devices_list list to work with the remaining parts of the script.
-    Function will need to be updated to fit needs when handling inputs/outputs.
+    Loads the device table as numpy columns, rows are fetched by chunks
+    The table is sized once from the highest device ID, devices are then created in bulk as views over their row
 
     Args:
-        devices_list: list(Device), list of devices objects, devices will be replaced if already in the list, unreferenced devices will be set as None in the list.
+        device_db : str, database location
+        chunk_size : int, default to 10000, number of rows fetched at once
+
+    Returns:
+        (devices_list, device_table)
+            devices_list : list(Device), indexed by device ID, None for unused device IDs
+            device_table : DeviceTable, table the devices are bound to
+    """
+    con = sqlite3.connect(device_db)
+    cur = con.cursor()
+    max_id = cur.execute("SELECT MAX(id) FROM device").fetchone()[0]
+    n_devices = max_id + 1 if max_id is not None else 0
+    device_table = DeviceTable(n_devices)
+
+    cur.execute(f"SELECT id, {', '.join(DEVICE_TABLE_COLUMNS)} FROM device")
+    while True:
+        rows = cur.fetchmany(chunk_size)
+        if not rows:
+            break
+        chunk = np.array(rows, dtype=float)
+        device_ids = chunk[:, 0].astype(np.int64)
+        device_table.data[device_ids] = chunk[:, 1:]
+        device_table.active[device_ids] = True
+    con.close()
+    device_table.refresh_capacity()
+
+    devices_list = [None] * n_devices
+    for device_id in np.flatnonzero(device_table.active).tolist():
+        devices_list[device_id] = Device.from_table(device_table, device_id)
+
+    # Devices created afterwards get new IDs
+    Device.id = max(Device.id, n_devices)
+
+    return devices_list, device_table
+
+
+def topology_fingerprint(devices_list, wifi_range):
+    """
+    Computes a fingerprint of the device set, routes and links only depend on device IDs, positions and wifi range
+
+    Args:
+        devices_list: list(Device), list of devices objects, None for unused device IDs
+        wifi_range : float, wireless range used to link devices
+
+    Returns:
+        fingerprint : str, hexadecimal SHA-256 digest
+    """
+    positions = np.array([[device.getDeviceID(), device.x, device.y, device.z] for device in devices_list if device is not None], dtype=float)
+    digest = hashlib.sha256()
+    digest.update(np.array([len(devices_list), wifi_range], dtype=float).tobytes())
+    digest.update(positions.tobytes())
+    return digest.hexdigest()
+
+
+def _array_to_blob(array):
+    """
+    Serializes a numpy array (dtype and shape included) for a BLOB column
+
+    Args:
+        array : np.array
+
+    Returns:
+        bytes
+    """
+    buffer = io.BytesIO()
+    np.save(buffer, array, allow_pickle=False)
+    return buffer.getvalue()
+
+
+def _blob_to_array(blob):
+    """
+    Deserializes a numpy array stored by _array_to_blob
+
+    Args:
+        blob : bytes
+
+    Returns:
+        np.array
+    """
+    return np.load(io.BytesIO(blob), allow_pickle=False)
+
+
+def store_topology(device_db, fingerprint, routing_engine, physical_network_link_list):
+    """
+    Stores the computed routes and physical links in the database, replacing any previously stored topology.
+    Links are stored as rows of the link table, distance and next hop matrices as BLOBs of the routing table.
+
+    Args:
+        device_db : str, database location
+        fingerprint : str, topology fingerprint, from topology_fingerprint
+        routing_engine : RoutingEngine, engine holding the neighbor graph and the routing matrices
+        physical_network_link_list : list or PhysicalNetworkLinkStore, physical links between devices
 
     Returns:
         None
     """
+    if isinstance(physical_network_link_list, PhysicalNetworkLinkStore):
+        links = zip(physical_network_link_list.device_1_ids.tolist(), physical_network_link_list.device_2_ids.tolist(),
+                    physical_network_link_list.latency.tolist(), physical_network_link_list.bandwidth.tolist())
+    else:
+        links = ((link.device_1_id, link.device_2_id, link.latency, link.bandwidth) for link in physical_network_link_list if link is not None)
+
+    data = [(fingerprint, device_1_id, device_2_id, routing_engine.neighbors[device_1_id].get(device_2_id), latency, bandwidth)
+            for device_1_id, device_2_id, latency, bandwidth in links]
+
+    next_hop = routing_engine.next_hop
+    if routing_engine.n_devices < np.iinfo(np.int32).max:
+        next_hop = next_hop.astype(np.int32)
+
+    con = sqlite3.connect(device_db)
+    cur = con.cursor()
+    cur.execute("CREATE TABLE IF NOT EXISTS link(fingerprint, device_1_id, device_2_id, distance, latency, bandwidth)")
+    cur.execute("CREATE TABLE IF NOT EXISTS routing(fingerprint, n_devices, distance, next_hop)")
+    cur.execute("DELETE FROM link")
+    cur.execute("DELETE FROM routing")
+    cur.executemany("INSERT INTO link VALUES(?, ?, ?, ?, ?, ?)", data)
+    cur.execute("INSERT INTO routing VALUES(?, ?, ?, ?)", (fingerprint, routing_engine.n_devices, _array_to_blob(routing_engine.distance), _array_to_blob(next_hop)))
+    con.commit()
+    con.close()
+
+
+def load_topology(device_db, fingerprint):
+    """
+    Loads the routes and physical links stored by store_topology, if they match the current topology fingerprint
+
+    Args:
+        device_db : str, database location
+        fingerprint : str, current topology fingerprint, from topology_fingerprint
+
+    Returns:
+        None if no matching topology is stored, else (routing_engine, links)
+            routing_engine : RoutingEngine, neighbor graph and routing matrices, device routing tables still need to be filled with apply
+            links : (device_1_ids, device_2_ids, latencies, bandwidths), np.array of link features
+    """
     con = sqlite3.connect(device_db)
     cur = con.cursor()
-    for row in cur.execute("SELECT * FROM device"):
-        device = Device()
+    try:
+        row = cur.execute("SELECT n_devices, distance, next_hop FROM routing WHERE fingerprint = ?", (fingerprint,)).fetchone()
+        if row is None:
+            return None
+        link_rows = cur.execute("SELECT device_1_id, device_2_id, distance, latency, bandwidth FROM link WHERE fingerprint = ?", (fingerprint,)).fetchall()
+    except sqlite3.OperationalError:
+        # No topology table yet
+        return None
+    finally:
+        con.close()
+
+    n_devices, distance_blob, next_hop_blob = row
+    routing_engine = RoutingEngine(n_devices)
+    routing_engine.distance = _blob_to_array(distance_blob)
+    routing_engine.next_hop = _blob_to_array(next_hop_blob).astype(np.int64)
+
+    links = np.array(link_rows, dtype=float).reshape(-1, 5)
+    device_1_ids = links[:, 0].astype(np.int64)
+    device_2_ids = links[:, 1].astype(np.int64)
+    for device_1_id, device_2_id, distance in zip(device_1_ids.tolist(), device_2_ids.tolist(), links[:, 2].tolist()):
+        routing_engine.add_edge(device_1_id, device_2_id, distance)
+
+    return routing_engine, (device_1_ids, device_2_ids, links[:, 3], links[:, 4])
+
+
+def connect_db(device_db):
+    """
+    Opens a connection meant to be kept open and reused, in WAL journal mode so that writes do not block readers
+
+    Args:
+        device_db : str, database location
+
+    Returns:
+        con : sqlite3.Connection, usable from another thread than the creating one
+    """
+    con = sqlite3.connect(device_db, check_same_thread=False)
+    con.execute("PRAGMA journal_mode=WAL")
+    # In WAL mode, syncing at checkpoints only is safe against corruption
+    con.execute("PRAGMA synchronous=NORMAL")
+    # Databases created before the index existed
+    con.execute("CREATE UNIQUE INDEX IF NOT EXISTS device_id ON device(id)")
+    _create_reservation_tables(con)
+    return con
+
+
+def _create_reservation_tables(con):
+    """
+    Creates the tables holding the ReservationLedger content, if needed
+    reservation_device holds one row per deployed processus, reservation_flow one row per flow, its links as a BLOB of (device_1_id, device_2_id) pairs
+
+    Args:
+        con : sqlite3.Connection
+
+    Returns:
+        None
+    """
+    con.execute("CREATE TABLE IF NOT EXISTS reservation_device(app_id, proc_index, device_id, cpu, gpu, mem, disk)")
+    con.execute("CREATE TABLE IF NOT EXISTS reservation_flow(app_id, proc_1, proc_2, links, bandwidth)")
+    con.execute("CREATE INDEX IF NOT EXISTS reservation_device_app ON reservation_device(app_id)")
+    con.execute("CREATE INDEX IF NOT EXISTS reservation_flow_app ON reservation_flow(app_id)")
+
+
+def write_device_usage(con, device_ids, usages, reservations=None):
+    """
+    Writes devices resource usages back to the device table, in a single transaction
+    Reservations of the applications are written in the same transaction, so that saved usages always match the saved reservations
+
+    Args:
+        con : sqlite3.Connection, from connect_db
+        device_ids : array-like of int, Device IDs
+        usages : array-like, len(device_ids)*4 usages (cpu, gpu, mem, disk)
+        reservations : dict {app_id: reservations}, from ReservationLedger.take_dirty, replace the saved reservations of each application, optional
+
+    Returns:
+        None
+    """
+    data = [(*usage, device_id) for device_id, usage in zip(np.asarray(device_ids).tolist(), np.asarray(usages, dtype=float).tolist())]
+    with con:
+        con.executemany("UPDATE device SET cpu_usage = ?, gpu_usage = ?, mem_usage = ?, disk_usage = ? WHERE id = ?", data)
+        if reservations:
+            app_ids = [(int(app_id),) for app_id in reservations]
+            con.executemany("DELETE FROM reservation_device WHERE app_id = ?", app_ids)
+            con.executemany("DELETE FROM reservation_flow WHERE app_id = ?", app_ids)
+            records = [(int(app_id), record) for app_id, record in reservations.items() if record is not None]
+            con.executemany("INSERT INTO reservation_device VALUES(?, ?, ?, ?, ?, ?, ?)",
+                            [(app_id, int(proc_index), int(device_id), *map(float, request))
+                             for app_id, record in records for proc_index, device_id, request in record['devices']])
+            con.executemany("INSERT INTO reservation_flow VALUES(?, ?, ?, ?, ?)",
+                            [(app_id, int(flow[0]), int(flow[1]), _array_to_blob(np.asarray(links, dtype=np.int64)), float(bandwidth))
+                             for app_id, record in records for flow, links, bandwidth in record['flows']])
+
+
+def load_reservations(device_db):
+    """
+    Loads the reservations saved with the device usages, to rebuild a ReservationLedger with ReservationLedger.restore
+    Applications created afterwards get new IDs
+
+    Args:
+        device_db : str, database location
+
+    Returns:
+        reservations : dict {app_id: reservations}, in the ReservationLedger format, empty if none are saved
+    """
+    con = sqlite3.connect(device_db)
+    cur = con.cursor()
+    try:
+        device_rows = cur.execute("SELECT app_id, proc_index, device_id, cpu, gpu, mem, disk FROM reservation_device ORDER BY rowid").fetchall()
+        flow_rows = cur.execute("SELECT app_id, proc_1, proc_2, links, bandwidth FROM reservation_flow ORDER BY rowid").fetchall()
+    except sqlite3.OperationalError:
+        # No reservation table yet
+        return dict()
+    finally:
+        con.close()
+
+    reservations = dict()
+    for app_id, proc_index, device_id, *request in device_rows:
+        reservations.setdefault(app_id, {'devices': list(), 'flows': list()})['devices'].append((proc_index, device_id, tuple(request)))
+    for app_id, proc_1, proc_2, links, bandwidth in flow_rows:
+        reservations.setdefault(app_id, {'devices': list(), 'flows': list()})['flows'].append(((proc_1, proc_2), _blob_to_array(links).reshape(-1, 2), bandwidth))
+
+    if reservations:
+        Application.id = max(Application.id, max(reservations) + 1)
+
+    return reservations
+
+
+class DeviceUsageWriter:
+    # A DeviceUsageWriter writes the usage of modified devices back to the database, from a background thread
+    # Devices are marked dirty by their DeviceTable when modified, the placement code never waits for the disk
+    # The placement side calls snapshot between two deployments : dirty usages and modified reservations are copied, at a point where they match each other
+    # Every interval seconds (or on flush), the pending snapshots are written in one transaction over a single reused connection
+    # The background thread only reads the pending snapshots, never the table or the ledger, the lock protects the pending snapshots only
+
+    def __init__(self, device_db, device_table, interval=1.0, ledger=None) -> None:
+        """
+        Initializes the writer, call start to run it in the background
+
+        Args:
+            device_db : str, database location
+            device_table : DeviceTable, table the devices are bound to
+            interval : float, default to 1, seconds between two writes
+            ledger : ReservationLedger, reservations written along with the usages, optional
+
+        Returns:
+            None
+        """
+        self.device_table = device_table
+        self.ledger = ledger
+        self.interval = interval
+        self.con = connect_db(device_db)
+
+        # Latest usage of each device and reservations of each application, since the last write
+        self.pending_usages = dict()
+        self.pending_reservations = dict()
+        self.lock = threading.Lock()
+        # Writes are serialized, without blocking snapshots
+        self.write_lock = threading.Lock()
+        self.stop_event = threading.Event()
+        self.thread = None
+        self.writes = 0
+
+    def snapshot(self):
+        """
+        Copies the devices usages and the reservations modified since the last snapshot, to be written by the next flush
+        Must be called from the placement side, while no deployment or undeployment is running, so that usages and reservations match
+
+        Args:
+            None
+
+        Returns:
+            None
+        """
+        device_ids = self.device_table.take_dirty()
+        usages = self.device_table.data[device_ids, USAGE_COLUMNS]
+        reservations = self.ledger.take_dirty() if self.ledger is not None else dict()
+        with self.lock:
+            self.pending_usages.update(zip(device_ids.tolist(), usages.tolist()))
+            self.pending_reservations.update(reservations)
+
+    def flush(self):
+        """
+        Writes the snapshots taken since the last write
+
+        Args:
+            None
+
+        Returns:
+            int, number of written devices
+        """
+        with self.write_lock:
+            with self.lock:
+                usages = self.pending_usages
+                reservations = self.pending_reservations
+                self.pending_usages = dict()
+                self.pending_reservations = dict()
+            if not usages and not reservations:
+                return 0
+            write_device_usage(self.con, list(usages), list(usages.values()), reservations)
+            self.writes += 1
+            return len(usages)
+
+    def _run(self):
+        """
+        Background thread loop, flushes every interval until stopped
+
+        Args:
+            None
+
+        Returns:
+            None
+        """
+        while not self.stop_event.wait(self.interval):
+            self.flush()
 
-        if device.getDeviceID() != row[0]:
-            device.setDeviceID(row[0])
+    def start(self):
+        """
+        Starts the background writes
 
-        device.setDevicePosition(row[1], row[2], row[3])
+        Args:
+            None
 
-        device.setDeviceCPULimit(row[4])
-        device.setDeviceGPULimit(row[5])
-        device.setDeviceMemLimit(row[6])
-        device.setDeviceDiskLimit(row[7])
+        Returns:
+            None
+        """
+        self.stop_event.clear()
+        self.thread = threading.Thread(target=self._run, name='device-usage-writer', daemon=True)
+        self.thread.start()
 
-        device.setDeviceCPUUsage(row[8])
-        device.setDeviceGPUUsage(row[9])
-        device.setDeviceMemUsage(row[10])
-        device.setDeviceDiskUsage(row[11])
+    def close(self):
+        """
+        Stops the background writes, takes a last snapshot, writes it and closes the connection
+        Must be called once the placement side stopped
 
-        if len(devices_list) <= device.getDeviceID():
-            for i in range(device.getDeviceID()-len(devices_list)+1):
-                devices_list.append(None)
+        Args:
+            None
 
-        devices_list[device.getDeviceID()] = device
+        Returns:
+            None
+        """
+        self.stop_event.set()
+        if self.thread is not None:
+            self.thread.join()
+            self.thread = None
+        self.snapshot()
+        self.flush()
+        self.con.close()
@@ -0,0 +1,369 @@
+"""
+Placement service module, keeps devices, routes and links in memory and answers deployment requests
+
+Requests are plain HTTP/1.1, served over TCP or over a Unix socket:
+    POST /deploy, body is an application descriptor in the app.yaml format, the optional source query parameter sets the source device ID
+    DELETE /deploy?app_id=ID, removes a deployed application and releases its resources
+    GET /stats, number of requests and decision latency percentiles
+    GET /metrics, deployment hot-path counters and timers in the Prometheus text format
+
+Usage:
+
+    python3 modelisation-2d.py --serve unix:/tmp/placement.sock
+    curl --unix-socket /tmp/placement.sock --data-binary @app.yaml http://localhost/deploy?source=3
+
+    python3 modelisation-2d.py --serve 127.0.0.1:8080
+    curl http://127.0.0.1:8080/stats
+
+"""
+import asyncio
+import collections
+import json
+import logging
+import os
+import random
+import signal
+import time
+import urllib.parse
+import yaml
+
+import numpy as np
+
+from modules.Application import Application
+from modules.DeploymentMetrics import DeploymentMetrics
+
+from modules.ReservationLedger import ReservationLedger
+
+from deployment import application_deploy
+from deployment import undeploy
+
+# Number of most recent decisions kept to compute latency percentiles
+LATENCY_WINDOW = 10000
+
+# Largest accepted request body, in bytes
+MAX_BODY_SIZE = 1024 * 1024
+
+HTTP_REASONS = {200: 'OK', 400: 'Bad Request', 404: 'Not Found', 405: 'Method Not Allowed', 413: 'Payload Too Large', 500: 'Internal Server Error'}
+
+
+class PlacementService:
+    # A PlacementService owns the in-memory cluster state (devices, links, routes, path cache)
+    # Deployments modify this state, they are serialized by a lock and run one at a time
+
+    def __init__(self, devices_list, physical_network_link_list, path_cache=None, routing_engine=None, event_log=None, search='tentatives', capacity_index=None, bandwidth_routing=None, ledger=None, usage_writer=None) -> None:
+        """
+        Initializes the service over an already loaded and routed cluster
+
+        Args:
+            devices_list : list of devices, None for unused device IDs
+            physical_network_link_list : list or PhysicalNetworkLinkStore, physical links between devices
+            path_cache : PathCache, shared between requests, optional
+            routing_engine : RoutingEngine, used to order candidate devices, optional
+            event_log : DeploymentEventLog, records each deployment result, optional
+            search : str, default to 'tentatives', placement search mode, one of deployment.SEARCH_MODES
+            capacity_index : CapacityIndex, lists the devices able to host a processus, optional
+            bandwidth_routing : BandwidthRouting, paths follow bandwidth weighted routes, optional
+            ledger : ReservationLedger, reservations of the applications already deployed, empty if None
+            usage_writer : DeviceUsageWriter, given a snapshot of the usages and reservations after each request, optional
+
+        Returns:
+            None
+        """
+        self.devices_list = devices_list
+        self.physical_network_link_list = physical_network_link_list
+        self.path_cache = path_cache
+        self.routing_engine = routing_engine
+        # Reservations of the deployed applications
+        self.ledger = ledger if ledger is not None else ReservationLedger()
+
+        self.lock = asyncio.Lock()
+        # Decision latencies, in seconds
+        self.latencies = collections.deque(maxlen=LATENCY_WINDOW)
+        self.requests = 0
+        self.successes = 0
+        # Counters and timers of application_deploy
+        self.metrics = DeploymentMetrics()
+        self.event_log = event_log
+        self.search = search
+        self.capacity_index = capacity_index
+        self.bandwidth_routing = bandwidth_routing
+        self.usage_writer = usage_writer
+
+    def deploy(self, app_yaml, source_id=None):
+        """
+        Deploys one application onto the cluster, must only be called while holding the lock
+
+        Args:
+            app_yaml : dictionary from yaml file content, application descriptor
+            source_id : int, Device ID the deployment request comes from, random device if None
+
+        Returns:
+            result : dict, JSON serializable placement result
+        """
+        # Removed devices leave None entries, they are never used as source
+        if source_id is None:
+            device_ids = [device.getDeviceID() for device in self.devices_list if device is not None]
+            if not device_ids:
+                raise ValueError("No device to deploy from")
+            source_id = random.choice(device_ids)
+        source = self.devices_list[source_id] if 0 <= source_id < len(self.devices_list) else None
+        if source is None:
+            raise ValueError(f"No device with ID {source_id}")
+
+        application = Application()
+        application.app_yaml_parser(app_yaml)
+
+        already_deployed = application.id in self.ledger
+        start = time.perf_counter()
+        try:
+            success, latency, operational_latency, placement = application_deploy(application, source, self.devices_list, self.physical_network_link_list,
+                                                                                   self.path_cache, self.routing_engine, verbose=False, ledger=self.ledger, metrics=self.metrics,
+                                                                                   event_log=self.event_log, search=self.search, capacity_index=self.capacity_index,
+                                                                                   bandwidth_routing=self.bandwidth_routing)
+        except Exception:
+            # Reservations made before the error are released, the cluster state stays consistent for the next requests
+            if not already_deployed:
+                self.ledger.release(application.id, self.devices_list, self.physical_network_link_list)
+            raise
+        decision_time = time.perf_counter() - start
+
+        self.requests += 1
+        self.successes += int(success)
+        self.latencies.append(decision_time)
+
+        if success:
+            logging.info("application %s successfully deployed on %s", application.id, placement)
+        else:
+            logging.info("Deployment failure for application %s", application.id)
+
+        return {'app_id': application.id,
+                'source_id': source_id,
+                'success': bool(success),
+                'placement': [int(device_id) for device_id in placement] if success else [],
+                'latency': float(latency),
+                'operational_latency': float(operational_latency),
+                'decision_ms': decision_time * 1000}
+
+    def snapshot_usages(self):
+        """
+        Hands the usages and reservations modified by the last requests to the usage writer, must only be called while holding the lock
+
+        Args:
+            None
+
+        Returns:
+            None
+        """
+        if self.usage_writer is not None:
+            self.usage_writer.snapshot()
+
+    def stats(self):
+        """
+        Returns request counters and decision latency percentiles over the last LATENCY_WINDOW decisions
+
+        Args:
+            None
+
+        Returns:
+            stats : dict, JSON serializable statistics, latencies in milliseconds
+        """
+        stats = {'requests': self.requests, 'successes': self.successes, 'deployed': len(self.ledger), 'p50_ms': None, 'p99_ms': None}
+        if self.latencies:
+            p50, p99 = np.percentile(np.array(self.latencies), [50, 99]) * 1000
+            stats['p50_ms'] = float(p50)
+            stats['p99_ms'] = float(p99)
+        return stats
+
+    async def handle_deploy(self, body, query):
+        """
+        Parses a deployment request and runs it against the shared state
+
+        Args:
+            body : bytes, application descriptor in the app.yaml format
+            query : dict, parsed query string
+
+        Returns:
+            (status, result) : (int, dict), HTTP status and JSON response
+        """
+        try:
+            app_yaml = yaml.safe_load(body)
+            source_id = int(query['source'][0]) if 'source' in query else None
+        except (yaml.YAMLError, ValueError) as error:
+            return 400, {'error': str(error)}
+
+        async with self.lock:
+            try:
+                return 200, self.deploy(app_yaml, source_id)
+            except (KeyError, TypeError, ValueError, IndexError) as error:
+                return 400, {'error': f"Invalid request : {error!r}"}
+            finally:
+                self.snapshot_usages()
+
+    async def handle_undeploy(self, query):
+        """
+        Removes a deployed application from the shared state
+
+        Args:
+            query : dict, parsed query string, app_id gives the application to remove
+
+        Returns:
+            (status, result) : (int, dict), HTTP status and JSON response
+        """
+        try:
+            app_id = int(query['app_id'][0])
+        except (KeyError, ValueError):
+            return 400, {'error': 'An integer app_id query parameter is required'}
+
+        async with self.lock:
+            undeployed = undeploy(app_id, self.devices_list, self.physical_network_link_list, self.ledger)
+            self.snapshot_usages()
+            if undeployed:
+                return 200, {'app_id': app_id, 'undeployed': True}
+        return 404, {'error': f"Application {app_id} is not deployed"}
+
+    async def handle_connection(self, reader, writer):
+        """
+        Serves the HTTP requests of one client connection
+
+        Args:
+            reader : asyncio.StreamReader
+            writer : asyncio.StreamWriter
+
+        Returns:
+            None
+        """
+        try:
+            while True:
+                request_line = await reader.readline()
+                if not request_line:
+                    break
+
+                headers = dict()
+                while True:
+                    line = await reader.readline()
+                    if line in (b'\r\n', b'\n', b''):
+                        break
+                    name, _, value = line.decode('latin-1').partition(':')
+                    headers[name.strip().lower()] = value.strip()
+
+                try:
+                    method, target, version = request_line.decode('latin-1').split()
+                    length = int(headers.get('content-length', 0))
+                except ValueError:
+                    await self.respond(writer, 400, {'error': 'Malformed request'}, close=True)
+                    break
+
+                if length > MAX_BODY_SIZE:
+                    await self.respond(writer, 413, {'error': 'Request body too large'}, close=True)
+                    break
+                body = await reader.readexactly(length) if length else b''
+
+                url = urllib.parse.urlsplit(target)
+                query = urllib.parse.parse_qs(url.query)
+
+                try:
+                    if url.path == '/deploy':
+                        if method == 'POST':
+                            status, result = await self.handle_deploy(body, query)
+                        elif method == 'DELETE':
+                            status, result = await self.handle_undeploy(query)
+                        else:
+                            status, result = 405, {'error': 'Use POST or DELETE'}
+                    elif url.path == '/stats':
+                        status, result = (200, self.stats()) if method == 'GET' else (405, {'error': 'Use GET'})
+                    elif url.path == '/metrics':
+                        status, result = (200, self.metrics.to_prometheus()) if method == 'GET' else (405, {'error': 'Use GET'})
+                    else:
+                        status, result = 404, {'error': f"Unknown path {url.path}"}
+                except Exception as error:
+                    # The client always gets a response, the traceback goes to the log
+                    logging.exception("%s %s failed", method, target)
+                    status, result = 500, {'error': f"Internal error : {error!r}"}
+
+                close = headers.get('connection', '').lower() == 'close' or version == 'HTTP/1.0'
+                await self.respond(writer, status, result, close)
+                if close:
+                    break
+        except (asyncio.IncompleteReadError, ConnectionError):
+            pass
+        finally:
+            writer.close()
+
+    async def respond(self, writer, status, result, close=False):
+        """
+        Writes a JSON HTTP response, or a plain text one
+
+        Args:
+            writer : asyncio.StreamWriter
+            status : int, HTTP status code
+            result : dict, JSON serializable response, or str for a plain text response
+            close : Boolean, True if the connection is closed after the response
+
+        Returns:
+            None
+        """
+        if isinstance(result, str):
+            body = result.encode()
+            content_type = 'text/plain; version=0.0.4'
+        else:
+            body = json.dumps(result).encode()
+            content_type = 'application/json'
+        header = (f"HTTP/1.1 {status} {HTTP_REASONS[status]}\r\n"
+                  f"Content-Type: {content_type}\r\n"
+                  f"Content-Length: {len(body)}\r\n"
+                  f"Connection: {'close' if close else 'keep-alive'}\r\n\r\n")
+        writer.write(header.encode() + body)
+        await writer.drain()
+
+    async def serve(self, address):
+        """
+        Listens for requests until SIGINT or SIGTERM is received
+
+        Args:
+            address : str, unix:PATH for a Unix socket, HOST:PORT for TCP
+
+        Returns:
+            None
+        """
+        if address.startswith('unix:'):
+            server = await asyncio.start_unix_server(self.handle_connection, path=address[len('unix:'):])
+        else:
+            host, _, port = address.rpartition(':')
+            server = await asyncio.start_server(self.handle_connection, host or None, int(port))
+
+        stop = asyncio.Event()
+        loop = asyncio.get_running_loop()
+        for signal_number in (signal.SIGINT, signal.SIGTERM):
+            loop.add_signal_handler(signal_number, stop.set)
+
+        logging.info(f"Placement service listening on {address}")
+        async with server:
+            await stop.wait()
+        if address.startswith('unix:'):
+            os.remove(address[len('unix:'):])
+        logging.info(f"Placement service stopped, {self.stats()}")
+
+
+def run_service(address, devices_list, physical_network_link_list, path_cache=None, routing_engine=None, event_log=None, search='tentatives', capacity_index=None, bandwidth_routing=None, ledger=None, usage_writer=None):
+    """
+    Runs the placement service until SIGINT or SIGTERM is received
+
+    Args:
+        address : str, unix:PATH for a Unix socket, HOST:PORT for TCP
+        devices_list : list of devices, None for unused device IDs
+        physical_network_link_list : list or PhysicalNetworkLinkStore, physical links between devices
+        path_cache : PathCache, shared between requests, optional
+        routing_engine : RoutingEngine, used to order candidate devices, optional
+        event_log : DeploymentEventLog, records each deployment result, optional
+        search : str, default to 'tentatives', placement search mode, one of deployment.SEARCH_MODES
+        capacity_index : CapacityIndex, lists the devices able to host a processus, optional
+        bandwidth_routing : BandwidthRouting, paths follow bandwidth weighted routes, optional
+        ledger : ReservationLedger, reservations of the applications already deployed, empty if None
+        usage_writer : DeviceUsageWriter, given a snapshot of the usages and reservations after each request, optional
+
+    Returns:
+        stats : dict, final request counters and latency percentiles
+    """
+    service = PlacementService(devices_list, physical_network_link_list, path_cache, routing_engine, event_log, search, capacity_index, bandwidth_routing, ledger, usage_writer)
+    asyncio.run(service.serve(address))
+    return service.stats()
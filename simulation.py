@@ -1,16 +1,27 @@
-import matplotlib.pyplot as plt
-import networkx as nx
+import concurrent.futures
+import copy
+import logging
+import numpy as np
 import random
 
 from modules.Application import Application
+from modules.PathCache import PathCache
 from modules.PhysicalNetworkLink import PhysicalNetworkLink
+from modules.PhysicalNetworkLinkStore import PhysicalNetworkLinkStore
+from modules.RoutingEngine import RoutingEngine
+from modules.SpatialIndex import SpatialIndex
 
 from deployment import application_deploy
 
+# matplotlib and networkx are only imported by the plotting functions, so that headless deployments do not pay for them
+
 # GLOBAL VARIABLES (bad practice)
 N_DEVICES = 40
 wifi_range = 9
 
+# Routing engine, legacy fixpoint loop or one of RoutingEngine's methods (fast, floyd, dijkstra)
+ROUTING_ENGINE = 'fast'
+
 
 def custom_distance(x1, y1, z1, x2, y2, z2):
     """
@@ -32,6 +43,20 @@ def custom_distance(x1, y1, z1, x2, y2, z2):
 
 
 def generate_and_plot_devices(devices):
+    """
+    Defines random devices position and plots the resulting graph under fig/graph.png
+
+    Args:
+        devices : list, List of coords
+
+    Returns:
+        None
+    """
+    generate_devices(devices)
+    plot_devices(devices)
+
+
+def generate_devices(devices):
     """
     Defines random devices position
     Each device will be represented with its coordinates (x, y, z)
@@ -57,6 +82,19 @@ def generate_and_plot_devices(devices):
         devices.append([x,y,z])
 
 
+def plot_devices(devices):
+    """
+    Plots the devices and their wireless links under fig/graph.png
+
+    Args:
+        devices : list, List of coords
+
+    Returns:
+        None
+    """
+    import matplotlib.pyplot as plt
+    import networkx as nx
+
     # We'll try our hand on plotting everything in a graph
 
     # Creating a graph
@@ -67,13 +105,13 @@ def generate_and_plot_devices(devices):
         G.add_node(i, pos=devices[i])
 
     # We add the edges, to our graph, which correspond to wifi reachability
+    # Only devices in neighboring cells of the spatial index are compared
 
-    for i in range(len(devices)):
-        for j in range(i+1, len(devices)):
-            distance = custom_distance(devices[i][0],devices[i][1],devices[i][2],devices[j][0],devices[j][1],devices[j][2])
-            if distance < wifi_range:
-                ### We add edges if we have coverage
-                G.add_edge(i, j)
+    device_1_ids, device_2_ids, _ = SpatialIndex(devices, wifi_range).pairs_within(wifi_range, custom_distance)
+    for i, j in zip(device_1_ids.tolist(), device_2_ids.tolist()):
+        if i < j:
+            ### We add edges if we have coverage
+            G.add_edge(i, j)
 
     # Let's try plotting the network
 
@@ -103,19 +141,98 @@ def generate_and_plot_devices(devices):
     plt.savefig("fig/graph.png")
 
 
+def wireless_neighbors(devices_list):
+    """
+    Lists all the (ordered) device pairs in wifi range, including each device with itself
+    A grid spatial index is built once over device positions, so that only devices in neighboring cells are compared
+
+    Args:
+        devices_list : list, List of devices
+
+    Returns:
+        (device_1_ids, device_2_ids, distances) : (np.array, np.array, np.array), one element per pair in range
+    """
+    coords = np.array([[device.x, device.y, device.z] for device in devices_list], dtype=float)
+    device_ids = np.array([device.getDeviceID() for device in devices_list], dtype=np.int64)
+
+    # custom_distance is never lower than the euclidean distance, so wifi_range sized cells hold all neighbors
+    index_1, index_2, distances = SpatialIndex(coords, wifi_range).pairs_within(wifi_range, custom_distance)
+
+    return device_ids[index_1], device_ids[index_2], distances
+
+
+def fill_physical_links(physical_network_link_list, n_devices, device_1_ids, device_2_ids, latencies=None, bandwidths=None):
+    """
+    (Re)builds the physical links between devices from arrays of links, all previous links are dropped
+
+    Args:
+        physical_network_link_list: list or PhysicalNetworkLinkStore, Lists the physical links between devices, modified
+        n_devices : int, number of device IDs, used to compute link IDs
+        device_1_ids : np.array, Device ID of each link source
+        device_2_ids : np.array, Device ID of each link destination
+        latencies : np.array, default to None for default latencies (0 from a device to itself)
+        bandwidths : np.array, default to None for default bandwidths
+
+    Returns:
+        None
+    """
+    # The link store is built from the arrays directly, without PhysicalNetworkLink objects
+    if isinstance(physical_network_link_list, PhysicalNetworkLinkStore):
+        physical_network_link_list.build(n_devices, device_1_ids, device_2_ids, latencies, bandwidths)
+        return
+
+    physical_network_link_list[:] = [None] * (n_devices * n_devices)
+
+    for index, (device_1_id, device_2_id) in enumerate(zip(np.asarray(device_1_ids).tolist(), np.asarray(device_2_ids).tolist())):
+        new_physical_network_link_id = device_1_id*n_devices + device_2_id
+        new_physical_network_link = PhysicalNetworkLink(device_1_id, device_2_id)
+        new_physical_network_link.setLinkID(new_physical_network_link_id)
+        if latencies is not None:
+            new_physical_network_link.setPhysicalNetworkLinkLatency(float(latencies[index]))
+        elif device_1_id == device_2_id:
+            new_physical_network_link.setPhysicalNetworkLinkLatency(0)
+        if bandwidths is not None:
+            new_physical_network_link.setPhysicalNetworkLinkBandwidth(float(bandwidths[index]))
+        physical_network_link_list[new_physical_network_link_id] = new_physical_network_link
+
+
     # Let's try to code a routing table
-def generate_routing_table(devices_list, physical_network_link_list):
+def generate_routing_table(devices_list, physical_network_link_list, engine=ROUTING_ENGINE):
     """
     Generates a routing table on each device
-    The function first lists the neighboring device, then iterate on the list to build a routing table based on shortest distance among links
+    The function first lists the neighboring device, then builds a routing table based on shortest distance among links
+    The legacy engine iterates on the list until no route changes, other engines compute all routes at once with a RoutingEngine
 
     Args:
         devices : list, List of coords
-        physical_network_link_list: list, Lists the physical links between devices
+        physical_network_link_list: list or PhysicalNetworkLinkStore, Lists the physical links between devices, (re)built by the function
+        engine : str, 'legacy' or one of the RoutingEngine methods ('fast', 'floyd', 'dijkstra')
 
     Returns:
-        None
+        routing_engine : RoutingEngine, engine holding the distance and next hop matrices, None for the legacy engine
     """
+    n_devices = len(devices_list)
+
+    if engine != 'legacy':
+        routing_engine = RoutingEngine(n_devices)
+        device_1_ids, device_2_ids, distances = wireless_neighbors(devices_list)
+
+        for device_1_id, device_2_id, distance in zip(device_1_ids.tolist(), device_2_ids.tolist(), distances.tolist()):
+            routing_engine.add_edge(device_1_id, device_2_id, distance)
+
+        routing_engine.compute(engine)
+        routing_engine.apply(devices_list)
+
+        fill_physical_links(physical_network_link_list, n_devices, device_1_ids, device_2_ids)
+
+        return routing_engine
+
+    if isinstance(physical_network_link_list, PhysicalNetworkLinkStore):
+        link_store = physical_network_link_list
+        physical_network_link_list = [None] * (n_devices * n_devices)
+    else:
+        link_store = None
+
     for device_1 in devices_list:
         device_1_id = device_1.getDeviceID()
         for device_2 in devices_list:
@@ -164,22 +281,203 @@ def generate_routing_table(devices_list, physical_network_link_list):
                     changes = True
                     devices_list[i].addToRoutingTable(device_2_id, min_nh, min_array)
 
+    if link_store is not None:
+        link_store.build(n_devices,
+                         [link.device_1_id for link in physical_network_link_list if link is not None],
+                         [link.device_2_id for link in physical_network_link_list if link is not None])
+
+    return None
+
+
+def device_neighbors(device, devices_list):
+    """
+    Lists the devices in wifi range of a given device, including the device itself
+
+    Args:
+        device : Device, device to get the neighbors of
+        devices_list : list, List of devices, None for unused device IDs
+
+    Returns:
+        neighbors : dict {neighbor_id: distance}
+    """
+    others = [other for other in devices_list if other is not None and other.getDeviceID() != device.getDeviceID()]
+    neighbors = {device.getDeviceID(): 0}
+    if others:
+        coords = np.array([[other.x, other.y, other.z] for other in others], dtype=float)
+        distances = custom_distance(device.x, device.y, device.z, coords[:, 0], coords[:, 1], coords[:, 2])
+        for index in np.flatnonzero(distances < wifi_range).tolist():
+            neighbors[others[index].getDeviceID()] = float(distances[index])
+    return neighbors
+
+
+def _set_physical_link(physical_network_link_list, n_devices, device_1_id, device_2_id, connected):
+    """
+    Creates (if needed) or removes the physical link between two devices in the physical link list
+    Existing links are kept as is to preserve their bandwidth reservations
+
+    Args:
+        physical_network_link_list: list or PhysicalNetworkLinkStore, Lists the physical links between devices, modified
+        n_devices : int, number of device IDs, used to compute link IDs
+        device_1_id : int, Device ID of the link source
+        device_2_id : int, Device ID of the link destination
+        connected : Bool, True if the link must exist, False to remove it
+
+    Returns:
+        None
+    """
+    if isinstance(physical_network_link_list, PhysicalNetworkLinkStore):
+        physical_network_link_list.set_link(device_1_id, device_2_id, connected)
+        return
+
+    physical_network_link_id = device_1_id*n_devices + device_2_id
+    if not connected:
+        physical_network_link_list[physical_network_link_id] = None
+    elif physical_network_link_list[physical_network_link_id] is None:
+        new_physical_network_link = PhysicalNetworkLink(device_1_id, device_2_id)
+        new_physical_network_link.setLinkID(physical_network_link_id)
+        if device_1_id == device_2_id:
+            new_physical_network_link.setPhysicalNetworkLinkLatency(0)
+        physical_network_link_list[physical_network_link_id] = new_physical_network_link
+
+
+def add_device(device, devices_list, physical_network_link_list, routing_engine):
+    """
+    Adds a device to a running topology, links it to the devices in range and repairs the affected routes only
+    If the device ID is beyond the current list, the list is extended and physical links are renumbered, as link IDs depend on the number of devices
+    If the device ID is already used (device moved), its links to devices no longer in range are dropped
+    When the devices are bound to a DeviceTable, the new device is bound to the same table, replacing the row of the device it moves
+
+    Args:
+        device : Device, new device, its ID gives its position in devices_list
+        devices_list : list, List of devices, modified
+        physical_network_link_list: list or PhysicalNetworkLinkStore, Lists the physical links between devices, modified
+        routing_engine : RoutingEngine, engine returned by generate_routing_table
+
+    Returns:
+        changed_pairs : np.array, k*2 array of (source, destination) device IDs whose route changed
+    """
+    device_id = device.getDeviceID()
+    # Feasibility masks, admission checks and capacity indexes read the table, the device must have a row in it
+    table = next((other.table for other in devices_list if other is not None and other.table is not None), None)
+    n_old = len(devices_list)
+    if device_id >= n_old:
+        devices_list.extend([None] * (device_id - n_old + 1))
+    n_devices = len(devices_list)
+
+    if n_devices != n_old:
+        if isinstance(physical_network_link_list, PhysicalNetworkLinkStore):
+            physical_network_link_list.renumber(n_devices)
+        else:
+            renumbered_links = [None] * (n_devices * n_devices)
+            for physical_network_link in physical_network_link_list:
+                if physical_network_link is not None:
+                    physical_network_link.setLinkID(physical_network_link.device_1_id*n_devices + physical_network_link.device_2_id)
+                    renumbered_links[physical_network_link.getLinkID()] = physical_network_link
+            physical_network_link_list[:] = renumbered_links
+
+    old_device = devices_list[device_id]
+    if table is not None:
+        if old_device is not None and old_device is not device and old_device.table is table:
+            table.detach(old_device)
+        if device.table is not table:
+            if device.table is not None:
+                device.table.detach(device)
+            table.attach(device)
+
+    devices_list[device_id] = device
+    device.routing_table = dict()
+
+    neighbors = device_neighbors(device, devices_list)
+
+    # A device already present (moved device) loses its links to the devices now out of range, links still in range keep their reservations
+    if device_id < routing_engine.n_devices:
+        for neighbor_id in routing_engine.neighbors[device_id]:
+            if neighbor_id not in neighbors:
+                _set_physical_link(physical_network_link_list, n_devices, device_id, neighbor_id, False)
+                _set_physical_link(physical_network_link_list, n_devices, neighbor_id, device_id, False)
+
+    for neighbor_id in neighbors:
+        _set_physical_link(physical_network_link_list, n_devices, device_id, neighbor_id, True)
+        _set_physical_link(physical_network_link_list, n_devices, neighbor_id, device_id, True)
+
+    changed_pairs = routing_engine.add_device(device_id, neighbors)
+    routing_engine.apply_changes(devices_list, changed_pairs)
+    return changed_pairs
+
+
+def remove_device(device_id, devices_list, physical_network_link_list, routing_engine):
+    """
+    Removes a device from a running topology, drops its links and repairs the routes which were going through it
+    The device slot is set to None in devices_list so that other device IDs are unchanged, and its DeviceTable row (if any) is released
+
+    Args:
+        device_id : int, Device ID of the leaving device
+        devices_list : list, List of devices, modified
+        physical_network_link_list: list or PhysicalNetworkLinkStore, Lists the physical links between devices, modified
+        routing_engine : RoutingEngine, engine returned by generate_routing_table
+
+    Returns:
+        changed_pairs : np.array, k*2 array of (source, destination) device IDs whose route changed
+    """
+    n_devices = len(devices_list)
+    for neighbor_id in routing_engine.neighbors[device_id]:
+        _set_physical_link(physical_network_link_list, n_devices, device_id, neighbor_id, False)
+        _set_physical_link(physical_network_link_list, n_devices, neighbor_id, device_id, False)
+
+    device = devices_list[device_id]
+    if device is not None and device.table is not None:
+        device.table.detach(device)
+    devices_list[device_id] = None
+
+    changed_pairs = routing_engine.remove_device(device_id)
+    routing_engine.apply_changes(devices_list, changed_pairs)
+    return changed_pairs
+
+
+def update_link(device_1_id, device_2_id, distance, devices_list, physical_network_link_list, routing_engine):
+    """
+    Changes the (symmetric) link between two devices and repairs the affected routes only
+
+    Args:
+        device_1_id : int, Device ID of the first device
+        device_2_id : int, Device ID of the second device
+        distance : float, new link distance, None if the devices are no longer linked
+        devices_list : list, List of devices, modified
+        physical_network_link_list: list or PhysicalNetworkLinkStore, Lists the physical links between devices, modified
+        routing_engine : RoutingEngine, engine returned by generate_routing_table
+
+    Returns:
+        changed_pairs : np.array, k*2 array of (source, destination) device IDs whose route changed
+    """
+    n_devices = len(devices_list)
+    _set_physical_link(physical_network_link_list, n_devices, device_1_id, device_2_id, distance is not None)
+    _set_physical_link(physical_network_link_list, n_devices, device_2_id, device_1_id, distance is not None)
+
+    changed_pairs = routing_engine.update_link(device_1_id, device_2_id, distance)
+    routing_engine.apply_changes(devices_list, changed_pairs)
+    return changed_pairs
+
 
 # Now, we can play with deployments
-def simulate_deployments(devices_list, physical_network_link_list):
+def run_deployments(devices_list, physical_network_link_list, testings=200, path_cache=None, routing_engine=None, verbose=True, event_log=None, search='tentatives', capacity_index=None, bandwidth_routing=None):
     """
-    Simulates a complete deployment.
-    Simulates 200 successive application deployments.
+    Runs successive random application deployments, each from a random device.
 
     Args:
         devices : list, List of coords
         physical_network_link_list: list, Lists the physical links between devices
+        testings : int, default to 200, number of applications to deploy
+        path_cache : PathCache, default to None, paths shared between deployments
+        routing_engine : RoutingEngine, default to None, precomputed device distance orders
+        verbose : Bool, default to True to print each deployment result
+        event_log : DeploymentEventLog, default to None, records each deployment result
+        search : str, default to 'tentatives', placement search mode, one of deployment.SEARCH_MODES
+        capacity_index : CapacityIndex, default to None, lists the devices able to host a processus
+        bandwidth_routing : BandwidthRouting, default to None, paths follow bandwidth weighted routes
 
     Returns:
-        None
+        results : dict {name: list}, cumulative values after each deployment (latency, operational_latency, proc_success, app_success, app_refused, trivial)
     """
-    testings = 200
-
     latency_array = [0]
     operational_latency_array = [0]
     app_refused_array = [0]
@@ -197,7 +495,7 @@ def simulate_deployments(devices_list, physical_network_link_list):
         device_id = random.choice(range(len(devices_list)))
 
         # deploy on device, get associated deployed status and latency
-        success, latency, operational_latency, deployed_onto_devices = application_deploy(application, devices_list[device_id], devices_list, physical_network_link_list)
+        success, latency, operational_latency, deployed_onto_devices = application_deploy(application, devices_list[device_id], devices_list, physical_network_link_list, path_cache, routing_engine, verbose, event_log=event_log, search=search, capacity_index=capacity_index, bandwidth_routing=bandwidth_routing)
 
         latency_array.append(latency_array[-1]+latency)
         operational_latency_array.append(operational_latency_array[-1]+operational_latency)
@@ -215,22 +513,52 @@ def simulate_deployments(devices_list, physical_network_link_list):
             app_success_array.append(app_success_array[-1])
             app_refused_array.append(app_refused_array[-1]+1)
 
+    return {'latency': latency_array,
+            'operational_latency': operational_latency_array,
+            'proc_success': proc_success_array,
+            'app_success': app_success_array,
+            'app_refused': app_refused_array,
+            'trivial': trivial_array}
+
+
+def simulate_deployments(devices_list, physical_network_link_list, path_cache=None, routing_engine=None, verbose=True, event_log=None, search='tentatives', capacity_index=None, bandwidth_routing=None):
+    """
+    Simulates a complete deployment.
+    Simulates 200 successive application deployments.
+
+    Args:
+        devices : list, List of coords
+        physical_network_link_list: list, Lists the physical links between devices
+        path_cache : PathCache, default to None, paths shared between deployments
+        routing_engine : RoutingEngine, default to None, precomputed device distance orders
+        verbose : Bool, default to True to print each deployment result
+        event_log : DeploymentEventLog, default to None, records each deployment result
+        search : str, default to 'tentatives', placement search mode, one of deployment.SEARCH_MODES
+        capacity_index : CapacityIndex, default to None, lists the devices able to host a processus
+        bandwidth_routing : BandwidthRouting, default to None, paths follow bandwidth weighted routes
+
+    Returns:
+        None
+    """
+    import matplotlib.pyplot as plt
+
+    results = run_deployments(devices_list, physical_network_link_list, 200, path_cache, routing_engine, verbose, event_log, search, capacity_index, bandwidth_routing)
 
     fig = plt.figure(figsize=(10, 10))
     ax1 = fig.add_subplot()
 
     ax1.set_ylabel('latency')
-    ax1.plot(latency_array, label = 'Deployment Latency', color = 'b')
-    ax1.plot(operational_latency_array, label = 'Operational latency', color = 'c')
+    ax1.plot(results['latency'], label = 'Deployment Latency', color = 'b')
+    ax1.plot(results['operational_latency'], label = 'Operational latency', color = 'c')
     ax1.legend()
 
     ax2 = ax1.twinx()
     ax2.set_ylabel('# of apps (deployed or refused)')
     ax2.set_ylim(0,300)
-    ax2.plot(proc_success_array, label = 'Successful processus deployments', color = 'g')
-    ax2.plot(app_success_array, label = 'Successful application deploy', color = 'orange')
-    ax2.plot(app_refused_array, label = 'Failed application deploy', color = 'r')
-    ax2.plot(trivial_array, label = 'Trivial application deploy', color = 'black')
+    ax2.plot(results['proc_success'], label = 'Successful processus deployments', color = 'g')
+    ax2.plot(results['app_success'], label = 'Successful application deploy', color = 'orange')
+    ax2.plot(results['app_refused'], label = 'Failed application deploy', color = 'r')
+    ax2.plot(results['trivial'], label = 'Trivial application deploy', color = 'black')
     ax2.legend()
 
     # Set the labels
@@ -238,4 +566,132 @@ def simulate_deployments(devices_list, physical_network_link_list):
     ax1.set_title(f'Deployment results')
 
     # Print the graph
-    plt.savefig("fig/results.png")
\ No newline at end of file
+    plt.savefig("fig/results.png")
+
+
+# Topology copied once into each worker process, (devices_list, physical_network_link_list, routing_engine)
+_replication_state = None
+
+
+def _init_replication_worker(devices_list, physical_network_link_list, routing_engine):
+    """
+    Process pool initializer, keeps the pristine topology for the replications run by this worker
+
+    Args:
+        devices_list : list, List of devices
+        physical_network_link_list: list, Lists the physical links between devices
+        routing_engine : RoutingEngine, precomputed routes, may be None
+
+    Returns:
+        None
+    """
+    global _replication_state
+    if routing_engine is not None:
+        # Callbacks from the parent process are not relevant in the worker
+        routing_engine.listeners = list()
+    _replication_state = (devices_list, physical_network_link_list, routing_engine)
+
+
+def _run_replication(seed, testings):
+    """
+    Runs one replication on a fresh copy of the worker's topology
+
+    Args:
+        seed : int, random seed of the replication
+        testings : int, number of applications to deploy
+
+    Returns:
+        results : dict {name: list}, as returned by run_deployments
+    """
+    devices_list, physical_network_link_list, routing_engine = copy.deepcopy(_replication_state)
+
+    random.seed(seed)
+    np.random.seed(seed)
+
+    path_cache = PathCache()
+    if routing_engine is not None:
+        routing_engine.subscribe(path_cache.invalidate)
+
+    return run_deployments(devices_list, physical_network_link_list, testings, path_cache, routing_engine, verbose=False)
+
+
+def _confidence_interval(values, confidence_z=1.96):
+    """
+    Mean and normal approximation confidence interval over replications
+
+    Args:
+        values : np.array, one value per replication (first axis)
+        confidence_z : float, default to 1.96 for a 95% interval
+
+    Returns:
+        (mean, low, high) : (float or np.array, ...), mean and interval bounds
+    """
+    values = np.asarray(values, dtype=float)
+    mean = values.mean(axis=0)
+    if len(values) < 2:
+        return mean, mean, mean
+    half_width = confidence_z * values.std(axis=0, ddof=1) / np.sqrt(len(values))
+    return mean, mean - half_width, mean + half_width
+
+
+def simulate_replications(devices_list, physical_network_link_list, n_replications=10, workers=None, seed=0, testings=200, routing_engine=None):
+    """
+    Runs independent seeded replications of the deployment simulation across a process pool.
+    Each worker gets its own copy of devices and links, each replication starts from the initial cluster state.
+
+    Args:
+        devices_list : list, List of devices
+        physical_network_link_list: list, Lists the physical links between devices
+        n_replications : int, default to 10, number of replications
+        workers : int, default to None for one worker per core
+        seed : int, default to 0, replication i uses seed + i
+        testings : int, default to 200, number of applications deployed per replication
+        routing_engine : RoutingEngine, default to None, precomputed routes
+
+    Returns:
+        summary : dict, (mean, low, high) 95% confidence intervals for acceptance (ratio of deployed applications), latency and operational_latency (mean per deployed application) and trivial (number of trivial deployments), plus 'app_success_curve' for the cumulative number of deployed applications
+    """
+    with concurrent.futures.ProcessPoolExecutor(max_workers=workers,
+                                                initializer=_init_replication_worker,
+                                                initargs=(devices_list, physical_network_link_list, routing_engine)) as executor:
+        replications = list(executor.map(_run_replication, [seed + i for i in range(n_replications)], [testings] * n_replications))
+
+    deployed = np.array([results['app_success'][-1] for results in replications], dtype=float)
+    per_deployment = np.maximum(deployed, 1)
+
+    summary = {'replications': n_replications,
+               'acceptance': _confidence_interval(deployed / testings),
+               'latency': _confidence_interval([results['latency'][-1] for results in replications] / per_deployment),
+               'operational_latency': _confidence_interval([results['operational_latency'][-1] for results in replications] / per_deployment),
+               'trivial': _confidence_interval([results['trivial'][-1] for results in replications]),
+               'app_success_curve': _confidence_interval([results['app_success'] for results in replications])}
+
+    logging.info(f"{n_replications} replications, acceptance {summary['acceptance'][0]:.3f} [{summary['acceptance'][1]:.3f}, {summary['acceptance'][2]:.3f}]")
+
+    return summary
+
+
+def plot_replications(summary):
+    """
+    Plots the mean cumulative number of deployed applications over replications with its confidence band, under fig/replications.png
+
+    Args:
+        summary : dict, as returned by simulate_replications
+
+    Returns:
+        None
+    """
+    import matplotlib.pyplot as plt
+
+    mean, low, high = summary['app_success_curve']
+
+    fig = plt.figure(figsize=(10, 10))
+    ax = fig.add_subplot()
+    ax.plot(mean, label = 'Successful application deploy (mean)', color = 'orange')
+    ax.fill_between(range(len(mean)), low, high, color = 'orange', alpha = 0.3, label = '95% confidence interval')
+    ax.set_xlabel('# of apps (deployed or refused)')
+    ax.set_ylabel('# of apps deployed')
+    ax.legend()
+    ax.set_title(f"Deployment results over {summary['replications']} replications")
+
+    plt.savefig("fig/replications.png")
@@ -0,0 +1,72 @@
+"""
+Tests of the BandwidthRouting, paths go around loaded links and come back once the links are freed
+
+Usage:
+
+    python -m pytest tests
+
+"""
+import io
+import contextlib
+
+import simulation
+from modules.BandwidthRouting import BandwidthRouting
+from modules.Device import Device
+from modules.PathCache import PathCache
+from modules.PhysicalNetworkLinkStore import PhysicalNetworkLinkStore, DEFAULT_BANDWIDTH
+
+
+def diamond():
+    """
+    Devices 0 and 2 are out of range of each other, linked through device 1 (shortest) or device 3
+
+    Args:
+        None
+
+    Returns:
+        (devices_list, links, routing_engine)
+    """
+    devices_list = list()
+    for device_id, (x, y) in enumerate([(0, 0), (6, 1), (12, 0), (6, -3)]):
+        device = Device()
+        device.setDeviceID(device_id)
+        device.setDevicePosition(x, y, 0)
+        devices_list.append(device)
+    links = PhysicalNetworkLinkStore(4)
+    with contextlib.redirect_stdout(io.StringIO()):
+        routing_engine = simulation.generate_routing_table(devices_list, links, engine='fast')
+    return devices_list, links, routing_engine
+
+
+def test_loaded_link_is_routed_around():
+    devices_list, links, routing_engine = diamond()
+    bandwidth_routing = BandwidthRouting(devices_list, links, routing_engine)
+    path_cache = PathCache()
+    bandwidth_routing.subscribe(path_cache.invalidate)
+    assert path_cache.get(devices_list, 0, 2).devices_path == [0, 1, 2]
+
+    # Half of the link 0 -> 1 is used, its weight doubles
+    links.use_bandwidth([0*4 + 1], DEFAULT_BANDWIDTH / 2)
+    changed_pairs = bandwidth_routing.refresh()
+
+    assert (0, 2) in set(map(tuple, changed_pairs.tolist()))
+    assert (0, 2) not in path_cache.paths
+    assert path_cache.get(devices_list, 0, 2).devices_path == [0, 3, 2]
+    # Routes which do not use the link are unchanged, the distance engine is untouched
+    assert path_cache.get(devices_list, 2, 0).devices_path == [2, 1, 0]
+    assert routing_engine.next_hop[0, 2] == 1
+
+    links.free_bandwidth([0*4 + 1], DEFAULT_BANDWIDTH / 2)
+    bandwidth_routing.refresh()
+
+    assert path_cache.get(devices_list, 0, 2).devices_path == [0, 1, 2]
+
+
+def test_refresh_without_level_change_keeps_routes():
+    devices_list, links, routing_engine = diamond()
+    bandwidth_routing = BandwidthRouting(devices_list, links, routing_engine)
+
+    links.use_bandwidth([0*4 + 1], 1)
+
+    assert len(bandwidth_routing.refresh()) == 0
+    assert devices_list[0].getRouteInfo(2)[0] == 1
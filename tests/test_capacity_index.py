@@ -0,0 +1,72 @@
+"""
+Tests of the CapacityIndex, cells must follow the table as resources are reserved and released
+
+Usage:
+
+    python -m pytest tests
+
+"""
+import io
+import random
+import contextlib
+
+import numpy as np
+
+import benchmark
+import deployment
+from modules.Application import Application
+from modules.CapacityIndex import CapacityIndex
+from modules.Processus import Processus
+from modules.ReservationLedger import ReservationLedger
+
+
+def check_index(capacity_index, table):
+    """
+    Compares the cells of an index with the ones of an index rebuilt from the table, and its queries with the feasibility mask
+
+    Args:
+        capacity_index : CapacityIndex, index updated through the table callbacks
+        table : DeviceTable
+
+    Returns:
+        None
+    """
+    rebuilt = CapacityIndex(table)
+    assert capacity_index.device_cells == rebuilt.device_cells
+    assert capacity_index.cells == rebuilt.cells
+
+    for _ in range(20):
+        proc = Processus()
+        proc.randomProcInit()
+        assert capacity_index.fitting_devices(proc).tolist() == np.flatnonzero(deployment.feasibility_mask(proc, table)).tolist()
+
+
+def test_cells_follow_reserve_and_undeploy():
+    devices_list, links, routing_engine, _ = benchmark.routed_cluster(60)
+    table = devices_list[0].table
+    capacity_index = CapacityIndex(table)
+    initial_cells = dict(capacity_index.device_cells)
+    ledger = ReservationLedger()
+
+    random.seed(0)
+    deployed = list()
+    with contextlib.redirect_stdout(io.StringIO()):
+        for _ in range(60):
+            app = Application()
+            app.randomAppInit()
+            if deployment.application_deploy(app, random.choice(devices_list), devices_list, links, routing_engine=routing_engine, ledger=ledger, capacity_index=capacity_index)[0]:
+                deployed.append(app.id)
+
+    # Loaded devices moved to lower cells
+    assert deployed
+    assert capacity_index.device_cells != initial_cells
+    check_index(capacity_index, table)
+
+    for app_id in deployed[::2]:
+        deployment.undeploy(app_id, devices_list, links, ledger)
+    check_index(capacity_index, table)
+
+    for app_id in deployed[1::2]:
+        deployment.undeploy(app_id, devices_list, links, ledger)
+    check_index(capacity_index, table)
+    assert capacity_index.device_cells == initial_cells
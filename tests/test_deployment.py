@@ -0,0 +1,189 @@
+"""
+Tests of application_deploy, a deployment is rolled back only when its placement is incomplete, table-bound candidates are the devices deployable_proc accepts, and batches record one result per application
+
+Usage:
+
+    python -m pytest tests
+
+"""
+import io
+import random
+import contextlib
+
+import numpy as np
+
+import benchmark
+import deployment
+import simulation
+from modules.Application import Application
+from modules.Device import Device
+from modules.DeploymentMetrics import DeploymentMetrics
+from modules.DeviceTable import DeviceTable
+from modules.PhysicalNetworkLinkStore import PhysicalNetworkLinkStore
+from modules.Processus import Processus
+from modules.ReservationLedger import ReservationLedger
+
+
+def line_cluster(n_devices):
+    """
+    Devices in a line, each one only fits a single processus of one_per_device_app
+
+    Args:
+        n_devices : int, number of devices
+
+    Returns:
+        (devices_list, links, routing_engine)
+    """
+    devices_list = list()
+    for device_id in range(n_devices):
+        device = Device()
+        device.setDeviceID(device_id)
+        device.setDevicePosition(device_id, 0, 0)
+        device.setDeviceCPULimit(2)
+        device.setDeviceGPULimit(4)
+        device.setDeviceMemLimit(4096)
+        device.setDeviceDiskLimit(102400)
+        devices_list.append(device)
+    DeviceTable.from_devices(devices_list)
+    links = PhysicalNetworkLinkStore(n_devices)
+    with contextlib.redirect_stdout(io.StringIO()):
+        routing_engine = simulation.generate_routing_table(devices_list, links, engine='fast')
+    return devices_list, links, routing_engine
+
+
+def one_per_device_app(num_procs, cpu=1.5):
+    """
+    Application of unlinked processus, two of them never fit on the same device
+
+    Args:
+        num_procs : int, number of processus
+        cpu : float, default to 1.5, CPU request of each processus, more than 1 so that two processus never fit on a device
+
+    Returns:
+        app : Application
+    """
+    app = Application()
+    app.app_yaml_parser({'Application': [{'Processus': {'id': i, 'cpu': cpu, 'gpu': 1, 'memory': 512, 'disk': 1024}} for i in range(num_procs)],
+                         'AppLinks': []})
+    return app
+
+
+def deploy(app, cluster, metrics, search='tentatives'):
+    """
+    Deploys an application from the first device of a cluster built by line_cluster
+
+    Args:
+        app : Application, application to deploy
+        cluster : (devices_list, links, routing_engine), from line_cluster
+        metrics : DeploymentMetrics, filled by the deployment
+        search : str, default to 'tentatives', placement search mode
+
+    Returns:
+        (deployment_success, latency, operational_latency, deployed_onto_devices), from application_deploy
+    """
+    devices_list, links, routing_engine = cluster
+    return deployment.application_deploy(app, devices_list[0], devices_list, links, routing_engine=routing_engine, verbose=False,
+                                          ledger=ReservationLedger(), metrics=metrics, search=search)
+
+
+def test_placement_completed_on_last_tentative_is_kept(monkeypatch):
+    # Each tentative places one processus, the last one completes the placement
+    monkeypatch.setattr(deployment, 'MAX_TENTATIVES', 3)
+    cluster = line_cluster(4)
+    metrics = DeploymentMetrics()
+
+    success, _, _, placement = deploy(one_per_device_app(3), cluster, metrics)
+
+    assert success
+    assert len(set(placement)) == 3
+    assert metrics.tentatives == 3
+    assert metrics.tentatives_exhausted == 0
+
+
+def test_exhausted_tentatives_roll_back(monkeypatch):
+    monkeypatch.setattr(deployment, 'MAX_TENTATIVES', 2)
+    cluster = line_cluster(4)
+    metrics = DeploymentMetrics()
+
+    success, _, _, placement = deploy(one_per_device_app(3), cluster, metrics)
+
+    assert not success and placement == []
+    assert metrics.tentatives_exhausted == 1
+    assert all(device.cpu_usage == 0 for device in cluster[0])
+
+
+def test_backtracking_without_placement_is_not_exhausted():
+    # More processus than devices but enough total capacity, the search runs out of devices before running out of tentatives
+    cluster = line_cluster(2)
+    metrics = DeploymentMetrics()
+
+    success, _, _, _ = deploy(one_per_device_app(3, cpu=1.2), cluster, metrics, search='backtracking')
+
+    assert not success
+    assert metrics.admission_rejections == 0
+    assert metrics.tentatives_exhausted == 0
+
+
+def test_backtracking_cut_off_is_exhausted(monkeypatch):
+    monkeypatch.setattr(deployment, 'MAX_TENTATIVES', 2)
+    cluster = line_cluster(4)
+    metrics = DeploymentMetrics()
+
+    success, _, _, _ = deploy(one_per_device_app(3), cluster, metrics, search='backtracking')
+
+    assert not success
+    assert metrics.tentatives_exhausted == 1
+
+
+def test_feasibility_mask_matches_deployable_proc():
+    devices_list, links, routing_engine, _ = benchmark.routed_cluster(60)
+    table = devices_list[0].table
+    ledger = ReservationLedger()
+
+    random.seed(0)
+    with contextlib.redirect_stdout(io.StringIO()):
+        for _ in range(40):
+            app = Application()
+            app.randomAppInit()
+            deployment.application_deploy(app, random.choice(devices_list), devices_list, links, routing_engine=routing_engine, ledger=ledger)
+    # Some devices are loaded and a removed device leaves an inactive row
+    assert len(ledger) > 0
+    table.detach(devices_list[5])
+    devices_list[5] = None
+
+    for _ in range(50):
+        proc = Processus()
+        proc.randomProcInit()
+        mask = deployment.feasibility_mask(proc, table)
+        expected = [device is not None and deployment.deployable_proc(proc, device) for device in devices_list]
+        assert mask.tolist() == expected
+
+
+def test_batch_results_follow_apps_and_undeploy_to_baseline():
+    devices_list, links, routing_engine, _ = benchmark.routed_cluster(40)
+    ledger = ReservationLedger()
+
+    random.seed(0)
+    apps = list()
+    for _ in range(30):
+        app = Application()
+        app.randomAppInit()
+        apps.append(app)
+    sources = [random.randrange(len(devices_list)) for _ in apps]
+
+    # Largest applications are deployed first, results still follow the order of apps
+    results = deployment.application_deploy_batch(apps, sources, devices_list, links, routing_engine=routing_engine, packing='decreasing', ledger=ledger)
+
+    assert results['app_id'].tolist() == [app.id for app in apps]
+    assert results['source_id'].tolist() == sources
+    assert results['success'].any()
+    for record in results:
+        assert (record['app_id'] in ledger) == record['success']
+        assert (len(record['placement']) > 0) == record['success']
+
+    for app_id in results['app_id'][results['success']]:
+        deployment.undeploy(app_id, devices_list, links, ledger)
+    assert len(ledger) == 0
+    usages = np.array([[device.cpu_usage, device.gpu_usage, device.mem_usage, device.disk_usage] for device in devices_list])
+    assert np.allclose(usages, 0)
+    assert np.allclose(links.bandwidth_use, 0)
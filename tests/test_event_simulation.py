@@ -0,0 +1,88 @@
+"""
+Tests of the EventSimulator, resources are conserved : usages go back to their baseline once every application departed
+
+Usage:
+
+    python -m pytest tests
+
+"""
+import random
+
+import numpy as np
+import pytest
+
+import benchmark
+from event_simulation import EventSimulator, constant_arrivals, exponential_lifetimes
+from modules.CapacityIndex import CapacityIndex
+from modules.PathCache import PathCache
+
+
+def cluster_usage(devices_list, links):
+    """
+    Returns the usage of every device and the bandwidth used on every link
+
+    Args:
+        devices_list : list of devices
+        links : PhysicalNetworkLinkStore or list of links
+
+    Returns:
+        (device_usages, link_usages) : (np.array, np.array)
+    """
+    device_usages = np.array([[device.cpu_usage, device.gpu_usage, device.mem_usage, device.disk_usage] for device in devices_list])
+    if isinstance(links, list):
+        link_usages = np.array([link.bandwidth_use for link in links if link])
+    else:
+        link_usages = links.bandwidth_use.copy()
+    return device_usages, link_usages
+
+
+def limited_arrivals(rate, count):
+    """
+    Constant arrivals, no arrival after the first count ones
+
+    Args:
+        rate : float, arrival rate
+        count : int, number of arrivals
+
+    Returns:
+        function() -> float, time to the next arrival
+    """
+    arrivals = constant_arrivals(rate)
+    remaining = [count]
+
+    def next_arrival():
+        remaining[0] -= 1
+        return arrivals() if remaining[0] > 0 else float('inf')
+    return next_arrival
+
+
+@pytest.mark.parametrize('links_kind', ['store', 'list'])
+def test_usage_returns_to_baseline(links_kind):
+    devices_list, links, routing_engine, _ = benchmark.routed_cluster(40, links=links_kind)
+    # Resources already used before the simulation stay used
+    devices_list[0].setDeviceCPUUsage(1)
+    devices_list[1].setDeviceMemUsage(1024)
+    baseline_devices, baseline_links = cluster_usage(devices_list, links)
+    baseline = np.append(baseline_devices.sum(axis=0), baseline_links.sum())
+
+    random.seed(0)
+    path_cache = PathCache()
+    routing_engine.subscribe(path_cache.invalidate)
+    simulator = EventSimulator(devices_list, links, path_cache, routing_engine, arrivals=limited_arrivals(2, 150), lifetimes=exponential_lifetimes(20),
+                               capacity_index=CapacityIndex(devices_list[0].table))
+
+    while simulator.queue and simulator.queue[0][0] < float('inf'):
+        # The last arrival is never reached, the horizon only bounds the run
+        simulator.run(horizon=1e9, max_events=25)
+        # The tracked usage and the cluster usage are the baseline plus the footprints of the deployed applications
+        footprints = sum(simulator.footprints.values(), np.zeros(len(baseline)))
+        device_usages, link_usages = cluster_usage(devices_list, links)
+        assert np.allclose(simulator.usage, baseline + footprints)
+        assert np.allclose(np.append((device_usages - baseline_devices).sum(axis=0), (link_usages - baseline_links).sum()), footprints)
+
+    assert simulator.accepted > 0 and simulator.departed == simulator.accepted
+    assert len(simulator.ledger) == 0 and not simulator.footprints
+    device_usages, link_usages = cluster_usage(devices_list, links)
+    assert np.allclose(device_usages, baseline_devices)
+    assert np.allclose(link_usages, baseline_links)
+    assert np.allclose(simulator.usage, baseline)
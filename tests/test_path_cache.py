@@ -0,0 +1,85 @@
+"""
+Tests of the PathCache, paths are dropped when the routing engine changes the routes they follow, and only those
+
+Usage:
+
+    python -m pytest tests
+
+"""
+import random
+
+import benchmark
+import simulation
+from modules.Path import Path
+from modules.PathCache import PathCache
+
+
+def fill(path_cache, devices_list):
+    """
+    Caches the paths between all pairs of devices
+
+    Args:
+        path_cache : PathCache
+        devices_list : list of devices
+
+    Returns:
+        paths : dict {(source_id, destination_id): Path}, cached paths
+    """
+    return {(source_id, destination_id): path_cache.get(devices_list, source_id, destination_id)
+            for source_id in range(len(devices_list)) for destination_id in range(len(devices_list))}
+
+
+def check_fresh(path_cache, devices_list):
+    """
+    Checks that every cached path is the one generated from the current routing tables
+
+    Args:
+        path_cache : PathCache
+        devices_list : list of devices
+
+    Returns:
+        None
+    """
+    for (source_id, destination_id), path in path_cache.paths.items():
+        fresh = Path()
+        fresh.path_generation(devices_list, source_id, destination_id)
+        assert path.devices_path == fresh.devices_path
+        assert path.physical_links_path == fresh.physical_links_path
+
+
+def test_route_changes_drop_affected_paths():
+    devices_list, links, routing_engine, _ = benchmark.routed_cluster(30)
+    path_cache = PathCache()
+    routing_engine.subscribe(path_cache.invalidate)
+
+    random.seed(0)
+    for _ in range(20):
+        paths = fill(path_cache, devices_list)
+        # Cut a link used by a cached multi-hop path, or make a new shortcut
+        multi_hop = [path for path in paths.values() if len(path.devices_path) > 2]
+        path = random.choice(multi_hop)
+        if random.random() < 0.5:
+            device_1_id, device_2_id, distance = path.devices_path[0], path.devices_path[1], None
+        else:
+            device_1_id, device_2_id, distance = path.devices_path[0], path.devices_path[-1], 0.1
+
+        changed_pairs = simulation.update_link(device_1_id, device_2_id, distance, devices_list, links, routing_engine)
+
+        changed = set(map(tuple, changed_pairs.tolist()))
+        assert (path.devices_path[0], path.devices_path[-1]) not in path_cache.paths
+        for key, cached in paths.items():
+            # Paths kept are the same objects, paths dropped went through a changed route
+            follows_changed_route = any((device_id, key[1]) in changed for device_id in cached.devices_path)
+            assert (path_cache.paths.get(key) is cached) != follows_changed_route
+        check_fresh(path_cache, devices_list)
+
+
+def test_full_route_recompute_clears_the_cache():
+    devices_list, links, routing_engine, _ = benchmark.routed_cluster(20)
+    path_cache = PathCache()
+    routing_engine.subscribe(path_cache.invalidate)
+    fill(path_cache, devices_list)
+
+    routing_engine.apply(devices_list)
+
+    assert not path_cache.paths and not path_cache.links and not path_cache.through
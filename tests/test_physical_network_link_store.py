@@ -0,0 +1,86 @@
+"""
+Tests of the PhysicalNetworkLinkStore, links missing from the store must never read or write another link's values
+
+Usage:
+
+    python -m pytest tests
+
+"""
+import numpy as np
+import pytest
+
+from modules.Path import Path
+from modules.PhysicalNetworkLinkStore import PhysicalNetworkLinkStore, DEFAULT_BANDWIDTH
+
+from deployment import reservable_bandwidth
+
+
+def three_devices_store():
+    """
+    Store of 3 devices, linked 0 -> 1 and 2 -> 0, there is no link from 1 to 2
+
+    Args:
+        None
+
+    Returns:
+        store : PhysicalNetworkLinkStore
+    """
+    store = PhysicalNetworkLinkStore(3)
+    store.build(3, [0, 2], [1, 0])
+    return store
+
+
+def path_over_missing_link():
+    """
+    Path 0 -> 1 -> 2, its second link is not in the store
+
+    Args:
+        None
+
+    Returns:
+        path : Path
+    """
+    path = Path()
+    path.setSourceID(0)
+    path.setDestinationID(2)
+    path.devices_path = [0, 1, 2]
+    path.physical_links_path = [0*3 + 1, 1*3 + 2]
+    return path
+
+
+def test_missing_link_has_no_bandwidth():
+    store = three_devices_store()
+    path = path_over_missing_link()
+
+    assert path.minBandwidthAvailableonPath(store) == 0
+    assert not reservable_bandwidth(path, 1, store)
+
+
+def test_missing_link_is_not_allocated():
+    store = three_devices_store()
+    path = path_over_missing_link()
+
+    allocated = store.use_bandwidth(path.physical_links_path, 100)
+
+    assert allocated.tolist() == [True, False]
+    # Only the existing link of the path is used, the last link of the store is untouched
+    assert store.available_bandwidth([0*3 + 1]).tolist() == [DEFAULT_BANDWIDTH - 100]
+    assert store.available_bandwidth([2*3 + 0]).tolist() == [DEFAULT_BANDWIDTH]
+
+    store.free_bandwidth(path.physical_links_path, 100)
+    assert np.all(store.bandwidth_use == 0)
+
+
+def test_missing_link_latency_raises():
+    store = three_devices_store()
+
+    with pytest.raises(KeyError):
+        store.link_latency(path_over_missing_link().physical_links_path)
+
+
+def test_empty_store():
+    store = PhysicalNetworkLinkStore(3)
+
+    assert store.available_bandwidth([1]).tolist() == [0]
+    assert store.use_bandwidth([1], 100).tolist() == [False]
+    store.free_bandwidth([1], 100)
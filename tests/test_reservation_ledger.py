@@ -0,0 +1,95 @@
+"""
+Tests of the ReservationLedger persistence, reservations saved with the device usages must be released after a restart
+
+Usage:
+
+    python -m pytest tests
+
+"""
+import numpy as np
+
+from modules.Processus import Processus
+from modules.PhysicalNetworkLinkStore import PhysicalNetworkLinkStore
+from modules.ReservationLedger import ReservationLedger
+from modules.db.interact_db import create_db
+from modules.db.interact_db import populate_db
+from modules.db.interact_db import load_devices
+from modules.db.interact_db import load_reservations
+from modules.db.interact_db import DeviceUsageWriter
+
+
+def load_cluster(device_db):
+    """
+    Loads the devices of the database and links them 0 -> 1 and 1 -> 2, links have no usage
+
+    Args:
+        device_db : str, database location
+
+    Returns:
+        (devices_list, device_table, store)
+    """
+    devices_list, device_table = load_devices(device_db)
+    store = PhysicalNetworkLinkStore(3)
+    store.build(3, [0, 1], [1, 2])
+    return devices_list, device_table, store
+
+
+def test_reservations_survive_restart(tmp_path):
+    device_db = str(tmp_path / 'db.sqlite')
+    create_db(device_db)
+    populate_db([[0, 0], [1, 0], [2, 0]], device_db)
+
+    devices_list, device_table, store = load_cluster(device_db)
+    ledger = ReservationLedger()
+    proc = Processus()
+    proc.cpu_request = 1
+    proc.mem_request = 512
+    ledger.reserve_device(7, 0, devices_list[0], proc)
+    ledger.reserve_device(7, 1, devices_list[2], proc)
+    ledger.reserve_links(7, (0, 1), [0*3 + 1, 1*3 + 2], 100, store)
+    DeviceUsageWriter(device_db, device_table, ledger=ledger).close()
+
+    # Restart, usages come from the device table, link usages from the reservations
+    devices_list, device_table, store = load_cluster(device_db)
+    restored = ReservationLedger()
+    restored.restore(load_reservations(device_db), devices_list, store)
+
+    assert 7 in restored
+    assert restored.processes_on(2) == {(7, 1)}
+    assert restored.flows_through(1, 2) == {(7, (0, 1)): 100}
+    assert store.available_bandwidth([0*3 + 1, 1*3 + 2]).tolist() == (store.bandwidth - 100).tolist()
+    assert devices_list[0].cpu_usage == 1
+    assert not restored.dirty
+
+    assert restored.release(7, devices_list, store)
+    assert np.all(store.bandwidth_use == 0)
+    assert devices_list[0].cpu_usage == 0 and devices_list[2].mem_usage == 0
+
+    # The release is saved too
+    DeviceUsageWriter(device_db, device_table, ledger=restored).close()
+    assert load_reservations(device_db) == dict()
+
+
+def test_writer_only_writes_snapshots(tmp_path):
+    device_db = str(tmp_path / 'db.sqlite')
+    create_db(device_db)
+    populate_db([[0, 0], [1, 0], [2, 0]], device_db)
+    devices_list, device_table, store = load_cluster(device_db)
+    ledger = ReservationLedger()
+    writer = DeviceUsageWriter(device_db, device_table, ledger=ledger)
+    proc = Processus()
+    proc.cpu_request = 1
+
+    # A deployment in progress is not seen by the writer thread
+    ledger.reserve_device(3, 0, devices_list[1], proc)
+    assert writer.flush() == 0
+    assert load_reservations(device_db) == dict()
+
+    writer.snapshot()
+    ledger.reserve_device(3, 1, devices_list[2], proc)
+    assert writer.flush() == 1
+    assert [device_id for _, device_id, _ in load_reservations(device_db)[3]['devices']] == [1]
+
+    writer.close()
+    assert [device_id for _, device_id, _ in load_reservations(device_db)[3]['devices']] == [1, 2]
+    assert load_devices(device_db)[0][2].cpu_usage == 1
@@ -0,0 +1,92 @@
+"""
+Tests of the placement service, every request gets a response and failed requests leave the cluster unchanged
+
+Usage:
+
+    python -m pytest tests
+
+"""
+import asyncio
+import json
+
+import yaml
+
+import benchmark
+import service
+from service import PlacementService
+
+
+APP_YAML = yaml.safe_dump({'Application': [{'Processus': {'id': 0, 'cpu': 1, 'gpu': 1, 'memory': 512, 'disk': 1024}}], 'AppLinks': []}).encode()
+
+
+def request(service_, requests):
+    """
+    Sends HTTP requests over a single connection to a service listening on a local TCP port
+
+    Args:
+        service_ : PlacementService
+        requests : list of (method, target, body)
+
+    Returns:
+        responses : list of (status, result)
+    """
+    async def exchange():
+        server = await asyncio.start_server(service_.handle_connection, '127.0.0.1', 0)
+        port = server.sockets[0].getsockname()[1]
+        reader, writer = await asyncio.open_connection('127.0.0.1', port)
+        responses = list()
+        for method, target, body in requests:
+            writer.write(f"{method} {target} HTTP/1.1\r\nContent-Length: {len(body)}\r\n\r\n".encode() + body)
+            status = int((await reader.readline()).split()[1])
+            headers = dict()
+            while (line := await reader.readline()) != b'\r\n':
+                name, _, value = line.decode().partition(':')
+                headers[name.strip().lower()] = value.strip()
+            responses.append((status, json.loads(await reader.readexactly(int(headers['content-length'])))))
+        writer.close()
+        server.close()
+        await server.wait_closed()
+        return responses
+
+    return asyncio.run(exchange())
+
+
+def cluster_service():
+    """
+    Service over a small routed cluster whose device 3 was removed
+
+    Args:
+        None
+
+    Returns:
+        service_ : PlacementService
+    """
+    devices_list, links, routing_engine, _ = benchmark.routed_cluster(20)
+    devices_list[3] = None
+    return PlacementService(devices_list, links, routing_engine=routing_engine)
+
+
+def test_unexpected_error_replies_500_and_rolls_back(monkeypatch):
+    service_ = cluster_service()
+    usages = [device.cpu_usage for device in service_.devices_list if device is not None]
+
+    def failing_deploy(app, device, devices_list, physical_network_link_list, *args, ledger=None, **kwargs):
+        ledger.reserve_device(app.id, 0, device, app.processus_list[0])
+        raise AttributeError("broken deployment")
+    monkeypatch.setattr(service, 'application_deploy', failing_deploy)
+
+    responses = request(service_, [('POST', '/deploy?source=0', APP_YAML), ('GET', '/stats', b'')])
+
+    assert responses[0][0] == 500 and 'broken deployment' in responses[0][1]['error']
+    # The connection is still served
+    assert responses[1][0] == 200 and responses[1][1]['deployed'] == 0
+    assert [device.cpu_usage for device in service_.devices_list if device is not None] == usages
+
+
+def test_removed_source_is_rejected():
+    service_ = cluster_service()
+
+    responses = request(service_, [('POST', '/deploy?source=3', APP_YAML), ('POST', '/deploy?source=99', APP_YAML), ('POST', '/deploy', APP_YAML)])
+
+    assert [status for status, _ in responses] == [400, 400, 200]
+    assert responses[2][1]['source_id'] != 3
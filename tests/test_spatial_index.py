@@ -0,0 +1,56 @@
+"""
+Tests of the SpatialIndex, neighbors found through the grid must be the ones of a full scan
+
+Usage:
+
+    python -m pytest tests
+
+"""
+import numpy as np
+
+from modules.SpatialIndex import SpatialIndex
+
+from simulation import custom_distance
+
+
+def full_scan_pairs(coords, radius):
+    """
+    Lists the ordered pairs of points closer than radius by comparing all the points
+
+    Args:
+        coords : np.array, n*3 coordinates
+        radius : float, maximal distance (excluded)
+
+    Returns:
+        set of (index_1, index_2)
+    """
+    distances = custom_distance(coords[:, None, 0], coords[:, None, 1], coords[:, None, 2], coords[None, :, 0], coords[None, :, 1], coords[None, :, 2])
+    return set(map(tuple, np.argwhere(distances < radius).tolist()))
+
+
+def test_flat_layout_searches_one_layer():
+    coords = np.column_stack((np.random.default_rng(0).uniform(0, 40, (200, 2)), np.zeros(200)))
+    index = SpatialIndex(coords, 5)
+
+    assert len(index.offsets) == 9
+    index_1, index_2, _ = index.pairs_within(5, custom_distance)
+    assert set(zip(index_1.tolist(), index_2.tolist())) == full_scan_pairs(coords, 5)
+
+
+def test_layered_layout_matches_full_scan():
+    coords = np.random.default_rng(1).uniform(0, 20, (200, 3))
+    index = SpatialIndex(coords, 5)
+
+    assert len(index.offsets) == 27
+    index_1, index_2, _ = index.pairs_within(5, custom_distance)
+    assert set(zip(index_1.tolist(), index_2.tolist())) == full_scan_pairs(coords, 5)
+
+
+def test_query_from_another_layer():
+    coords = np.column_stack((np.random.default_rng(2).uniform(0, 40, (200, 2)), np.full(200, 4.5)))
+    index = SpatialIndex(coords, 5)
+
+    for point in [(20, 20, 5.5), (20, 20, 3), (20, 20, 12)]:
+        indexes, _ = index.query(point, 5, custom_distance)
+        distances = custom_distance(point[0], point[1], point[2], coords[:, 0], coords[:, 1], coords[:, 2])
+        assert indexes.tolist() == np.flatnonzero(distances < 5).tolist()
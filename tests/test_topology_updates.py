@@ -0,0 +1,232 @@
+"""
+Tests of the incremental topology updates of simulation (add_device, remove_device, update_link) on a cluster bound to a DeviceTable
+
+Usage:
+
+    python -m pytest tests
+
+"""
+import io
+import random
+import contextlib
+
+import numpy as np
+
+import benchmark
+import deployment
+import simulation
+from modules.Application import Application
+from modules.CapacityIndex import CapacityIndex
+from modules.Device import Device
+from modules.DeviceTable import DEVICE_TABLE_COLUMNS
+from modules.PhysicalNetworkLinkStore import PhysicalNetworkLinkStore
+from modules.RoutingEngine import RoutingEngine
+
+
+def new_device(device_id, x, y):
+    """
+    Unbound device able to host any processus of Application.randomAppInit
+
+    Args:
+        device_id : int, Device ID
+        x : float, position
+        y : float, position
+
+    Returns:
+        device : Device
+    """
+    device = Device()
+    device.setDeviceID(device_id)
+    device.setDevicePosition(x, y, 0)
+    device.setDeviceCPULimit(8)
+    device.setDeviceGPULimit(16)
+    device.setDeviceMemLimit(32 * 1024)
+    device.setDeviceDiskLimit(500 * 1024)
+    return device
+
+
+def deploy_from_all(devices_list, links, routing_engine, capacity_index, seed=0):
+    """
+    Deploys a random application from every device, the deployments must not raise
+
+    Args:
+        devices_list : list of devices, None for unused device IDs
+        links : PhysicalNetworkLinkStore
+        routing_engine : RoutingEngine
+        capacity_index : CapacityIndex
+        seed : int, default to 0, random seed
+
+    Returns:
+        placements : list, Device IDs used by the successful deployments
+    """
+    random.seed(seed)
+    placements = list()
+    with contextlib.redirect_stdout(io.StringIO()):
+        for device in devices_list:
+            if device is None:
+                continue
+            app = Application()
+            app.randomAppInit()
+            success, _, _, placement = deployment.application_deploy(app, device, devices_list, links, routing_engine=routing_engine, capacity_index=capacity_index)
+            if success:
+                placements.extend(placement)
+    return placements
+
+
+def test_added_device_is_bound_to_the_table():
+    devices_list, links, routing_engine, _ = benchmark.routed_cluster(40)
+    table = devices_list[0].table
+    capacity_index = CapacityIndex(table)
+
+    device = new_device(40, devices_list[3].x + 1, devices_list[3].y)
+    simulation.add_device(device, devices_list, links, routing_engine)
+
+    assert device.table is table
+    assert table.n_devices == 41 and table.active[40]
+    assert 40 in capacity_index.device_cells
+    deploy_from_all(devices_list, links, routing_engine, capacity_index)
+
+
+def test_removed_device_leaves_the_table():
+    devices_list, links, routing_engine, _ = benchmark.routed_cluster(40)
+    table = devices_list[0].table
+    capacity_index = CapacityIndex(table)
+    free_cpu = table.free_total[0]
+    removed_cpu = devices_list[5].cpu_limit - devices_list[5].cpu_usage
+
+    simulation.remove_device(5, devices_list, links, routing_engine)
+
+    assert not table.active[5]
+    assert 5 not in capacity_index.device_cells
+    assert table.free_total[0] == free_cpu - removed_cpu
+    assert 5 not in deploy_from_all(devices_list, links, routing_engine, capacity_index)
+
+
+def test_moved_device_replaces_its_row():
+    devices_list, links, routing_engine, _ = benchmark.routed_cluster(40)
+    table = devices_list[0].table
+    capacity_index = CapacityIndex(table)
+    old_device = devices_list[7]
+
+    device = new_device(7, devices_list[20].x + 1, devices_list[20].y)
+    simulation.add_device(device, devices_list, links, routing_engine)
+
+    assert old_device.table is None
+    assert device.table is table and table.get(7, DEVICE_TABLE_COLUMNS.index('cpu_limit')) == 8
+    deploy_from_all(devices_list, links, routing_engine, capacity_index)
+
+
+def check_routes(devices_list, links, routing_engine, neighbors):
+    """
+    Compares the incrementally updated routes with a full recompute over the given neighbor graph
+    Distances must be equal, next hops must be on a shortest route (ties may be broken differently), and devices routing tables and links must follow the engine
+
+    Args:
+        devices_list : list of devices, None for unused device IDs
+        links : PhysicalNetworkLinkStore
+        routing_engine : RoutingEngine, incrementally updated engine
+        neighbors : list of dict {neighbor_id: distance}, expected neighbor graph, one dict per device ID
+
+    Returns:
+        None
+    """
+    n_devices = len(devices_list)
+    reference = RoutingEngine(n_devices)
+    for device_id, device_neighbors in enumerate(neighbors):
+        for neighbor_id, distance in device_neighbors.items():
+            reference.add_edge(device_id, neighbor_id, distance)
+    reference.compute('fast')
+
+    alive = np.array([device is not None for device in devices_list])
+    distance = routing_engine.distance[:n_devices, :n_devices]
+    assert np.allclose(distance[alive][:, alive], reference.distance[alive][:, alive])
+
+    for source_id in np.flatnonzero(alive).tolist():
+        for destination_id in np.flatnonzero(alive & np.isfinite(distance[source_id])).tolist():
+            if source_id == destination_id:
+                continue
+            next_hop = int(routing_engine.next_hop[source_id, destination_id])
+            assert next_hop in neighbors[source_id]
+            assert np.isclose(neighbors[source_id][next_hop] + distance[next_hop, destination_id], distance[source_id, destination_id])
+        routing_table = devices_list[source_id].routing_table
+        reachable = np.flatnonzero(alive & np.isfinite(distance[source_id])).tolist()
+        assert sorted(destination for destination in routing_table if alive[destination]) == reachable
+        for destination_id in reachable:
+            assert routing_table[destination_id] == (routing_engine.next_hop[source_id, destination_id], distance[source_id, destination_id])
+
+    expected_links = {(device_id, neighbor_id) for device_id, device_neighbors in enumerate(neighbors) for neighbor_id in device_neighbors}
+    assert set(zip(links.device_1_ids.tolist(), links.device_2_ids.tolist())) == expected_links
+
+
+def geometric_neighbors(devices_list):
+    """
+    Neighbor graph generate_routing_table would build for the devices, devices in wifi range
+
+    Args:
+        devices_list : list of devices, None for unused device IDs
+
+    Returns:
+        neighbors : list of dict {neighbor_id: distance}, one dict per device ID
+    """
+    return [simulation.device_neighbors(device, devices_list) if device is not None else dict() for device in devices_list]
+
+
+def test_device_updates_match_full_recompute():
+    devices_list, links, routing_engine, _ = benchmark.routed_cluster(30, seed=1)
+    capacity_index = CapacityIndex(devices_list[0].table)
+    check_routes(devices_list, links, routing_engine, geometric_neighbors(devices_list))
+
+    random.seed(1)
+    for step in range(30):
+        alive = [device.getDeviceID() for device in devices_list if device is not None]
+        anchor = devices_list[random.choice(alive)]
+        action = random.choice(['add', 'remove', 'move'])
+        if action == 'add':
+            device = new_device(len(devices_list) + random.randint(0, 2), anchor.x + random.uniform(-3, 3), anchor.y + random.uniform(-3, 3))
+            simulation.add_device(device, devices_list, links, routing_engine)
+        elif action == 'remove' and len(alive) > 5:
+            simulation.remove_device(random.choice(alive), devices_list, links, routing_engine)
+        else:
+            device = new_device(random.choice(alive), anchor.x + random.uniform(-3, 3), anchor.y + random.uniform(-3, 3))
+            simulation.add_device(device, devices_list, links, routing_engine)
+
+        check_routes(devices_list, links, routing_engine, geometric_neighbors(devices_list))
+
+    deploy_from_all(devices_list, links, routing_engine, capacity_index)
+
+
+def test_added_and_moved_devices_match_generate_routing_table():
+    devices_list, links, routing_engine, _ = benchmark.routed_cluster(30, seed=3)
+
+    random.seed(3)
+    for step in range(20):
+        anchor = random.choice(devices_list)
+        device_id = len(devices_list) if random.random() < 0.5 else random.randrange(len(devices_list))
+        simulation.add_device(new_device(device_id, anchor.x + random.uniform(-3, 3), anchor.y + random.uniform(-3, 3)), devices_list, links, routing_engine)
+
+    full_links = PhysicalNetworkLinkStore(len(devices_list))
+    full_engine = simulation.generate_routing_table(devices_list, full_links, engine='fast')
+
+    assert np.allclose(full_engine.distance, routing_engine.distance)
+    assert np.array_equal(full_links.device_1_ids, links.device_1_ids) and np.array_equal(full_links.device_2_ids, links.device_2_ids)
+
+
+def test_link_updates_match_full_recompute():
+    devices_list, links, routing_engine, _ = benchmark.routed_cluster(30, seed=2)
+    capacity_index = CapacityIndex(devices_list[0].table)
+    neighbors = geometric_neighbors(devices_list)
+
+    random.seed(2)
+    for step in range(60):
+        device_1_id, device_2_id = random.sample(range(len(devices_list)), 2)
+        distance = random.choice([None, random.uniform(0.5, 20)])
+        simulation.update_link(device_1_id, device_2_id, distance, devices_list, links, routing_engine)
+        for source_id, destination_id in [(device_1_id, device_2_id), (device_2_id, device_1_id)]:
+            if distance is None:
+                neighbors[source_id].pop(destination_id, None)
+            else:
+                neighbors[source_id][destination_id] = distance
+
+        check_routes(devices_list, links, routing_engine, neighbors)
+
+    deploy_from_all(devices_list, links, routing_engine, capacity_index)